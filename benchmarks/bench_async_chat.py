@@ -0,0 +1,54 @@
+"""Concurrency ceiling of the sync vs async /chat endpoints.
+
+Both apps run in-process behind httpx's ASGI transport and talk to the fake
+Responses API. Sync handlers are capped by the Starlette threadpool (40
+threads), so their throughput flattens at roughly 40 / latency; the async
+handlers keep scaling with the number of in-flight requests.
+
+    python -m benchmarks.bench_async_chat --latency 0.5 --concurrency 10 100 400
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import drive, isolate_workdir, point_openai_at, print_table
+from benchmarks.fake_openai import start_fake_openai
+
+
+async def run(args):
+    import httpx
+    import chatting
+    import emotional_chatting
+
+    rows = []
+    for app_name, app in (("chatting", chatting.app), ("emotional_chatting", emotional_chatting.app)):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for path in ("/chat", "/chat/async"):
+                for concurrency in args.concurrency:
+                    total = max(args.requests, concurrency * 2)
+                    stats = await drive(
+                        client, "POST", path,
+                        lambda i: {"message": f"hello {i}"},
+                        concurrency, total,
+                    )
+                    rows.append({"app": app_name, "path": path, "concurrency": concurrency, **stats})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 400])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    isolate_workdir()
+    _, base_url = start_fake_openai(latency=args.latency)
+    point_openai_at(base_url)
+
+    rows = asyncio.run(run(args))
+    print_table(rows, ["app", "path", "concurrency", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms"])
+
+
+if __name__ == "__main__":
+    main()
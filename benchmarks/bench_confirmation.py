@@ -0,0 +1,57 @@
+"""Latency of each post-tool confirmation mode.
+
+Runs /chat/async against the fake Responses API, which always answers the
+first call with the canned tool calls, and forces every tool into one
+confirmation mode at a time:
+
+    template      no second LLM call
+    llm           separate "Action completed" paraphrase call
+    continuation  function_call_output continuation of the same response
+
+    python -m benchmarks.bench_confirmation --latency 0.3 --tool-call add_meal --tool-call add_reminders
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import drive, isolate_workdir, point_openai_at, print_table
+from benchmarks.fake_openai import start_fake_openai
+
+MODES = ("template", "llm", "continuation")
+
+
+async def run(args):
+    import httpx
+    import chatting
+
+    rows = []
+    transport = httpx.ASGITransport(app=chatting.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for mode in MODES:
+            chatting.CONFIRMATION_MODES = {name: mode for name in chatting.DEFAULT_CONFIRMATION_MODES}
+            stats = await drive(
+                client, "POST", "/chat/async",
+                lambda i: {"message": f"log my breakfast {i}"},
+                args.concurrency, args.requests,
+            )
+            rows.append({"mode": mode, **stats})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM latency in seconds")
+    parser.add_argument("--tool-call", action="append", default=None)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    isolate_workdir()
+    _, base_url = start_fake_openai(latency=args.latency, tool_calls=args.tool_call or ["add_meal"])
+    point_openai_at(base_url)
+
+    rows = asyncio.run(run(args))
+    print_table(rows, ["mode", "requests", "errors", "p50_ms", "p95_ms", "throughput_rps"])
+
+
+if __name__ == "__main__":
+    main()
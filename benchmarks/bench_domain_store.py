@@ -0,0 +1,134 @@
+"""Domain lookups at scale: indexed SQLite queries vs linear list scans.
+
+Fills a scratch DomainStore with `--rows` meals, events and reminders spread
+over `--users` users and a year of dates, then times the lookups the
+assistant makes: meals by (date, meal_type), a week's calorie totals,
+events overlapping a time range, and reminders due before a time. Each is
+compared with the scan over a plain list that chatting.py used to do. Runs
+without network access or API keys.
+
+    python -m benchmarks.bench_domain_store --rows 100000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from benchmarks.common import isolate_workdir, print_table
+from utils.domain_store import DomainStore
+from utils.event_cache import parse_event_time
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+DAY = 86400
+
+
+def synthetic_rows(n, users, rng):
+    first_day = date(2026, 1, 1)
+    rows = []
+    for i in range(n):
+        day = first_day + timedelta(days=rng.randrange(365))
+        start = datetime.combine(day, datetime.min.time(), timezone.utc) + timedelta(minutes=30 * rng.randrange(48))
+        end = start + timedelta(minutes=30 * rng.randint(1, 4))
+        rows.append({
+            "user_id": f"user-{rng.randrange(users)}",
+            "meal": {
+                "date": day.isoformat(),
+                "time": start.strftime("%H:%M"),
+                "meal_type": rng.choice(MEAL_TYPES),
+                "title": f"meal {i}",
+                "description": "",
+                "calories": rng.randint(100, 900),
+            },
+            "event": {
+                "id": f"event{i}",
+                "summary": f"meeting {i}",
+                "date": day.isoformat(),
+                "start": {"dateTime": start.isoformat()},
+                "end": {"dateTime": end.isoformat()},
+            },
+            "reminder": {"title": f"reminder {i}", "time": "today"},
+            "due_at": start.timestamp(),
+        })
+    return rows
+
+
+def fill(store, rows):
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row["user_id"], []).append(row)
+    for user_id, user_rows in by_user.items():
+        store.add_meals(user_id, [r["meal"] for r in user_rows])
+        store.upsert_events(user_id, [r["event"] for r in user_rows])
+        store.add_reminders(user_id, [r["reminder"] for r in user_rows], [r["due_at"] for r in user_rows])
+
+
+def time_per_call(fn, queries):
+    started = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    isolate_workdir()
+    rng = random.Random(0)
+    rows = synthetic_rows(args.rows, args.users, rng)
+    store = DomainStore(os.path.join(os.getcwd(), "bench.db"))
+    started = time.perf_counter()
+    fill(store, rows)
+    print(f"Inserted {args.rows} meals, events and reminders in {time.perf_counter() - started:.1f}s")
+
+    # Flat lists, as the tools kept them before the store existed.
+    meal_list = [{**r["meal"], "user_id": r["user_id"]} for r in rows]
+    event_list = [
+        (r["user_id"], parse_event_time(r["event"]["start"]), parse_event_time(r["event"]["end"]), r["event"])
+        for r in rows
+    ]
+    reminder_list = [(r["user_id"], r["due_at"], r["reminder"]) for r in rows]
+
+    samples = [rng.choice(rows) for _ in range(args.queries)]
+    meal_queries = [(r["user_id"], r["meal"]["date"], r["meal"]["meal_type"]) for r in samples]
+    week_queries = [
+        (r["user_id"], r["meal"]["date"], (date.fromisoformat(r["meal"]["date"]) + timedelta(days=6)).isoformat())
+        for r in samples
+    ]
+    event_queries = [(r["user_id"], r["due_at"], r["due_at"] + DAY) for r in samples]
+    reminder_queries = [(r["user_id"], r["due_at"]) for r in samples]
+
+    def scan_meals(user_id, day, meal_type):
+        return [m for m in meal_list if m["user_id"] == user_id and m["date"] == day and m["meal_type"] == meal_type]
+
+    def scan_week(user_id, start_date, end_date):
+        return sum(
+            m["calories"] for m in meal_list
+            if m["user_id"] == user_id and start_date <= m["date"] <= end_date
+        )
+
+    def scan_events(user_id, start, end):
+        return [e for u, s, t, e in event_list if u == user_id and s < end and t > start]
+
+    def scan_reminders(user_id, due_before):
+        return [r for u, due, r in reminder_list if u == user_id and due <= due_before]
+
+    table = [
+        ("meals by (date, meal_type)", scan_meals, lambda u, d, t: store.meals(u, date=d, meal_type=t), meal_queries),
+        ("calories for a week", scan_week, store.meal_summary, week_queries),
+        ("events overlapping a day", scan_events, store.events_between, event_queries),
+        ("reminders due before", scan_reminders, lambda u, t: store.reminders(u, due_before=t), reminder_queries),
+    ]
+    results = []
+    for lookup, scan, indexed, queries in table:
+        results.append({"lookup": lookup, "mode": "list scan", "us_per_query": time_per_call(scan, queries)})
+        results.append({"lookup": lookup, "mode": "sqlite index", "us_per_query": time_per_call(indexed, queries)})
+    print_table(results, ["lookup", "mode", "us_per_query"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Intent router accuracy and the LLM time it saves.
+
+Routes every message of a labelled fixture set (fixtures/intents.jsonl) and
+reports, per tool and overall:
+
+    precision  routed calls with the right tool and arguments / routed calls
+    recall     correctly routed calls / messages labelled as routable
+
+A routed message costs one router call instead of a responses.create round
+trip, so the saved time is the routed count times `--llm-latency` minus
+the router's own time. Runs without network access or API keys.
+
+    python -m benchmarks.bench_intent_router --llm-latency 1.2
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+from benchmarks.common import print_table
+from utils.intent_router import IntentRouter
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "intents.jsonl")
+# The fixtures' relative dates ("yesterday") are labelled against this day.
+NOW = datetime(2026, 1, 16, 10, 0)
+
+
+def load_fixtures(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def args_match(expected, actual):
+    return all(actual.get(key) == value for key, value in expected.items())
+
+
+def score(fixtures, routes):
+    tools = sorted({f["tool_name"] for f in fixtures if f["tool_name"]})
+    rows = []
+    for tool in tools + ["all"]:
+        selected = lambda name: name is not None and (tool == "all" or name == tool)
+        routed = [(f, r) for f, r in zip(fixtures, routes) if r is not None and selected(r.tool_name)]
+        labelled = [f for f in fixtures if selected(f["tool_name"])]
+        correct = sum(
+            1 for f, r in routed if r.tool_name == f["tool_name"] and args_match(f["args"], r.args)
+        )
+        rows.append({
+            "tool": tool,
+            "labelled": len(labelled),
+            "routed": len(routed),
+            "correct": correct,
+            "precision": correct / len(routed) if routed else 1.0,
+            "recall": correct / len(labelled) if labelled else 1.0,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--min-confidence", type=float, default=0.9)
+    parser.add_argument("--llm-latency", type=float, default=1.2, help="seconds per responses.create round trip")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    router = IntentRouter(min_confidence=args.min_confidence)
+    routes = [router.route(f["message"], NOW) for f in fixtures]
+
+    for f, r in zip(fixtures, routes):
+        if r is not None and (r.tool_name != f["tool_name"] or not args_match(f["args"] or {}, r.args)):
+            print(f"wrong: {f['message']!r} -> {r.tool_name} {r.args}")
+    print_table(score(fixtures, routes), ["tool", "labelled", "routed", "correct", "precision", "recall"])
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for f in fixtures:
+            router.route(f["message"], NOW)
+    router_seconds = (time.perf_counter() - started) / (args.repeat * len(fixtures))
+    routed = sum(1 for r in routes if r is not None)
+    saved = routed * args.llm_latency - len(fixtures) * router_seconds
+    print(f"\nrouter: {router_seconds * 1e6:.0f} us/message; {routed}/{len(fixtures)} messages skip the LLM")
+    print(f"saved: {saved:.1f}s over the fixture set at {args.llm_latency}s per LLM call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Prompt assembly cost: full re-render per request vs the incremental cache.
+
+For synthetic 1k- and 10k-turn sessions, times one request's worth of
+history assembly the way chat() used to do it (walk every turn with +=)
+against ContextBuilder with a warm PromptCache, which only renders the new
+turn into input messages. Runs without network access or API keys.
+
+    python -m benchmarks.bench_prompt_cache --turns 1000 10000
+"""
+import argparse
+import time
+
+from benchmarks.common import print_table
+from utils.context import ContextBuilder
+
+
+class MemoryStore:
+    """Just enough of SessionStore for ContextBuilder."""
+
+    def __init__(self):
+        self.meta = {}
+
+    def read_meta(self, session_id):
+        return self.meta.get(session_id, {})
+
+    def write_meta(self, session_id, meta):
+        self.meta[session_id] = meta
+
+    def version(self, session_id):
+        return 0
+
+
+def synthetic_turns(n):
+    return [
+        {"user_message": f"question number {i} about my meals and meetings", "ai_message": f"answer number {i} " * 8}
+        for i in range(n)
+    ]
+
+
+def naive(turns, message):
+    conversation_text = ""
+    for m in turns:
+        conversation_text += f"User: {m['user_message']}\nAI: {m['ai_message']}\n"
+    conversation_text += f"User: {message}\nAI:"
+    return conversation_text
+
+
+def time_per_call(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for n in args.turns:
+        turns = synthetic_turns(n)
+        # Unbounded window: assembles the whole history, like the naive loop.
+        full = ContextBuilder(lambda s, t: s, max_turns=n + 1, token_budget=10**12)
+        window = ContextBuilder(lambda s, t: s)
+        store = MemoryStore()
+        full.build(store, "full", turns)
+        window.build(store, "window", turns)
+
+        def next_turn(builder, session_id):
+            turns.append({"user_message": "new question", "ai_message": "new answer"})
+            return builder.build(store, session_id, turns)
+
+        rows.append({"turns": n, "mode": "naive +=", "us_per_request": time_per_call(lambda: naive(turns, "hi"), args.repeat)})
+        rows.append({"turns": n, "mode": "cache, full history", "us_per_request": time_per_call(lambda: next_turn(full, "full"), args.repeat)})
+        rows.append({"turns": n, "mode": "cache, token window", "us_per_request": time_per_call(lambda: next_turn(window, "window"), args.repeat)})
+    print_table(rows, ["turns", "mode", "us_per_request"])
+
+
+if __name__ == "__main__":
+    main()
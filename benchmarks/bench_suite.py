@@ -0,0 +1,319 @@
+"""End-to-end benchmark suite against local OpenAI and Calendar stand-ins.
+
+Starts the fake OpenAI server (Responses, Embeddings and Realtime) and the
+fake Calendar API over HTTP, then drives every scenario at a fixed
+concurrency and records throughput, p50/p95/p99 latency and process RSS:
+
+    chatting.*    /chat, /chat/async and /chat/stream of chatting.app, with
+                  plain replies and with canned add_meal / schedule_event /
+                  schedule_events calls (the last two insert through the
+                  Calendar client, schedule_events as one batch of five)
+    calendar.*    full EventCache syncs paging through events.list, and bursts
+                  of find_events over a few windows (calendar_calls counts
+                  the events.list calls that reached the fake)
+    emotional.*   /chat and /chat/async of emotional_chatting.app
+    voice.turn    voice_to_text's /media-stream WebSocket; latency is the time
+                  from the last audio frame of a turn to the first audio back
+
+The chat apps run in-process behind httpx's ASGI transport; the voice app
+runs under uvicorn because it is driven over a real WebSocket. RSS covers
+the whole process, fakes included, so compare it between runs rather than
+reading it as the apps' footprint.
+
+Results are written to benchmarks/results/<commit>.json together with the
+settings used, so runs on different commits can be compared:
+
+    python -m benchmarks.bench_suite --concurrency 20 --requests 200
+    python -m benchmarks.bench_suite --compare benchmarks/results/1ffc33b.json
+"""
+import argparse
+import asyncio
+import base64
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import (
+    REPO_ROOT, drive, isolate_workdir, point_openai_at, print_table, rss_mb, summarize,
+)
+from benchmarks.fake_calendar import calendar_endpoint, start_fake_calendar
+from benchmarks.fake_openai import create_app, start_server
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+COLUMNS = [
+    "scenario", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms",
+    "rss_mb", "rss_delta_mb", "calendar_calls",
+]
+
+# (name, app module, path, canned tool calls, message)
+CHAT_SCENARIOS = [
+    ("chatting.chat", "chatting", "/chat", [], "hello {i}"),
+    ("chatting.chat_async", "chatting", "/chat/async", [], "hello {i}"),
+    ("chatting.chat_stream", "chatting", "/chat/stream", [], "hello {i}"),
+    ("chatting.add_meal", "chatting", "/chat/async", ["add_meal"], "log my breakfast {i}"),
+    ("chatting.schedule_event", "chatting", "/chat/async", ["schedule_event"], "book a meeting {i}"),
+    ("chatting.schedule_events", "chatting", "/chat/async", ["schedule_events"], "plan my week {i}"),
+    ("emotional.chat", "emotional_chatting", "/chat", [], "i feel tired {i}"),
+    ("emotional.chat_async", "emotional_chatting", "/chat/async", [], "i feel tired {i}"),
+]
+SCENARIOS = [name for name, *_ in CHAT_SCENARIOS] + ["calendar.full_sync", "calendar.window_reads", "voice.turn"]
+# One voice frame: 20 ms of 24 kHz pcm16 silence.
+VOICE_FRAME = base64.b64encode(bytes(960)).decode("ascii")
+VOICE_FRAME_MS = 20
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(git("status", "--porcelain", "--untracked-files=no"))
+    return commit, dirty
+
+
+def point_realtime_at(websocket_base_url):
+    """Route Realtime connections of AsyncOpenAI clients created after this call.
+
+    The SDK derives the WebSocket URL from base_url with the scheme forced to
+    wss://, so a plain ws:// fake has to be passed as `websocket_base_url`.
+    """
+    import openai
+
+    init = openai.AsyncOpenAI.__init__
+
+    def init_with_websocket_url(self, *args, **kwargs):
+        kwargs.setdefault("websocket_base_url", websocket_base_url)
+        init(self, *args, **kwargs)
+
+    openai.AsyncOpenAI.__init__ = init_with_websocket_url
+
+
+def use_fake_calendar(url):
+    """Make chatting build its Calendar client against the fake at `url`."""
+    from google.auth.credentials import AnonymousCredentials
+    import chatting
+    from utils.google_calender_auth import CalendarClientManager
+
+    manager = CalendarClientManager(credentials=AnonymousCredentials(), api_endpoint=calendar_endpoint(url))
+    chatting.get_calendar_service = manager.service
+    chatting.new_calendar_batch = manager.new_batch
+    return manager.service()
+
+
+def import_voice_app():
+    """voice_to_text mounts ./static at import, so import it from the repo root."""
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        import voice_to_text
+    finally:
+        os.chdir(cwd)
+    return voice_to_text.app
+
+
+async def run_chat(fake, module, path, tool_calls, message, args):
+    import httpx
+
+    app = importlib.import_module(module).app
+    fake.state.tool_calls = tool_calls
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        return await drive(
+            client, "POST", path,
+            lambda i: {"message": message.format(i=i), "user_id": f"bench-{i % args.concurrency}"},
+            args.concurrency, args.requests,
+        )
+
+
+async def drive_threads(fn, concurrency, total):
+    """Run fn(i) for i in range(total) in threads, at most `concurrency` at once."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(fn, i)
+            except Exception as e:
+                print(f"Call failed: {e}")
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run_calendar_sync(service, args):
+    """Full syncs of a fresh EventCache, each paging through every event."""
+    from utils.event_cache import EventCache
+
+    return await drive_threads(lambda i: EventCache().sync(service), args.concurrency, max(1, args.requests // 10))
+
+
+async def run_calendar_reads(events, args):
+    """find_events over five month-long windows, as concurrent sessions would ask."""
+    import chatting
+
+    def read(i):
+        month = i % 5 + 1
+        result = chatting.find_events(f"2025-{month:02d}-01T00:00:00", f"2025-{month:02d}-28T00:00:00", "UTC")
+        if result["status"] != "success":
+            raise RuntimeError(result["error"])
+
+    chatting.calendar_reader.changed()
+    calls = events.list_calls
+    stats = await drive_threads(read, args.concurrency, args.requests)
+    return {**stats, "calendar_calls": events.list_calls - calls}
+
+
+async def run_voice(url, fake, args):
+    """`concurrency` sessions of `voice_turns` turns each; one latency per turn."""
+    import websockets
+
+    latencies = []
+    errors = 0
+
+    async def session(i):
+        nonlocal errors
+        try:
+            async with websockets.connect(f"{url}/media-stream") as ws:
+                await ws.send(json.dumps({"event": "start", "start": {"streamSid": f"bench-{i}"}}))
+                timestamp = 0
+                for _ in range(args.voice_turns):
+                    for _ in range(fake.state.frames_per_turn):
+                        timestamp += VOICE_FRAME_MS
+                        await ws.send(json.dumps({"event": "media", "media": {"timestamp": timestamp, "payload": VOICE_FRAME}}))
+                    started = time.perf_counter()
+                    received = 0
+                    while received < fake.state.reply_chunks:
+                        message = json.loads(await asyncio.wait_for(ws.recv(), timeout=30))
+                        if message.get("event") == "media":
+                            if received == 0:
+                                latencies.append(time.perf_counter() - started)
+                            received += 1
+        except Exception as e:
+            print(f"Voice session {i} failed: {e!r}")
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(args.concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run(args, fake, calendar_service, calendar_events, voice_url):
+    rows = []
+    for name in args.scenarios:
+        before = rss_mb()
+        if name == "calendar.full_sync":
+            stats = await run_calendar_sync(calendar_service, args)
+        elif name == "calendar.window_reads":
+            stats = await run_calendar_reads(calendar_events, args)
+        elif name == "voice.turn":
+            if voice_url is None:
+                continue
+            stats = await run_voice(voice_url, fake, args)
+        else:
+            _, module, path, tool_calls, message = next(s for s in CHAT_SCENARIOS if s[0] == name)
+            stats = await run_chat(fake, module, path, tool_calls, message, args)
+        after = rss_mb()
+        rows.append({"scenario": name, **stats, "rss_mb": after, "rss_delta_mb": after - before})
+        print_table(rows[-1:], COLUMNS)
+    return rows
+
+
+def compare(base, rows):
+    """Per-scenario change against a previous results file."""
+    previous = {row["scenario"]: row for row in base["scenarios"]}
+    changes = []
+    for row in rows:
+        old = previous.get(row["scenario"])
+        if old is None:
+            continue
+        change = {"scenario": row["scenario"]}
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "rss_mb"):
+            change[key] = (row[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+        changes.append(change)
+    print(f"\nchange vs {base['commit']} (%):")
+    print_table(changes, ["scenario", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "rss_mb"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per chat scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake OpenAI latency in seconds")
+    parser.add_argument("--calendar-latency", type=float, default=0.05, help="fake Calendar latency in seconds")
+    parser.add_argument("--calendar-events", type=int, default=1000, help="events preloaded for the sync scenario")
+    parser.add_argument("--calendar-failure-rate", type=float, default=0.0, help="share of batched inserts answering 503")
+    parser.add_argument("--voice-turns", type=int, default=5, help="turns per voice session")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json"))
+    compare_path = args.compare and os.path.abspath(args.compare)
+    isolate_workdir()
+    fake = create_app(latency=args.llm_latency)
+    _, openai_url = start_server(fake)
+    point_openai_at(f"{openai_url}/v1")
+    point_realtime_at(f"{openai_url.replace('http://', 'ws://')}/v1")
+
+    _, calendar_url, events = start_fake_calendar(
+        latency=args.calendar_latency, failure_rate=args.calendar_failure_rate
+    )
+    for i in range(args.calendar_events):
+        day = f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+        events.insert(body={
+            "summary": f"Event {i}",
+            "start": {"dateTime": f"{day}T09:00:00", "timeZone": "UTC"},
+            "end": {"dateTime": f"{day}T10:00:00", "timeZone": "UTC"},
+        }).execute()
+    calendar_service = use_fake_calendar(calendar_url)
+
+    voice_url = None
+    if "voice.turn" in args.scenarios:
+        try:
+            _, url = start_server(import_voice_app())
+            voice_url = url.replace("http://", "ws://")
+        except ImportError as e:
+            print(f"Skipping voice.turn: {e}")
+
+    rows = asyncio.run(run(args, fake, calendar_service, events, voice_url))
+    print()
+    print_table(rows, COLUMNS)
+
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "scenarios": rows,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as f:
+            base = json.load(f)
+        if base["settings"] != results["settings"]:
+            print("note: settings differ from the compared run")
+        compare(base, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Stand-in for the Google Calendar v3 `events` resource.
+
+Implements just enough of `service.events().insert/list/delete(...).execute()`
+for the local event index: sync tokens return only the events changed since
+the token was issued, and deletions come back as `status: cancelled`.
+
+    service = FakeCalendarService()
+    event_cache.sync(service)
+
+The same events can be served over HTTP, with a configurable delay, at the
+paths googleapiclient calls, so benchmarks exercise the real client. Batch
+requests (POST /batch/calendar/v3) are supported for inserts, and
+`app.state.failure_rate` makes that share of batched inserts answer 503:
+
+    server, url, events = start_fake_calendar(latency=0.05)
+    service = CalendarClientManager(credentials=AnonymousCredentials(), api_endpoint=calendar_endpoint(url)).service()
+"""
+import asyncio
+from email.parser import BytesParser
+import itertools
+import json
+import random
+import re
+from urllib.parse import urlsplit
+import uuid
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+
+class _Call:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeEvents:
+    def __init__(self, page_size=250):
+        self.page_size = page_size
+        self.events = {}
+        # event_id -> change sequence number of its latest insert/update/delete
+        self.changed_at = {}
+        self._sequence = itertools.count(1)
+        self.list_calls = 0
+        self.insert_calls = 0
+
+    def _touch(self, event_id):
+        self.changed_at[event_id] = next(self._sequence)
+
+    def insert(self, calendarId="primary", body=None, **kwargs):
+        def run():
+            self.insert_calls += 1
+            event = dict(body, id=body.get("id") or uuid.uuid4().hex, status="confirmed")
+            self.events[event["id"]] = event
+            self._touch(event["id"])
+            return dict(event)
+        return _Call(run)
+
+    def delete(self, calendarId="primary", eventId=None, **kwargs):
+        def run():
+            self.events[eventId] = dict(self.events[eventId], status="cancelled")
+            self._touch(eventId)
+            return ""
+        return _Call(run)
+
+    def list(self, calendarId="primary", syncToken=None, pageToken=None, timeMin=None, timeMax=None, **kwargs):
+        def run():
+            self.list_calls += 1
+            since = int(syncToken) if syncToken else 0
+            changed = sorted(
+                (seq, event_id) for event_id, seq in self.changed_at.items() if seq > since
+            )
+            items = [self.events[event_id] for _, event_id in changed]
+            if not syncToken:
+                items = [e for e in items if e.get("status") != "cancelled"]
+            if timeMin or timeMax:
+                items = [e for e in items if _in_window(e, timeMin, timeMax)]
+            offset = int(pageToken or 0)
+            page = items[offset:offset + self.page_size]
+            result = {"kind": "calendar#events", "items": [dict(e) for e in page]}
+            if offset + self.page_size < len(items):
+                result["nextPageToken"] = str(offset + self.page_size)
+            else:
+                result["nextSyncToken"] = str(max(self.changed_at.values(), default=0))
+            return result
+        return _Call(run)
+
+
+def _in_window(event, time_min, time_max):
+    start = event["start"].get("dateTime") or event["start"].get("date")
+    end = event["end"].get("dateTime") or event["end"].get("date")
+    return (time_max is None or start < time_max) and (time_min is None or end > time_min)
+
+
+class FakeCalendarService:
+    def __init__(self, page_size=250):
+        self._events = FakeEvents(page_size=page_size)
+
+    def events(self):
+        return self._events
+
+
+_INSERT_PATH = re.compile(r"/calendar/v3/calendars/([^/]+)/events$")
+
+
+def _batch_part(content_id, status, reason, body):
+    inner = f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(body)}"
+    return (
+        "Content-Type: application/http\r\n"
+        f"Content-ID: <response-{content_id.strip('<>')}>\r\n\r\n"
+        f"{inner}\r\n"
+    )
+
+
+def create_app(events=None, latency=0.05, failure_rate=0.0):
+    """HTTP front end for a FakeEvents; the delay lives on `app.state.latency`."""
+    app = FastAPI()
+    app.state.latency = latency
+    app.state.failure_rate = failure_rate
+    app.state.events = events = events if events is not None else FakeEvents()
+
+    @app.post("/calendar/v3/calendars/{calendar_id}/events")
+    async def insert(calendar_id: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(app.state.latency)
+        return events.insert(calendarId=calendar_id, body=body).execute()
+
+    @app.get("/calendar/v3/calendars/{calendar_id}/events")
+    async def list_events(calendar_id: str, request: Request):
+        params = request.query_params
+        await asyncio.sleep(app.state.latency)
+        return events.list(
+            calendarId=calendar_id,
+            syncToken=params.get("syncToken"),
+            pageToken=params.get("pageToken"),
+            timeMin=params.get("timeMin"),
+            timeMax=params.get("timeMax"),
+        ).execute()
+
+    @app.post("/batch/calendar/v3")
+    async def batch(request: Request):
+        """multipart/mixed batch of inserts, answered in one multipart/mixed reply."""
+        header = f"Content-Type: {request.headers['content-type']}\r\n\r\n".encode()
+        message = BytesParser().parsebytes(header + await request.body())
+        await asyncio.sleep(app.state.latency)
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            inner = part.get_payload().replace("\r\n", "\n")
+            head, _, payload = inner.partition("\n\n")
+            method, target = head.split("\n")[0].split(" ")[:2]
+            match = _INSERT_PATH.match(urlsplit(target).path)
+            if method != "POST" or not match:
+                parts.append(_batch_part(part["Content-ID"], 404, "Not Found", {"error": {"code": 404, "message": "Not Found"}}))
+            elif json.loads(payload).get("id") in events.events:
+                parts.append(_batch_part(part["Content-ID"], 409, "Conflict", {"error": {"code": 409, "message": "The requested identifier already exists."}}))
+            elif random.random() < app.state.failure_rate:
+                parts.append(_batch_part(part["Content-ID"], 503, "Service Unavailable", {"error": {"code": 503, "message": "Backend Error"}}))
+            else:
+                event = events.insert(calendarId=match.group(1), body=json.loads(payload)).execute()
+                parts.append(_batch_part(part["Content-ID"], 200, "OK", event))
+        body = "".join(f"--{boundary}\r\n{p}" for p in parts) + f"--{boundary}--\r\n"
+        return Response(body, media_type=f"multipart/mixed; boundary={boundary}")
+
+    @app.delete("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+    async def delete(calendar_id: str, event_id: str):
+        await asyncio.sleep(app.state.latency)
+        if event_id not in events.events:
+            return JSONResponse({"error": {"code": 404, "message": "Not Found"}}, status_code=404)
+        events.delete(calendarId=calendar_id, eventId=event_id).execute()
+        return Response(status_code=204)
+
+    return app
+
+
+def calendar_endpoint(url):
+    """`api_endpoint` that points a Calendar v3 client at a fake served from `url`."""
+    return f"{url}/calendar/v3/"
+
+
+def start_fake_calendar(latency=0.05, failure_rate=0.0, port=0):
+    """Serve a fresh FakeEvents over HTTP; returns (server, url, events)."""
+    from benchmarks.fake_openai import start_server
+
+    app = create_app(latency=latency, failure_rate=failure_rate)
+    server, url = start_server(app, port)
+    return server, url, app.state.events
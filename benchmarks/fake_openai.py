@@ -0,0 +1,302 @@
+"""Local stand-in for the OpenAI Responses, Embeddings and Realtime APIs.
+
+Answers `POST /v1/responses` after a configurable delay. When canned tool
+calls are configured and the request offers tools (and does not already
+carry function_call_output items), those function calls are returned;
+otherwise a plain assistant message is returned.
+
+`POST /v1/embeddings` returns deterministic hashed bag-of-words vectors, and
+the `/v1/realtime` WebSocket answers every `frames_per_turn` appended audio
+frames with `reply_chunks` audio deltas after the same delay.
+
+Settings live on `app.state` (latency, tool_calls, reply, frames_per_turn,
+reply_chunks), so a benchmark can switch scenarios without a restart.
+
+    python -m benchmarks.fake_openai --port 8900 --latency 0.5 --tool-call add_meal
+"""
+import argparse
+import array
+import asyncio
+import base64
+from datetime import datetime, timedelta
+import hashlib
+import itertools
+import json
+import math
+import re
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+CANNED_ARGUMENTS = {
+    "add_meal": {
+        "date": "2026-01-16",
+        "time": "08:30",
+        "meal_type": "breakfast",
+        "title": "Oatmeal",
+        "description": "Oatmeal with banana",
+        "calories": 350,
+    },
+    "add_reminders": {"title": "Call mom", "time": "this week"},
+    "save_list": {"title": "Groceries", "items": ["milk", "eggs"]},
+    "add_recipe": {
+        "recipe_name": "Pancakes",
+        "meal_type": "breakfast",
+        "cooking_time": 20,
+        "description": "Fluffy pancakes",
+        "ratings": 4.5,
+    },
+}
+
+EMBEDDING_DIMENSIONS = 256
+
+
+def canned_arguments(name, response_id):
+    """Arguments for a canned call; events move an hour per response so they never conflict."""
+    if name == "schedule_event":
+        start = datetime(2026, 3, 1) + timedelta(hours=response_id)
+        return {
+            "summary": f"Bench meeting {response_id}",
+            "description": "Benchmark event",
+            "start_datetime": start.isoformat(),
+            "end_datetime": (start + timedelta(minutes=30)).isoformat(),
+            "timezone": "UTC",
+            "repeat": "never",
+            "reminder": "15 minutes",
+            "method": "popup",
+        }
+    if name == "schedule_events":
+        day = datetime(2027, 1, 1) + timedelta(days=response_id)
+        return {"events": [
+            {
+                "summary": f"Bench block {response_id}.{hour}",
+                "description": "Benchmark event",
+                "start_datetime": day.replace(hour=hour).isoformat(),
+                "end_datetime": day.replace(hour=hour, minute=30).isoformat(),
+                "timezone": "UTC",
+            }
+            for hour in range(9, 14)
+        ]}
+    return CANNED_ARGUMENTS.get(name, {})
+
+
+def fake_embedding(text):
+    """Unit vector of hashed words: equal texts match, different ones mostly don't."""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[digest[0] % EMBEDDING_DIMENSIONS] += 1.0 if digest[1] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def message_item(item_id, text):
+    return {
+        "type": "message",
+        "id": f"msg_{item_id}",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": text, "annotations": []}],
+    }
+
+
+def function_call_item(item_id, name, arguments):
+    return {
+        "type": "function_call",
+        "id": f"fc_{item_id}",
+        "call_id": f"call_{item_id}",
+        "name": name,
+        "arguments": json.dumps(arguments),
+        "status": "completed",
+    }
+
+
+def response_body(response_id, model, output, input_tokens=100, output_tokens=20):
+    return {
+        "id": f"resp_{response_id}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def stream_events(body, latency):
+    """Server-sent events for a streamed response: one delta per word."""
+    sequence = itertools.count()
+
+    def event(payload):
+        payload["sequence_number"] = next(sequence)
+        return f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+
+    async def generate():
+        yield event({"type": "response.created", "response": {**body, "output": [], "status": "in_progress"}})
+        for item in body["output"]:
+            if item["type"] != "message":
+                continue
+            words = item["content"][0]["text"].split(" ")
+            for i, word in enumerate(words):
+                await asyncio.sleep(latency / max(len(words), 1))
+                yield event({
+                    "type": "response.output_text.delta",
+                    "item_id": item["id"],
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": word if i == 0 else " " + word,
+                })
+        yield event({"type": "response.completed", "response": body})
+
+    return generate()
+
+
+def create_app(latency=0.2, tool_calls=(), reply="Sure, done.", frames_per_turn=25, reply_chunks=10):
+    """Build the fake server. `tool_calls` is a list of tool names to return."""
+    app = FastAPI()
+    app.state.latency = latency
+    app.state.tool_calls = list(tool_calls)
+    app.state.reply = reply
+    app.state.frames_per_turn = frames_per_turn
+    app.state.reply_chunks = reply_chunks
+    ids = itertools.count(1)
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        body = await request.json()
+        stream = body.get("stream", False)
+        latency = app.state.latency
+        # Streamed responses spend half the latency before the first token.
+        await asyncio.sleep(latency / 2 if stream else latency)
+        response_id = next(ids)
+        answered = any(
+            isinstance(item, dict) and item.get("type") == "function_call_output"
+            for item in body.get("input") or []
+        )
+        if app.state.tool_calls and body.get("tools") and not answered:
+            output = [
+                function_call_item(f"{response_id}_{i}", name, canned_arguments(name, response_id))
+                for i, name in enumerate(app.state.tool_calls)
+            ]
+        else:
+            output = [message_item(response_id, app.state.reply)]
+        result = response_body(response_id, body.get("model", "fake-model"), output)
+        if stream:
+            return StreamingResponse(stream_events(result, latency / 2), media_type="text/event-stream")
+        return result
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = []
+        for i, text in enumerate(texts):
+            vector = fake_embedding(text)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(array.array("f", vector).tobytes()).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(len(text.split()) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.websocket("/v1/realtime")
+    async def realtime(websocket: WebSocket):
+        await websocket.accept()
+        events = itertools.count(1)
+        send_lock = asyncio.Lock()
+        # GA sessions name audio deltas response.output_audio.delta, beta ones response.audio.delta.
+        audio_event = "response.audio.delta"
+
+        async def send(payload):
+            async with send_lock:
+                await websocket.send_text(json.dumps({"event_id": f"event_{next(events)}", **payload}))
+
+        async def respond(response_id):
+            await asyncio.sleep(app.state.latency)
+            response = {"id": f"resp_{response_id}", "object": "realtime.response", "status": "in_progress", "output": []}
+            await send({"type": "response.created", "response": response})
+            for _ in range(app.state.reply_chunks):
+                await send({
+                    "type": audio_event,
+                    "response_id": response["id"],
+                    "item_id": f"item_{response_id}",
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": base64.b64encode(bytes(960)).decode("ascii"),
+                })
+            await send({"type": "response.done", "response": {**response, "status": "completed"}})
+
+        await send({"type": "session.created", "session": {"id": "sess_fake", "object": "realtime.session"}})
+        appended = 0
+        tasks = set()
+        try:
+            while True:
+                message = json.loads(await websocket.receive_text())
+                kind = message.get("type")
+                if kind == "session.update":
+                    if message.get("session", {}).get("type") == "realtime":
+                        audio_event = "response.output_audio.delta"
+                    await send({"type": "session.updated", "session": message.get("session", {})})
+                elif kind == "input_audio_buffer.append":
+                    appended += 1
+                    if appended % app.state.frames_per_turn == 0:
+                        task = asyncio.create_task(respond(next(ids)))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+        except WebSocketDisconnect:
+            for task in tasks:
+                task.cancel()
+
+    return app
+
+
+def start_server(app, port=0):
+    """Run an ASGI app with uvicorn in a daemon thread; return (server, url)."""
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def start_fake_openai(latency=0.2, tool_calls=(), port=0):
+    """Start the fake Responses API; returns (server, base_url for the SDK)."""
+    server, url = start_server(create_app(latency=latency, tool_calls=tool_calls), port)
+    return server, f"{url}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tool-call", action="append", default=[])
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(latency=args.latency, tool_calls=args.tool_call),
+        host="127.0.0.1",
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
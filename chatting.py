@@ -1,48 +1,51 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from openai import OpenAI
 from datetime import datetime
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 # from zoneinfo import ZoneInfo 
-import numpy as np
  
 from dotenv import dotenv_values
 import json
-from googleapiclient.discovery import build
 # from googleapiclient.errors import HttpError
-from utils.helpers import  create_event, load_sessions, save_sessions, get_or_create_session
-from utils.google_calender_auth import get_credentials
+from utils.helpers import  build_event_body, create_event, to_rfc3339, SESSIONS_FILE
+from utils.google_calender_auth import get_calendar_service, new_calendar_batch, TOKEN_PATH
+from utils.event_cache import EventCache, parse_event_time
+from utils.calendar_writes import insert_events
+from utils.calendar_reads import CalendarReader
+from utils.domain_store import DomainStore, DEFAULT_USER_ID
+from utils.reminders import ReminderScheduler, resolve_due
+from utils.embeddings import EmbeddingService
+from utils.llm_client import clients_from_env
+from utils.model_router import ModelRouter
+from utils.vector_index import UserEntityIndexes
+from utils.matching import TwoStageMatcher
+from utils.context import ContextBuilder, make_llm_summarizer, open_session, save_turn, build_chat_input
+from utils.response_cache import ResponseCache
+from utils.intent_router import IntentRouter
+from utils import metrics
+from utils.metrics import record_usage
+from utils import tracing
+from utils.tracing import TracingMiddleware, span
 # from typing import Optional
 
 env_vars = dotenv_values(".env")
-OPENAI_API_KEY = env_vars.get("OPENAI_API_KEY")
-
-# def get_embedding(text: str):
-#     response = openai_client.embeddings.create(
-#         model="text-embedding-3-small",
-#         input=text
-#     )
-#     return response.data[0].embedding
-
-# def cosine_similarity(a, b):
-#     a = np.array(a)
-#     b = np.array(b)
-#     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-
-# def semantic_match(query, text, threshold=0.6):
-#     q_emb = get_embedding(query)
-#     t_emb = get_embedding(text)
-#     score = cosine_similarity(q_emb, t_emb)
-#     return score >= threshold, score
-
-meal_list = [
+
+# Sample data for the default user of a fresh database, loaded only when
+# SEED_SAMPLE_DATA=1 (local development and demos).
+SEED_MEALS = [
         {
             'date': '2026-01-16', 
             'time': '08:30', 
             'meal_type': 'breakfast', 
             'title': 'Oatmeal with Banana and Honey', 
             'description': 'A bowl of oatmeal topped with sliced banana and a drizzle of honey', 
-            'calories': 350, 
-            'id': 1
+            'calories': 350
         }, 
         {
             'date': '2026-01-16', 
@@ -50,29 +53,20 @@ meal_list = [
             'meal_type': 'lunch', 
             'title': 'rice & chicken', 
             'description': 'A bowl of rice and chicken curry', 
-            'calories': 500, 
-            'id': 2
+            'calories': 500
         }
     ]
-recipe_list = []
-reminder_list = []
-event_list = [
+SEED_EVENTS = [
     {
         'kind': 'calendar#event', 
-        'etag': '"3537114599200510"', 
-        'id': 'c1o2si7t698qeog2k3qn6roti4', 
+        'id': 'sampleteamsync01', 
         'status': 'confirmed', 
-        'htmlLink': 'https://www.google.com/calendar/event?eid=YzFvMnNpN3Q2OThxZW9nMmszcW42cm90aTQgYWxtb21lbnJleWFkMDJAbQ', 
-        'created': '2026-01-16T09:54:59.000Z', 
-        'updated': '2026-01-16T09:54:59.600Z', 
         'summary': 'Weekly Team Sync – Project Alpha Update', 
         'description': 'Team reviews progress on Project Alpha, discusses blockers and challenges, assigns next actions, and aligns on priorities for the upcoming week.',
-        'creator': {'email': 'almomenreyad02@gmail.com', 'self': True}, 
-        'organizer': {'email': 'almomenreyad02@gmail.com', 'self': True}, 
+        'creator': {'email': 'user@example.com', 'self': True}, 
+        'organizer': {'email': 'user@example.com', 'self': True}, 
         'start': {'dateTime': '2026-01-16T15:00:00+06:00', 'timeZone': 'Asia/Dhaka'},
         'end': {'dateTime': '2026-01-16T16:00:00+06:00', 'timeZone': 'Asia/Dhaka'},
-        'iCalUID': 'c1o2si7t698qeog2k3qn6roti4@google.com', 
-        'sequence': 0, 
         'reminders': 
             {
                 'useDefault': False, 
@@ -83,20 +77,14 @@ event_list = [
     },
     {
         'kind': 'calendar#event', 
-        'etag': '"3537115931493726"', 
-        'id': 'bahalmlc2datvm4vrm9le9j6kk', 
+        'id': 'sampletestmeet01', 
         'status': 'confirmed', 
-        'htmlLink': 'https://www.google.com/calendar/event?eid=YmFoYWxtbGMyZGF0dm00dnJtOWxlOWo2a2sgYWxtb21lbnJleWFkMDJAbQ', 
-        'created': '2026-01-16T10:06:05.000Z', 
-        'updated': '2026-01-16T10:06:05.746Z', 
         'summary': 'testing meeting', 
         'description': 'how to increase sell', 
-        'creator': {'email': 'almomenreyad02@gmail.com', 'self': True}, 
-        'organizer': {'email': 'almomenreyad02@gmail.com', 'self': True}, 
+        'creator': {'email': 'user@example.com', 'self': True}, 
+        'organizer': {'email': 'user@example.com', 'self': True}, 
         'start': {'dateTime': '2026-01-16T18:00:00+06:00', 'timeZone': 'Asia/Dhaka'}, 
         'end': {'dateTime': '2026-01-16T19:00:00+06:00', 'timeZone': 'Asia/Dhaka'},
-        'iCalUID': 'bahalmlc2datvm4vrm9le9j6kk@google.com', 
-        'sequence': 0, 
         'reminders': 
             {
                 'useDefault': False, 
@@ -106,7 +94,24 @@ event_list = [
         'date': '2026-01-16'
     }    
 ]
-note_list = []
+
+domain_store = DomainStore(env_vars.get("DOMAIN_DB_PATH", "assistant.db"))
+if env_vars.get("SEED_SAMPLE_DATA", "0") == "1" and domain_store.is_empty():
+    domain_store.add_meals(DEFAULT_USER_ID, SEED_MEALS)
+    domain_store.upsert_events(DEFAULT_USER_ID, SEED_EVENTS)
+
+event_cache = EventCache()
+# Tool calls of one response run concurrently; holding this from the conflict
+# check until the new event is in event_cache keeps two overlapping bookings
+# from both passing the check.
+calendar_write_lock = threading.Lock()
+# Identical concurrent window reads share one events.list call and its result.
+calendar_reader = CalendarReader(lambda: get_calendar_service(), ttl=float(env_vars.get("CALENDAR_READ_TTL", 30)))
+event_cache.load(domain_store.events(DEFAULT_USER_ID))
+
+# Timezone for reminder labels when the user has not given one.
+DEFAULT_TIMEZONE = env_vars.get("DEFAULT_TIMEZONE", "UTC")
+reminder_scheduler = ReminderScheduler(domain_store)
 
 
 def build_response(
@@ -130,8 +135,7 @@ def build_response(
 
 # def find_events(start_datetime: str, end_datetime: str, timezone: str):
 #     try:
-#         creds = get_credentials()
-#         service = build("calendar", "v3", credentials=creds)
+#         service = get_calendar_service()
 
 #         start_rfc3339 = to_rfc3339(start_datetime, timezone)
 #         end_rfc3339 = to_rfc3339(end_datetime, timezone)
@@ -167,22 +171,116 @@ def build_response(
 #     except HttpError as error:
 #         return {"status": "error", "error": str(error)}
 
-def schedule_event(summary: str, description:str, start_datetime:str, end_datetime:str, timezone:str, repeat:str="never", reminder:str="15 minutes", method:str="popup"):
+def find_events(start_datetime: str, end_datetime: str, timezone: str, query: str | None = None):
+    try:
+        events = calendar_reader.list_events(
+            to_rfc3339(start_datetime, timezone), to_rfc3339(end_datetime, timezone), timezone
+        )
+        if query:
+            words = query.lower().split()
+            events = [e for e in events if all(w in (e.get("summary") or "").lower() for w in words)]
+        return {
+            "status": "success",
+            "count": len(events),
+            "events": [
+                {
+                    "event_id": e["id"],
+                    "summary": e.get("summary"),
+                    "start": e["start"].get("dateTime") or e["start"].get("date"),
+                    "end": e["end"].get("dateTime") or e["end"].get("date"),
+                }
+                for e in events
+            ]
+        }
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+def schedule_event(summary: str, description:str, start_datetime:str, end_datetime:str, timezone:str, repeat:str="never", reminder:str="15 minutes", method:str="popup", user_id: str = DEFAULT_USER_ID):
     try:
-        creds = get_credentials()
-        service = build("calendar", "v3", credentials=creds)
-        event=create_event(service, summary=summary, description=description, start_datetime=start_datetime, end_datetime=end_datetime, timezone=timezone, repeat=repeat, reminder=reminder, method=method)
+        with calendar_write_lock:
+            conflicts = event_cache.find_conflicts(start_datetime, end_datetime, timezone)
+            if conflicts:
+                return {
+                    "status": "Conflict: there are already events scheduled during this time",
+                    "conflicts": [
+                        {"summary": e.get("summary"), "start": e["start"].get("dateTime"), "end": e["end"].get("dateTime")}
+                        for e in conflicts
+                    ]
+                }
+
+            service = get_calendar_service()
+            event=create_event(service, summary=summary, description=description, start_datetime=start_datetime, end_datetime=end_datetime, timezone=timezone, repeat=repeat, reminder=reminder, method=method)
        
-        dateTime = event['start'].get('dateTime')
-        date = dateTime.split("T")[0]
-        event["date"] = date
-        event_list.append(event)
+            dateTime = event['start'].get('dateTime')
+            date = dateTime.split("T")[0]
+            event["date"] = date
+            domain_store.upsert_event(user_id, event)
+            event_cache.upsert(event)
+        calendar_reader.changed()
+        event_indexes.add_later(user_id, event)
         print("Event scheduled:", event)
-        # Here you would typically save the meeting to a database or file
         return {"status": "Meeting scheduled successfully", "event": event}
     except Exception as e:
         return {"status": "Error scheduling meeting", "error": str(e)}
 
+def describe_conflict(event):
+    return {"summary": event.get("summary"), "start": event["start"].get("dateTime"), "end": event["end"].get("dateTime")}
+
+def schedule_events(events: list, user_id: str = DEFAULT_USER_ID):
+    """Schedule several events with batched Calendar inserts and report each one.
+
+    Items that overlap an existing event, or an earlier item of the same
+    request, are not sent. Failed inserts are retried on their own by
+    insert_events; whatever still fails is reported per item. Like
+    schedule_event, it holds calendar_write_lock from the conflict checks
+    until the created events are in event_cache.
+    """
+    results = [None] * len(events)
+    with calendar_write_lock:
+        bodies, positions, accepted = [], [], []
+        for i, item in enumerate(events):
+            try:
+                start = parse_event_time(item["start_datetime"], item["timezone"])
+                end = parse_event_time(item["end_datetime"], item["timezone"])
+                body = build_event_body(
+                    item["summary"], item.get("description", ""), item["start_datetime"], item["end_datetime"],
+                    item["timezone"], item.get("repeat") or "never", item.get("reminder") or "15 minutes",
+                    item.get("method") or "popup",
+                )
+            except (KeyError, ValueError, IndexError) as e:
+                results[i] = {"summary": item.get("summary"), "status": "invalid", "error": str(e)}
+                continue
+            conflicts = [describe_conflict(e) for e in event_cache.overlapping(start, end)]
+            conflicts += [describe_conflict(b) for s, e, b in accepted if e > start and s < end]
+            if conflicts:
+                results[i] = {"summary": item["summary"], "status": "conflict", "conflicts": conflicts}
+                continue
+            accepted.append((start, end, body))
+            bodies.append(body)
+            positions.append(i)
+
+        created = []
+        if bodies:
+            try:
+                outcomes = insert_events(get_calendar_service(), new_calendar_batch, bodies)
+            except Exception as e:
+                outcomes = [{"status": "failed", "error": str(e), "attempts": 0}] * len(bodies)
+            for i, body, outcome in zip(positions, bodies, outcomes):
+                if outcome["status"] == "created":
+                    event = outcome["event"]
+                    event["date"] = event["start"].get("dateTime", "").split("T")[0]
+                    created.append(event)
+                    results[i] = {"summary": event.get("summary"), "status": "created", "event_id": event["id"], "start": event["start"].get("dateTime")}
+                else:
+                    results[i] = {"summary": body["summary"], "status": "failed", "error": outcome["error"], "attempts": outcome["attempts"]}
+        if created:
+            domain_store.upsert_events(user_id, created)
+            event_cache.load(created)
+    if created:
+        calendar_reader.changed()
+        event_indexes.add_later(user_id, *created)
+    return {"status": f"{len(created)} of {len(events)} events scheduled", "results": results, "events": created}
+
 # def update_event(
 #     summary: str,
 #     date: str,
@@ -197,22 +295,10 @@ def schedule_event(summary: str, description:str, start_datetime:str, end_dateti
 # ):
 #     print(summary, date, new_summary, description, start_datetime, end_datetime, timezone, repeat, reminder, method)
 #     try:
-#         creds = get_credentials()
-#         service = build("calendar", "v3", credentials=creds)
+#         service = get_calendar_service()
 
 #         # ---------- 1. Find matching event ----------
-#         best_match = None
-#         best_score = 0.0
-
-#         for e in event_list:
-#             e_date = e["start"]["dateTime"].split("T")[0]
-#             if e_date == date:
-#                 matched, score = semantic_match(
-#                     summary, e.get("summary", ""), threshold=0.6
-#                 )
-#                 if matched and score > best_score:
-#                     best_match = e
-#                     best_score = score
+#         best_match, best_score = find_event(summary, date)
 
 #         if not best_match:
 #             return {
@@ -257,23 +343,11 @@ def schedule_event(summary: str, description:str, start_datetime:str, end_dateti
 #             "error": str(e)
 #         }
 
-# def delete_event(summary: str, date: str):
+# def delete_event(summary: str, date: str, user_id: str = DEFAULT_USER_ID):
 #     try:
-#         creds = get_credentials()
-#         service = build("calendar", "v3", credentials=creds)
+#         service = get_calendar_service()
         
-#         best_match = None
-#         best_score = 0.0
-
-#         for e in event_list:
-#             e_date = e["start"]["dateTime"].split("T")[0]
-#             if e_date == date:
-#                 matched, score = semantic_match(
-#                     summary, e.get("summary", ""), threshold=0.6
-#                 )
-#                 if matched and score > best_score:
-#                     best_match = e
-#                     best_score = score
+#         best_match, best_score = find_event(summary, date, user_id)
 
 #         if not best_match:
 #             return {
@@ -289,8 +363,10 @@ def schedule_event(summary: str, description:str, start_datetime:str, end_dateti
 #             eventId=event_id
 #         ).execute()
         
-#         # event must be removed from the database
-#         event_list.remove(best_match)
+#         domain_store.delete_event(user_id, event_id)
+#         event_cache.remove(event_id)
+#         calendar_reader.changed()
+#         event_indexes.remove(user_id, best_match)
 
 #         # print(f"Event of {summary} on {date} deleted.")
 #         return {"status": "Event deleted successfully", "event": best_match}
@@ -298,17 +374,17 @@ def schedule_event(summary: str, description:str, start_datetime:str, end_dateti
 #     except Exception as e:
 #         return {"status": "error", "error": str(e)}
     
-def save_list(title: str, items: list):
+def save_list(title: str, items: list, user_id: str = DEFAULT_USER_ID):
     note = {
         "title": title,
         "items": items,
     }
     
-    note_list.append(note)
-    # Here you would typically save the lists to a database or file
+    note = domain_store.add_note(user_id, note)
+    note_indexes.add_later(user_id, note)
     return {"status": "List saved successfully", "list": note}
 
-def add_meal(date: str, time: str, meal_type: str, title: str, description: str, calories: float):
+def add_meal(date: str, time: str, meal_type: str, title: str, description: str, calories: float, user_id: str = DEFAULT_USER_ID):
     meal_entry = {
         "date": date,
         "time": time,
@@ -318,14 +394,11 @@ def add_meal(date: str, time: str, meal_type: str, title: str, description: str,
         "calories": calories
     }
     
-    # meal_entry["id"] = len(meal_list) + 1
-    
-    meal_list.append(meal_entry)
-    print(meal_list)
-    # Here you would typically save the meal_entry to a database or file
+    meal_entry = domain_store.add_meal(user_id, meal_entry)
+    meal_indexes.add_later(user_id, meal_entry)
     return {"status": "Meal added successfully", "meal": meal_entry}
 
-def add_recipe(recipe_name: str, meal_type: str, cooking_time: float, description: str, ratings: float):
+def add_recipe(recipe_name: str, meal_type: str, cooking_time: float, description: str, ratings: float, user_id: str = DEFAULT_USER_ID):
     recipe_entry = {
         "recipe_name": recipe_name,
         "meal_type": meal_type,
@@ -334,38 +407,35 @@ def add_recipe(recipe_name: str, meal_type: str, cooking_time: float, descriptio
         "ratings": ratings
     }
     
-    # Here you would typically save the recipe_entry to a database or file
-    recipe_list.append(recipe_entry)
+    recipe_entry = domain_store.add_recipe(user_id, recipe_entry)
+    recipe_indexes.add_later(user_id, recipe_entry)
     return {"status": "Recipe added successfully", "recipe": recipe_entry} 
 
-def add_reminders(title: str, time: str):
+def add_reminders(title: str, time: str, timezone: str | None = None, user_id: str = DEFAULT_USER_ID):
     reminder_entry = {
         "title": title,
         "time": time
     }
     
-    # Here you would typically save the reminder_entry to a database or file
-    reminder_list.append(reminder_entry)
+    due_at = resolve_due(time, timezone or DEFAULT_TIMEZONE)
+    reminder_entry = domain_store.add_reminder(user_id, reminder_entry, due_at)
+    reminder_scheduler.schedule(user_id, reminder_entry, due_at)
     return {"status": "Reminder added successfully", "reminder": reminder_entry}
 
-# def delete_meal(date: str, meal_type: str, title: str):
-#     best_match = None
-#     best_score = 0.0
-    
-#     for meal in meal_list:
-#         if meal["date"] == date and meal["meal_type"] == meal_type:
-#             semantic_match_result, score = semantic_match(title, meal["title"], threshold=0.6)
-#             print(semantic_match_result, score)
-#             if semantic_match_result and score > best_score:
-#                 best_match = meal
-#                 best_score = score
+def get_meal_summary(start_date: str, end_date: str | None = None, user_id: str = DEFAULT_USER_ID):
+    summary = domain_store.meal_summary(user_id, start_date, end_date)
+    return {"status": "Meal summary", "summary": summary}
+
+# def delete_meal(date: str, meal_type: str, title: str, user_id: str = DEFAULT_USER_ID):
+#     best_match, best_score = find_meal(date, meal_type, title, user_id)
+#     print(best_match, best_score)
 
 #     if best_match is None:
 #         return {"status": f"Meal not found using the date {date}, meal type {meal_type}, and title {title}"}
     
-#     # Here you would typically delete the meal from a database or file
-#     meal_list.remove(best_match)
-#     print(meal_list)
+#     # Also takes the meal out of the calorie rollups.
+#     domain_store.delete_meal(user_id, best_match["id"])
+#     meal_indexes.remove(user_id, best_match)
 #     return {"status": "Meal deleted successfully", "meal": best_match}
  
 # def update_meal(
@@ -377,17 +447,10 @@ def add_reminders(title: str, time: str):
 #     new_meal_type: Optional[str] = None,
 #     new_title: Optional[str] = None,
 #     new_description: Optional[str] = None,
-#     new_calories: Optional[float] = None
+#     new_calories: Optional[float] = None,
+#     user_id: str = DEFAULT_USER_ID,
 # ):
-#     best_match = None
-#     best_score = 0.0
-    
-#     for meal in meal_list:
-#         if meal["date"] == date and meal["meal_type"] == meal_type:
-#             semantic_match_result, score = semantic_match(title, meal["title"], threshold=0.6)
-#             if semantic_match_result and score > best_score:
-#                 best_match = meal
-#                 best_score = score
+#     best_match, best_score = find_meal(date, meal_type, title, user_id)
     
 #     if best_match is None:
 #         return {"status": f"Meal not found using the date {date}, meal type {meal_type}, and title {title}"}
@@ -405,61 +468,86 @@ def add_reminders(title: str, time: str):
 #     if new_calories is not None:
 #         best_match["calories"] = new_calories
 
-#     print(meal_list)
-#     # Here you would typically update the meal in a database or file
+#     # Also moves the meal's calories between rollups when its date or type changed.
+#     best_match = domain_store.update_meal(user_id, best_match["id"], **best_match)
+#     meal_indexes.add_later(user_id, best_match)
 
 #     return {
 #         "status": "Meal updated successfully",
 #         "meal": best_match
 #     }
 
+EVENT_FIELDS = {
+    "summary" :{
+        "type": "string",
+        "description": "Summary of the meeting"
+    },
+    "description": {
+        "type": "string",
+        "description": "Description of the meeting"
+    },
+    "start_datetime": {
+        "type": "string",
+        "description": "Start date and time of the meeting in ISO 8601 format"
+    },
+    "end_datetime": {
+        "type": "string",
+        "description": "End date and time of the meeting in ISO 8601 format"
+    },
+    "timezone": {
+        "type": "string",
+        "description": "Timezone of the meeting"
+    },
+    "repeat": {
+        "type": "string",
+        "description": "Repeat frequency of the meeting (never, everyday, every_week, every_month)",
+        "enum": ["never", "everyday", "every_week", "every_month"]
+    },
+    "reminder": {
+        "type": "string",
+        "description": "Reminder time before the meeting (e.g., 15 minutes). The format is '<number> <unit>' where unit can be minutes, hours, days, or weeks.",
+    },
+    "method": {
+        "type": "string",
+        "description": "Reminder method (e.g., popup, email)",
+        "enum": ["popup", "email"]
+    }
+}
+REQUIRED_EVENT_FIELDS = ["summary", "description", "start_datetime", "end_datetime", "timezone"]
+
 tools = [
     {
         "type": "function",
         "name": "schedule_event",
         "description": "Schedule a meeting with specified description, start_datetime, end_datetime, and timezone.",
+        "parameters": {
+            "type": "object",
+            "properties": EVENT_FIELDS,
+            "required": REQUIRED_EVENT_FIELDS,
+            "additionalProperties": False,
+        },
+        # "strict": True,
+    },
+    {
+        "type": "function",
+        "name": "schedule_events",
+        "description": "Schedule several meetings in one call, e.g. a daily standup and a retro on Friday. Each event takes the same fields as schedule_event.",
         "parameters": {
             "type": "object",
             "properties": {
-                "summary" :{
-                    "type": "string",
-                    "description": "Summary of the meeting"
-                },
-                "description": {
-                    "type": "string",
-                    "description": "Description of the meeting"
-                },
-                "start_datetime": {
-                    "type": "string",
-                    "description": "Start date and time of the meeting in ISO 8601 format"
-                },
-                "end_datetime": {
-                    "type": "string",
-                    "description": "End date and time of the meeting in ISO 8601 format"
-                },
-                "timezone": {
-                    "type": "string",
-                    "description": "Timezone of the meeting"
-                },
-                "repeat": {
-                    "type": "string",
-                    "description": "Repeat frequency of the meeting (never, everyday, every_week, every_month)",
-                    "enum": ["never", "everyday", "every_week", "every_month"]
-                },
-                "reminder": {
-                    "type": "string",
-                    "description": "Reminder time before the meeting (e.g., 15 minutes). The format is '<number> <unit>' where unit can be minutes, hours, days, or weeks.",
+                "events": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": EVENT_FIELDS,
+                        "required": REQUIRED_EVENT_FIELDS,
+                        "additionalProperties": False,
+                    },
                 },
-                "method": {
-                    "type": "string",
-                    "description": "Reminder method (e.g., popup, email)",
-                    "enum": ["popup", "email"]
-                }
             },
-            "required": ["summary", "description", "start_datetime", "end_datetime", "timezone"],
+            "required": ["events"],
             "additionalProperties": False,
         },
-        # "strict": True,
     },
     # {
     #     "type": "function",
@@ -574,33 +662,37 @@ tools = [
                     "type": "string",
                     "description": "Time of the reminder in format",
                     "enum": ["today", "this week", "next week", "this month"]
+                },
+                "timezone": {
+                    "type": ["string", "null"],
+                    "description": "Timezone of the user (e.g. Asia/Dhaka), or null if unknown"
                 }
             },
-            "required": ["title", "time"],
+            "required": ["title", "time", "timezone"],
             "additionalProperties": False,
         },
         "strict": True
     },
-    # {
-    #     "type": "function",
-    #     "name": "find_events",
-    #     "description": "Find calendar events by date/time and optional title keywords.",
-    #     "parameters": {
-    #         "type": "object",
-    #         "properties": {
-    #             "start_datetime": { "type": "string" },
-    #             "end_datetime": { "type": "string" },
-    #             "timezone": { "type": "string" },
-    #             "query": {
-    #                 "type": "string",
-    #                 "description": "Optional meeting title or keywords"
-    #             }
-    #         },
-    #         "required": ["start_datetime", "end_datetime", "timezone"],
-    #         "additionalProperties": False
-    #     },
-    #     # "strict": False
-    # },
+    {
+        "type": "function",
+        "name": "find_events",
+        "description": "Find calendar events by date/time and optional title keywords.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start_datetime": { "type": "string", "description": "YYYY-MM-DDTHH:MM:SS" },
+                "end_datetime": { "type": "string", "description": "YYYY-MM-DDTHH:MM:SS" },
+                "timezone": { "type": "string" },
+                "query": {
+                    "type": ["string", "null"],
+                    "description": "Optional meeting title or keywords"
+                }
+            },
+            "required": ["start_datetime", "end_datetime", "timezone", "query"],
+            "additionalProperties": False
+        },
+        "strict": True
+    },
     {
         "type": "function",
         "name": "add_meal",
@@ -620,6 +712,21 @@ tools = [
         },
         "strict": False
     },
+    {
+        "type": "function",
+        "name": "get_meal_summary",
+        "description": "Get total calories and meal counts per day and meal type for a date range. Use this to answer questions about calories eaten today, this week, etc.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start_date": { "type": "string", "description": "First date in YYYY-MM-DD format" },
+                "end_date": { "type": "string", "description": "Last date in YYYY-MM-DD format (defaults to start_date)" }
+            },
+            "required": ["start_date"],
+            "additionalProperties": False
+        },
+        "strict": False
+    },
     # {
     #     "type": "function",
     #     "name": "delete_meal",
@@ -681,26 +788,130 @@ tools = [
 
 class ChatRequest(BaseModel):
     session_id: str | None = None
+    user_id: str | None = None
     message: str
 
 app = FastAPI()
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+app.add_middleware(TracingMiddleware)
+# Spans: "file:traces.jsonl" or an OTLP/HTTP collector URL; unset keeps them local.
+tracing.configure("chatting", env_vars.get("TRACE_EXPORT"))
 
-@app.post("/chat")
-def chat(request: ChatRequest):
-    sessions = load_sessions()
-    session_id = get_or_create_session(sessions, request.session_id)
+CALENDAR_SYNC_INTERVAL = int(env_vars.get("CALENDAR_SYNC_INTERVAL", 300))
 
-    conversation_text = ""
-    for m in sessions[session_id]:
-        conversation_text += f"User: {m['user_message']}\nAI: {m['ai_message']}\n"
-    conversation_text += f"User: {request.message}\nAI:"
 
-    now = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    system_prompt = f"""You are a smart AI assistant.
+async def calendar_sync_loop():
+    """Keep event_cache in step with Google Calendar via incremental sync."""
+    while True:
+        try:
+            with span("calendar.sync") as sync_span:
+                count = await asyncio.to_thread(event_cache.sync, get_calendar_service())
+                sync_span.set(events=count)
+            metrics.inc("calendar_syncs_total", result="ok")
+        except Exception as e:
+            metrics.inc("calendar_syncs_total", result="failed")
+            print(f"Calendar sync failed: {e}")
+        await asyncio.sleep(CALENDAR_SYNC_INTERVAL)
+
+
+@app.on_event("startup")
+async def start_calendar_sync():
+    # Without a saved token the first sync would start an interactive OAuth flow.
+    if CALENDAR_SYNC_INTERVAL > 0 and os.path.exists(TOKEN_PATH):
+        app.state.calendar_sync = asyncio.create_task(calendar_sync_loop())
+
+@app.on_event("startup")
+async def start_reminder_scheduler():
+    app.state.reminder_scheduler = asyncio.create_task(reminder_scheduler.run())
+
+openai_client, async_openai_client = clients_from_env(env_vars)
+embedding_service = EmbeddingService(
+    openai_client,
+    spill_path=env_vars.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+)
+
+
+# Nearest-title search per user and entity type, built from domain_store on
+# the first find_* lookup that needs embeddings. Until then the tool
+# functions' add_later calls are no-ops, so writes cost no embeddings calls.
+meal_indexes = UserEntityIndexes(
+    domain_store.meals,
+    embeddings=embedding_service,
+    text_of=lambda m: m["title"],
+    date_of=lambda m: m["date"],
+    meal_type_of=lambda m: m["meal_type"],
+)
+event_indexes = UserEntityIndexes(
+    domain_store.events,
+    embeddings=embedding_service,
+    text_of=lambda e: e.get("summary", ""),
+    date_of=lambda e: e.get("date"),
+)
+recipe_indexes = UserEntityIndexes(
+    domain_store.recipes,
+    embeddings=embedding_service,
+    text_of=lambda r: r["recipe_name"],
+    meal_type_of=lambda r: r["meal_type"],
+)
+note_indexes = UserEntityIndexes(domain_store.notes, embeddings=embedding_service, text_of=lambda n: n["title"])
+
+
+meal_matcher = TwoStageMatcher("meal", text_of=lambda m: m["title"])
+event_matcher = TwoStageMatcher("event", text_of=lambda e: e.get("summary", ""))
+
+
+def find_meal(date: str, meal_type: str, title: str, user_id: str = DEFAULT_USER_ID):
+    """Best meal on `date` with `meal_type` matching `title`, or (None, 0.0)."""
+    candidates = domain_store.meals(user_id, date=date, meal_type=meal_type)
+    return meal_matcher.match(
+        title, candidates, partial(meal_indexes.get, user_id), date=date, meal_type=meal_type
+    )
+
+
+def find_event(summary: str, date: str, user_id: str = DEFAULT_USER_ID):
+    """Best event on `date` matching `summary`, or (None, 0.0)."""
+    candidates = domain_store.events(user_id, date=date)
+    return event_matcher.match(summary, candidates, partial(event_indexes.get, user_id), date=date)
+
+
+# Chat turns and continuations of them go to models tagged "chat" (with
+# "tools") in OAI_CONFIG_LIST, the paraphrase acknowledging a write to the
+# cheaper "confirmation" ones and the history summarizer to the "summary" ones.
+model_router = ModelRouter.from_config_list(
+    required=("chat", "confirmation", "summary"),
+    latency_slack=float(env_vars.get("MODEL_LATENCY_SLACK", 0.5)),
+    cooldown=float(env_vars.get("MODEL_COOLDOWN", 30)),
+    probe_rate=float(env_vars.get("MODEL_PROBE_RATE", 0.05)),
+)
+
+# Independent tool calls from one response run side by side, up to this many at once.
+tool_executor = ThreadPoolExecutor(
+    max_workers=int(env_vars.get("TOOL_MAX_WORKERS", 8)),
+    thread_name_prefix="tool",
+)
+
+context_builder = ContextBuilder(
+    make_llm_summarizer(openai_client, model_router),
+    max_turns=int(env_vars.get("CONTEXT_MAX_TURNS", 20)),
+    token_budget=int(env_vars.get("CONTEXT_TOKEN_BUDGET", 4000)),
+)
+
+# Replies to repeated, non-action messages; RESPONSE_CACHE_TTL=0 turns it off.
+response_cache = ResponseCache(
+    ttl=int(env_vars.get("RESPONSE_CACHE_TTL", 0)),
+    max_entries=int(env_vars.get("RESPONSE_CACHE_SIZE", 1000)),
+)
+
+# Complete add_meal / add_reminders requests skip the LLM; INTENT_ROUTER=0 turns it off.
+intent_router = IntentRouter(
+    min_confidence=float(env_vars.get("INTENT_ROUTER_CONFIDENCE", 0.9))
+) if env_vars.get("INTENT_ROUTER", "1") != "0" else None
+
+CONFIRMATION_PROMPT = """Never mention the tool call or action in your response to the user. If any conflict in event or meeting scheduling, just only say please choose a different time. never mention that 'you will provide free times or something'. 
+                never tell user that you can update or delete anything. Just only show the results that you have done."""
+
+
+SYSTEM_PROMPT = """You are a smart AI assistant.
                 You can chat normally with the user.
-                Current server date & time: {now}
                 
                 If the user wants to know about their calendar events, then use the 'find_events' tool. Ask for date/time range and optional title keywords if not provided.
                 
@@ -717,7 +928,11 @@ def chat(request: ChatRequest):
                 In their scheduling time if you find any existing events during that time, inform the user and ask for a different time.
                 
                 After gathering all necessary information, use the 'schedule_event' tool 
-                to schedule the meeting.
+                to schedule the meeting. When the user asks for several events at once,
+                use the 'schedule_events' tool with all of them in a single call.
+                
+                If the user asks how much they have eaten (calories or meals over a day, week or
+                other range), use the 'get_meal_summary' tool instead of adding up meals yourself.
                 
                 If the user gives an important point like "remind me", 
                 "note this", "save this", "remember this", treat it as a note 
@@ -727,175 +942,584 @@ def chat(request: ChatRequest):
                 Do NOT guess missing details.
                 """
 
-    response = openai_client.responses.create(
-        model="gpt-4.1-2025-04-14",
-        input=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": conversation_text}
-        ],
-        tools=tools
-    )
-    
-    output = response.output_text
-    
-    meals = []
-    lists = []
-    reminders = []
-    events = []
-    recipes = []
-    
-    tool_call = None
-    for item in response.output:
-        if item.type == "function_call":
-            tool_call = item
-            break
-
-    if tool_call:
-        tool_name = tool_call.name
-        tool_args = json.loads(tool_call.arguments)
-
-        if tool_name == "schedule_event":
-            # existing_events = find_events(tool_args["start_datetime"], tool_args["end_datetime"], tool_args["timezone"])
-            # if existing_events["count"] > 0:
-            #     events_list = "\n".join(
-            #         [f"- {e['summary']} from {e['start']} to {e['end']}" for e in existing_events["events"]]
-            #     )
-            #     # print(events_list)
-            #     result  = f"There are already events scheduled during this time:\n{events_list}\nPlease choose a different time."
-            # else:
-                result = schedule_event(
-                    summary=tool_args["summary"],
-                    description=tool_args["description"],
-                    start_datetime=tool_args["start_datetime"],
-                    end_datetime=tool_args["end_datetime"],
-                    timezone=tool_args["timezone"],
-                    repeat=tool_args.get("repeat" , "never"),
-                    reminder=tool_args.get("reminder", "15 minutes"),
-                    method=tool_args.get("method", "popup")
-                )
-                print("Event scheduled:", result)
-                # result = scheduled_event["event"]
-                events.append(result["event"])
-                    
-        # elif tool_name == "find_events":
-        #     result = find_events(tool_args["start_datetime"], tool_args["end_datetime"], tool_args["timezone"])
-            
-        # elif tool_name == "update_event":
-        #     result = update_event(
-        #         summary=tool_args["summary"],
-        #         date=tool_args["date"],
-        #         new_summary=tool_args.get("new_summary"),
-        #         description=tool_args.get("description"),
-        #         start_datetime=tool_args.get("start_datetime"),
-        #         end_datetime=tool_args.get("end_datetime"),
-        #         timezone=tool_args.get("timezone"),
-        #         repeat=tool_args.get("repeat"),
-        #         reminder=tool_args.get("reminder"),
-        #         method=tool_args.get("method")
-        #     )
-        #     # if result["status"] == "success":
-        #     #     events.append(result["event"])
-        
-        # elif tool_name == "delete_event":
-        #     result = delete_event(
-        #         summary=tool_args["summary"],
-        #         date=tool_args["date"]
+
+def lookup_cached_reply(user_id, context, message):
+    """(cache key, cached reply or None) for this turn."""
+    previous_reply = context.turns[-1]["ai_message"] if context.turns else None
+    return response_cache.lookup(user_id, message, previous_reply)
+
+
+def remember_reply(user_id, cache_key, tool_calls, output, started):
+    """Cache a tool-free reply; a turn that ran tools invalidates the user's entries."""
+    response_cache.record(user_id, cache_key, output, time.perf_counter() - started, ran_tools=bool(tool_calls))
+
+
+def build_confirmation_input(results):
+    return [
+        {"role": "system", "content": CONFIRMATION_PROMPT},
+        {"role": "user", "content": "\n".join(f"Action completed: {result}" for result in results)}
+    ]
+
+
+# How the reply after a tool call is produced, per tool:
+#   template     - render a fixed sentence locally, no LLM call
+#   llm          - separate "Action completed: ..." paraphrase call
+#   continuation - function_call_output continuation of the same response;
+#                  read tools use it so the answer is written with the question in view
+DEFAULT_CONFIRMATION_MODES = {
+    "schedule_event": "llm",
+    "find_events": "continuation",
+    "schedule_events": "llm",
+    "save_list": "template",
+    "add_meal": "template",
+    "add_recipe": "template",
+    "add_reminders": "template",
+    "get_meal_summary": "continuation",
+}
+
+CONFIRMATION_TEMPLATES = {
+    "add_meal": lambda r: "Added {title} to your {meal_type} on {date} at {time} ({calories} kcal).".format(**r["meal"]),
+    "save_list": lambda r: "Saved your list \"{}\": {}.".format(r["list"]["title"], ", ".join(r["list"]["items"])),
+    "add_recipe": lambda r: "Added the recipe {recipe_name} to your {meal_type} recipes ({cooking_time} min, rated {ratings}/5).".format(**r["recipe"]),
+    "add_reminders": lambda r: "I'll remind you to {title} {time}.".format(**r["reminder"]),
+}
+
+
+def parse_confirmation_modes(spec):
+    """Apply overrides like "add_meal=llm,schedule_event=continuation"."""
+    modes = dict(DEFAULT_CONFIRMATION_MODES)
+    for part in (spec or "").split(","):
+        if "=" in part:
+            tool_name, mode = part.split("=", 1)
+            modes[tool_name.strip()] = mode.strip()
+    return modes
+
+
+CONFIRMATION_MODES = parse_confirmation_modes(env_vars.get("CONFIRMATION_MODES"))
+
+
+def render_confirmation(tool_name, result):
+    """Deterministic confirmation text, or None when the tool has no template or failed."""
+    template = CONFIRMATION_TEMPLATES.get(tool_name)
+    if template is None:
+        return None
+    try:
+        # Failed calls carry no payload key, so they fall back to the LLM.
+        return template(result)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def plan_confirmation(tool_calls, results):
+    """Split tool results by how their confirmation is produced.
+
+    Returns (template_text, llm_results, continue_response). Continuations
+    must answer every pending call, so one tool asking for it sends all
+    results through the continuation, which then confirms them all; no
+    template text is rendered alongside it.
+    """
+    if any(CONFIRMATION_MODES.get(tool_call.name, "llm") == "continuation" for tool_call in tool_calls):
+        return "", list(results), True
+    rendered = []
+    llm_results = []
+    for tool_call, result in zip(tool_calls, results):
+        mode = CONFIRMATION_MODES.get(tool_call.name, "llm")
+        text = render_confirmation(tool_call.name, result) if mode == "template" else None
+        if text is not None:
+            rendered.append(text)
+        else:
+            llm_results.append(result)
+    return "\n".join(rendered), llm_results, False
+
+
+def build_continuation_input(tool_calls, results):
+    return [
+        {"type": "function_call_output", "call_id": tool_call.call_id, "output": json.dumps(result, default=str)}
+        for tool_call, result in zip(tool_calls, results)
+    ]
+
+
+def confirmation_request(response, tool_calls, results, llm_results, continue_response):
+    """Keyword arguments for the follow-up responses.create call."""
+    if continue_response:
+        return {
+            "previous_response_id": response.id,
+            "instructions": CONFIRMATION_PROMPT,
+            "input": build_continuation_input(tool_calls, results),
+        }
+    return {"input": build_confirmation_input(llm_results)}
+
+
+def confirmation_tag(continue_response):
+    """Model tag for the follow-up call.
+
+    A continuation answers the user from tool results (events found, a meal
+    summary), which is chat work; "confirmation" models only acknowledge writes.
+    """
+    return "chat" if continue_response else "confirmation"
+
+
+def join_output(*parts):
+    return "\n".join(part for part in parts if part)
+
+
+def get_tool_calls(response):
+    return [item for item in response.output if item.type == "function_call"]
+
+
+def execute_tool_call(tool_name, tool_args, collected, user_id=DEFAULT_USER_ID):
+    """Run one tool and add its output to the matching `collected` list."""
+    result = None
+    if tool_name == "schedule_event":
+        # existing_events = find_events(tool_args["start_datetime"], tool_args["end_datetime"], tool_args["timezone"])
+        # if existing_events["count"] > 0:
+        #     events_list = "\n".join(
+        #         [f"- {e['summary']} from {e['start']} to {e['end']}" for e in existing_events["events"]]
         #     )
-                       
-        elif tool_name == "save_list":
-            result = save_list(
-                title=tool_args["title"],
-                items=tool_args["items"]
-            )
-            lists.append(result["list"])
-            
-        elif tool_name == "add_meal":
-            result = add_meal(
-                date=tool_args["date"],
-                time=tool_args["time"],
-                meal_type=tool_args["meal_type"],
-                title=tool_args["title"],
+        #     # print(events_list)
+        #     result  = f"There are already events scheduled during this time:\n{events_list}\nPlease choose a different time."
+        # else:
+            result = schedule_event(
+                summary=tool_args["summary"],
                 description=tool_args["description"],
-                calories=tool_args["calories"]
+                start_datetime=tool_args["start_datetime"],
+                end_datetime=tool_args["end_datetime"],
+                timezone=tool_args["timezone"],
+                repeat=tool_args.get("repeat" , "never"),
+                reminder=tool_args.get("reminder", "15 minutes"),
+                method=tool_args.get("method", "popup"),
+                user_id=user_id
             )
-            meals.append(result["meal"])
-            # print("Meal added:", result)
+            print("Event scheduled:", result)
+            # result = scheduled_event["event"]
+            if "event" in result:
+                collected["events"].append(result["event"])
+                
+    elif tool_name == "find_events":
+        result = find_events(
+            tool_args["start_datetime"],
+            tool_args["end_datetime"],
+            tool_args["timezone"],
+            tool_args.get("query"),
+        )
+
+    elif tool_name == "schedule_events":
+        result = schedule_events(tool_args["events"], user_id=user_id)
+        collected["events"].extend(result["events"])
         
-        # elif tool_name == "delete_meal":
-        #     result = delete_meal(
-        #         date=tool_args["date"],
-        #         meal_type=tool_args["meal_type"],
-        #         title=tool_args["title"]
-        #     )
-            
-        # elif tool_name == "update_meal":
-        #     result = update_meal(
-        #         date=tool_args["date"],
-        #         meal_type=tool_args["meal_type"],
-        #         title=tool_args["title"],
-        #         new_date=tool_args.get("new_date"),
-        #         new_time=tool_args.get("new_time"),
-        #         new_meal_type=tool_args.get("new_meal_type"),
-        #         new_title=tool_args.get("new_title"),
-        #         new_description=tool_args.get("new_description"),
-        #         new_calories=tool_args.get("new_calories")
-        #     )
-        #     # if result["meal"] :
-        #     #     meals.append(result["meal"])
+    # elif tool_name == "update_event":
+    #     result = update_event(
+    #         summary=tool_args["summary"],
+    #         date=tool_args["date"],
+    #         new_summary=tool_args.get("new_summary"),
+    #         description=tool_args.get("description"),
+    #         start_datetime=tool_args.get("start_datetime"),
+    #         end_datetime=tool_args.get("end_datetime"),
+    #         timezone=tool_args.get("timezone"),
+    #         repeat=tool_args.get("repeat"),
+    #         reminder=tool_args.get("reminder"),
+    #         method=tool_args.get("method")
+    #     )
+    #     # if result["status"] == "success":
+    #     #     collected["events"].append(result["event"])
+    
+    # elif tool_name == "delete_event":
+    #     result = delete_event(
+    #         summary=tool_args["summary"],
+    #         date=tool_args["date"]
+    #     )
+                   
+    elif tool_name == "save_list":
+        result = save_list(
+            title=tool_args["title"],
+            items=tool_args["items"],
+            user_id=user_id
+        )
+        collected["lists"].append(result["list"])
         
-        #     # print(meal_list)
-            
-        elif tool_name == "add_recipe":
-            result = add_recipe(
-                recipe_name=tool_args["recipe_name"],
-                meal_type=tool_args["meal_type"],
-                cooking_time=tool_args["cooking_time"],
-                description=tool_args["description"],
-                ratings=tool_args["ratings"]
-            )
-            recipes.append(result["recipe"])
-            # print("Recipe added:", result)       
-         
-        elif tool_name == "add_reminders":
-            result = add_reminders(
-                title=tool_args["title"],
-                time=tool_args["time"]
-            )
-            reminders.append(result["reminder"])
-               
-        final_response = openai_client.responses.create(
-            model="gpt-4.1-2025-04-14",
-            # input=f"Action completed: {result}"
-            input=[
-                {"role": "system", "content": """Never mention the tool call or action in your response to the user. If any conflict in event or meeting scheduling, just only say please choose a different time. never mention that 'you will provide free times or something'. 
-                never tell user that you can update or delete anything. Just only show the results that you have done."""},
-                {"role": "user", "content": f"Action completed: {result}"}
-            ],
+    elif tool_name == "add_meal":
+        result = add_meal(
+            date=tool_args["date"],
+            time=tool_args["time"],
+            meal_type=tool_args["meal_type"],
+            title=tool_args["title"],
+            description=tool_args["description"],
+            calories=tool_args["calories"],
+            user_id=user_id
+        )
+        collected["meals"].append(result["meal"])
+        # print("Meal added:", result)
+    
+    elif tool_name == "get_meal_summary":
+        result = get_meal_summary(
+            start_date=tool_args["start_date"],
+            end_date=tool_args.get("end_date"),
+            user_id=user_id
         )
+
+    # elif tool_name == "delete_meal":
+    #     result = delete_meal(
+    #         date=tool_args["date"],
+    #         meal_type=tool_args["meal_type"],
+    #         title=tool_args["title"]
+    #     )
         
-        output = output + "\n" + final_response.output_text 
-            
-        # print(note_storage_list)
+    # elif tool_name == "update_meal":
+    #     result = update_meal(
+    #         date=tool_args["date"],
+    #         meal_type=tool_args["meal_type"],
+    #         title=tool_args["title"],
+    #         new_date=tool_args.get("new_date"),
+    #         new_time=tool_args.get("new_time"),
+    #         new_meal_type=tool_args.get("new_meal_type"),
+    #         new_title=tool_args.get("new_title"),
+    #         new_description=tool_args.get("new_description"),
+    #         new_calories=tool_args.get("new_calories")
+    #     )
+    #     # if result["meal"] :
+    #     #     collected["meals"].append(result["meal"])
+    
         
-    conversation_entry = {
-        "user_message": request.message,
-        "ai_message": output,
-    }
+    elif tool_name == "add_recipe":
+        result = add_recipe(
+            recipe_name=tool_args["recipe_name"],
+            meal_type=tool_args["meal_type"],
+            cooking_time=tool_args["cooking_time"],
+            description=tool_args["description"],
+            ratings=tool_args["ratings"],
+            user_id=user_id
+        )
+        collected["recipes"].append(result["recipe"])
+        # print("Recipe added:", result)       
+     
+    elif tool_name == "add_reminders":
+        result = add_reminders(
+            title=tool_args["title"],
+            time=tool_args["time"],
+            timezone=tool_args.get("timezone"),
+            user_id=user_id
+        )
+        collected["reminders"].append(result["reminder"])
+
+    return result
+
+
+def empty_collected():
+    return {"meals": [], "lists": [], "reminders": [], "events": [], "recipes": []}
+
+
+def run_tool_call(tool_call, user_id=DEFAULT_USER_ID):
+    """Execute one function call in isolation; returns (result, collected)."""
+    collected = empty_collected()
+    with span("tool", tool=tool_call.name) as tool_span:
+        try:
+            result = execute_tool_call(tool_call.name, json.loads(tool_call.arguments), collected, user_id)
+        except Exception as e:
+            result = {"status": "error", "tool": tool_call.name, "error": str(e)}
+            tool_span.set(error=str(e))
+    return result, collected
+
+
+def merge_tool_outcomes(outcomes):
+    """Combine (result, collected) pairs, keeping the model's call order."""
+    results = []
+    collected = empty_collected()
+    for result, partial in outcomes:
+        results.append(result)
+        for key, items in partial.items():
+            collected[key].extend(items)
+    return results, collected
+
+
+def execute_tool_calls(tool_calls, user_id=DEFAULT_USER_ID):
+    """Run every function call of a response concurrently."""
+    with span("tools", count=len(tool_calls)):
+        futures = [
+            tool_executor.submit(tracing.bind(run_tool_call), tool_call, user_id) for tool_call in tool_calls
+        ]
+        return merge_tool_outcomes(future.result() for future in futures)
+
+
+async def execute_tool_calls_async(tool_calls, user_id=DEFAULT_USER_ID):
+    loop = asyncio.get_running_loop()
+    with span("tools", count=len(tool_calls)):
+        outcomes = await asyncio.gather(
+            *(
+                loop.run_in_executor(tool_executor, tracing.bind(run_tool_call), tool_call, user_id)
+                for tool_call in tool_calls
+            )
+        )
+    return merge_tool_outcomes(outcomes)
+
+
+def awaiting_reply(context):
+    """True when the last AI message asked the user something.
+
+    That covers confirmations ("Should I book it anyway?") and tool turns the
+    model left unfinished to ask for missing details; the next message is an
+    answer that only makes sense with the conversation, so it is not routed.
+    """
+    return bool(context.turns) and context.turns[-1]["ai_message"].rstrip().endswith("?")
+
+
+def dispatch_routed(message, user_id, context):
+    """Run a tool the intent router resolved locally.
+
+    Returns (reply, collected), or None when the message should go to the
+    LLM instead.
+    """
+    if intent_router is None:
+        return None
+    if awaiting_reply(context):
+        metrics.inc("intent_router_total", intent="none", result="skipped")
+        return None
+    route = intent_router.route(message)
+    if route is None:
+        return None
+    collected = empty_collected()
+    with span("tool", tool=route.tool_name, routed=True) as tool_span:
+        try:
+            result = execute_tool_call(route.tool_name, route.args, collected, user_id)
+        except Exception as e:
+            tool_span.set(error=str(e))
+            metrics.inc("intent_router_total", intent=route.tool_name, result="failed")
+            return None
+    reply = render_confirmation(route.tool_name, result)
+    if reply is None:
+        return None
+    response_cache.mark_changed(user_id)
+    return reply, collected
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def iter_text_deltas(stream, completed):
+    """Yield text deltas from a streamed response.
+
+    The final Response object is stored in `completed["response"]`.
+    """
+    async for event in stream:
+        if event.type == "response.output_text.delta":
+            yield event.delta
+        elif event.type == "response.completed":
+            completed["response"] = event.response
+
+
+@app.post("/chat")
+def chat(request: ChatRequest):
+    sessions, session_id, context = open_session(context_builder, SESSIONS_FILE, request.session_id)
+    user_id = request.user_id or DEFAULT_USER_ID
+
+    routed = dispatch_routed(request.message, user_id, context)
+    if routed is not None:
+        output, collected = routed
+        save_turn(sessions, SESSIONS_FILE, session_id, request.message, output)
+        return build_response(session_id=session_id, ai_message=output, **collected)
+
+    cache_key, cached_reply = lookup_cached_reply(user_id, context, request.message)
+    if cached_reply is not None:
+        save_turn(sessions, SESSIONS_FILE, session_id, request.message, cached_reply)
+        return build_response(session_id=session_id, ai_message=cached_reply)
+
+    started = time.perf_counter()
+    chat_input = build_chat_input(SYSTEM_PROMPT, context, request.message)
+    with span("llm.chat"):
+        response = model_router.call(
+            "chat",
+            lambda model: openai_client.responses.create(model=model, input=chat_input, tools=tools),
+            tools=True,
+        )
+    
+    output = response.output_text
+    record_usage(response, app="chatting", call="chat")
+    collected = empty_collected()
     
-    sessions[session_id].append(conversation_entry)
-    save_sessions(sessions)
+    tool_calls = get_tool_calls(response)
+    if tool_calls:
+        results, collected = execute_tool_calls(tool_calls, user_id)
+        template_text, llm_results, continue_response = plan_confirmation(tool_calls, results)
+        confirmation_text = ""
+        if llm_results:
+            request_args = confirmation_request(response, tool_calls, results, llm_results, continue_response)
+            with span("llm.confirmation"):
+                final_response = model_router.call(
+                    confirmation_tag(continue_response),
+                    lambda model: openai_client.responses.create(model=model, **request_args),
+                )
+            confirmation_text = final_response.output_text
+            record_usage(final_response, app="chatting", call="confirmation")
+        
+        output = join_output(output, template_text, confirmation_text)
+        
+    remember_reply(user_id, cache_key, tool_calls, output, started)
+    save_turn(sessions, SESSIONS_FILE, session_id, request.message, output)
     
     # return {
     #     "session_id": session_id,
     #     "response": output
     # }
     
-    return build_response(
-        session_id=session_id,
-        ai_message=output,
-        meals=meals,
-        lists=lists,
-        reminders=reminders,
-        events=events,
-        recipes=recipes
-)
+    return build_response(session_id=session_id, ai_message=output, **collected)
+
+
+@app.post("/chat/async")
+async def chat_async(request: ChatRequest):
+    """Same as /chat, but never blocks a worker thread while waiting.
+
+    LLM calls go through the async client; session I/O and tool execution
+    (e.g. the Google Calendar insert) are offloaded to threads.
+    """
+    sessions, session_id, context = await asyncio.to_thread(open_session, context_builder, SESSIONS_FILE, request.session_id)
+    user_id = request.user_id or DEFAULT_USER_ID
+
+    routed = await asyncio.to_thread(dispatch_routed, request.message, user_id, context)
+    if routed is not None:
+        output, collected = routed
+        await asyncio.to_thread(save_turn, sessions, SESSIONS_FILE, session_id, request.message, output)
+        return build_response(session_id=session_id, ai_message=output, **collected)
+
+    cache_key, cached_reply = lookup_cached_reply(user_id, context, request.message)
+    if cached_reply is not None:
+        await asyncio.to_thread(save_turn, sessions, SESSIONS_FILE, session_id, request.message, cached_reply)
+        return build_response(session_id=session_id, ai_message=cached_reply)
+
+    started = time.perf_counter()
+    chat_input = build_chat_input(SYSTEM_PROMPT, context, request.message)
+    with span("llm.chat"):
+        response = await model_router.acall(
+            "chat",
+            lambda model: async_openai_client.responses.create(model=model, input=chat_input, tools=tools),
+            tools=True,
+        )
+    
+    output = response.output_text
+    record_usage(response, app="chatting", call="chat")
+    collected = empty_collected()
+    
+    tool_calls = get_tool_calls(response)
+    if tool_calls:
+        results, collected = await execute_tool_calls_async(tool_calls, user_id)
+        template_text, llm_results, continue_response = plan_confirmation(tool_calls, results)
+        confirmation_text = ""
+        if llm_results:
+            request_args = confirmation_request(response, tool_calls, results, llm_results, continue_response)
+            with span("llm.confirmation"):
+                final_response = await model_router.acall(
+                    confirmation_tag(continue_response),
+                    lambda model: async_openai_client.responses.create(model=model, **request_args),
+                )
+            confirmation_text = final_response.output_text
+            record_usage(final_response, app="chatting", call="confirmation")
+        
+        output = join_output(output, template_text, confirmation_text)
+        
+    remember_reply(user_id, cache_key, tool_calls, output, started)
+    await asyncio.to_thread(save_turn, sessions, SESSIONS_FILE, session_id, request.message, output)
+    
+    return build_response(session_id=session_id, ai_message=output, **collected)
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the reply as server-sent events.
+
+    `token` events carry text deltas as soon as the model produces them, and a
+    closing `final` event carries the same payload /chat returns. The turn is
+    saved once the stream has finished.
+    """
+    sessions, session_id, context = await asyncio.to_thread(open_session, context_builder, SESSIONS_FILE, request.session_id)
+    user_id = request.user_id or DEFAULT_USER_ID
+    routed = await asyncio.to_thread(dispatch_routed, request.message, user_id, context)
+    cache_key, cached_reply = (None, None) if routed else lookup_cached_reply(user_id, context, request.message)
+
+    async def events():
+        if routed is not None or cached_reply is not None:
+            output, collected = routed or (cached_reply, empty_collected())
+            yield sse_event("token", {"delta": output})
+            await asyncio.to_thread(save_turn, sessions, SESSIONS_FILE, session_id, request.message, output)
+            yield sse_event("final", build_response(session_id=session_id, ai_message=output, **collected))
+            return
+
+        parts = []
+        collected = empty_collected()
+        completed = {}
+        tool_calls = []
+        started = time.perf_counter()
+        try:
+            chat_input = build_chat_input(SYSTEM_PROMPT, context, request.message)
+            with span("llm.chat", stream=True):
+                stream = await model_router.acall(
+                    "chat",
+                    lambda model: async_openai_client.responses.create(
+                        model=model, input=chat_input, tools=tools, stream=True
+                    ),
+                    tools=True,
+                )
+                async for delta in iter_text_deltas(stream, completed):
+                    parts.append(delta)
+                    yield sse_event("token", {"delta": delta})
+
+            if completed:
+                record_usage(completed["response"], app="chatting", call="chat")
+            tool_calls = get_tool_calls(completed["response"]) if completed else []
+            if tool_calls:
+                results, collected = await execute_tool_calls_async(tool_calls, user_id)
+                template_text, llm_results, continue_response = plan_confirmation(tool_calls, results)
+                if template_text:
+                    delta = ("\n" if parts else "") + template_text
+                    parts.append(delta)
+                    yield sse_event("token", {"delta": delta})
+
+                if llm_results:
+                    if parts:
+                        parts.append("\n")
+                        yield sse_event("token", {"delta": "\n"})
+                    confirmed = {}
+                    request_args = confirmation_request(
+                        completed["response"], tool_calls, results, llm_results, continue_response
+                    )
+                    with span("llm.confirmation", stream=True):
+                        stream = await model_router.acall(
+                            confirmation_tag(continue_response),
+                            lambda model: async_openai_client.responses.create(model=model, **request_args, stream=True),
+                        )
+                        async for delta in iter_text_deltas(stream, confirmed):
+                            parts.append(delta)
+                            yield sse_event("token", {"delta": delta})
+                    if confirmed:
+                        record_usage(confirmed["response"], app="chatting", call="confirmation")
+        except Exception as e:
+            yield sse_event("error", {"session_id": session_id, "error": str(e)})
+            return
+
+        output = "".join(parts)
+        remember_reply(user_id, cache_key, tool_calls, output, started)
+        await asyncio.to_thread(save_turn, sessions, SESSIONS_FILE, session_id, request.message, output)
+        yield sse_event("final", build_response(session_id=session_id, ai_message=output, **collected))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/meals/summary")
+def meals_summary(start_date: str | None = None, end_date: str | None = None, user_id: str = DEFAULT_USER_ID):
+    """Daily calorie and meal totals; the range defaults to today."""
+    start_date = start_date or datetime.now().strftime("%Y-%m-%d")
+    return domain_store.meal_summary(user_id, start_date, end_date)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus exposition: counters plus span_duration_seconds histograms per stage and tool."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/models")
+def get_model_stats():
+    """Rolling latency, error rate and health of every configured model."""
+    return model_router.snapshot()
@@ -1,62 +1,63 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from openai import OpenAI
-from datetime import datetime
+import asyncio
 from dotenv import dotenv_values
-import json
-import uuid
-import os
+from utils.context import ContextBuilder, make_llm_summarizer, open_session, save_turn, build_chat_input
+from utils.embeddings import EmbeddingService
+from utils.llm_client import clients_from_env
+from utils.model_router import ModelRouter
+from utils.semantic_cache import SemanticCache
+from utils import metrics
+from utils.metrics import record_usage
+from utils import tracing
+from utils.tracing import TracingMiddleware, span
 
 env_vars = dotenv_values(".env")
-OPENAI_API_KEY = env_vars.get("OPENAI_API_KEY")
 
 class ChatRequest(BaseModel):
     session_id: str | None = None
     message: str
 
 app = FastAPI()
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+app.add_middleware(TracingMiddleware)
+tracing.configure("emotional_chatting", env_vars.get("TRACE_EXPORT"))
+openai_client, async_openai_client = clients_from_env(env_vars)
 
 SESSIONS_FILE = "emotional_chat.json"
 
-def load_sessions():
-    """Load all chat sessions from file."""
-    if os.path.exists(SESSIONS_FILE):
-        with open(SESSIONS_FILE, "r") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-    return {}
-
-def save_sessions(sessions):
-    """Save all chat sessions to file."""
-    with open(SESSIONS_FILE, "w") as f:
-        json.dump(sessions, f, indent=2)
-
-def get_or_create_session(sessions, session_id=None):
-    """Return existing session if found, otherwise create a new one."""
-    if session_id and session_id in sessions:
-        return session_id
-    new_id = session_id or str(uuid.uuid4())
-    sessions[new_id] = []
-    return new_id
+# Replies come from models tagged "emotional" in OAI_CONFIG_LIST, preferred in list
+# order; history summaries from the "summary" ones.
+model_router = ModelRouter.from_config_list(
+    required=("emotional", "summary"),
+    latency_slack=float(env_vars.get("MODEL_LATENCY_SLACK", 0.5)),
+    cooldown=float(env_vars.get("MODEL_COOLDOWN", 30)),
+    probe_rate=float(env_vars.get("MODEL_PROBE_RATE", 0.05)),
+)
 
-@app.post("/chat")
-def chat(request: ChatRequest):
-    sessions = load_sessions()
-    session_id = get_or_create_session(sessions, request.session_id)
+context_builder = ContextBuilder(
+    make_llm_summarizer(openai_client, model_router),
+    max_turns=int(env_vars.get("CONTEXT_MAX_TURNS", 20)),
+    token_budget=int(env_vars.get("CONTEXT_TOKEN_BUDGET", 4000)),
+)
 
-    conversation_text = ""
-    for m in sessions[session_id]:
-        conversation_text += f"User: {m['user_message']}\nAI: {m['ai_message']}\n"
-    conversation_text += f"User: {request.message}\nAI:"
+embedding_service = EmbeddingService(
+    openai_client,
+    spill_path=env_vars.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+)
+# Replies to the opening message of a session, which has no history and so
+# depends on the message alone. A hit hands one user's reply to another
+# user's similar message, so it is off unless SEMANTIC_CACHE_SIZE is set.
+semantic_cache = SemanticCache(
+    embedding_service,
+    threshold=float(env_vars.get("SEMANTIC_CACHE_THRESHOLD", 0.95)),
+    max_entries=int(env_vars.get("SEMANTIC_CACHE_SIZE", 0)),
+    name="emotional",
+)
 
-    now = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    system_prompt = f"""You are a smart AI assistant. Your name is Breya.
+
+SYSTEM_PROMPT = """You are a smart AI assistant. Your name is Breya.
                 You can chat normally with the user.
-                Current server date & time: {now}
                 
                 Based on the user message, emotion you  need to respond accordingly.
                 If the user seems sad, respond with empathy and encouragement.
@@ -65,28 +66,80 @@ def chat(request: ChatRequest):
                 Your goal is to support the user emotionally and mentally.
                 """
 
+
+def is_stateless(context):
+    """True for a turn the model sees without any earlier conversation."""
+    return not context.summary and not context.turns
+
+
+@app.post("/chat")
+def chat(request: ChatRequest):
+    sessions, session_id, context = open_session(context_builder, SESSIONS_FILE, request.session_id)
+    stateless = is_stateless(context)
     
-    response = openai_client.responses.create(
-        model="gpt-5.2",
-        input=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": conversation_text}
-        ],
-    )
+    output = semantic_cache.lookup(request.message) if stateless else None
+    if output is None:
+        chat_input = build_chat_input(SYSTEM_PROMPT, context, request.message)
+        with span("llm.chat"):
+            response = model_router.call(
+                "emotional",
+                lambda model: openai_client.responses.create(model=model, input=chat_input),
+            )
+        
+        output = response.output_text
+        record_usage(response, app="emotional_chatting", call="chat")
+        if stateless:
+            semantic_cache.store(request.message, output)
     
-    output = response.output_text
+    save_turn(sessions, SESSIONS_FILE, session_id, request.message, output)
     
-    conversation_entry = {
-        "user_message": request.message,
-        "ai_message": output,
+    return {
+        "session_id": session_id,
+        "response": output
     }
+
+
+@app.post("/chat/async")
+async def chat_async(request: ChatRequest):
+    """Same as /chat, with the LLM call awaited and session I/O offloaded."""
+    sessions, session_id, context = await asyncio.to_thread(open_session, context_builder, SESSIONS_FILE, request.session_id)
+    stateless = is_stateless(context)
     
-    sessions[session_id].append(conversation_entry)
-    save_sessions(sessions)
+    output = await asyncio.to_thread(semantic_cache.lookup, request.message) if stateless else None
+    if output is None:
+        chat_input = build_chat_input(SYSTEM_PROMPT, context, request.message)
+        with span("llm.chat"):
+            response = await model_router.acall(
+                "emotional",
+                lambda model: async_openai_client.responses.create(model=model, input=chat_input),
+            )
+        
+        output = response.output_text
+        record_usage(response, app="emotional_chatting", call="chat")
+        if stateless:
+            await asyncio.to_thread(semantic_cache.store, request.message, output)
+    
+    await asyncio.to_thread(save_turn, sessions, SESSIONS_FILE, session_id, request.message, output)
     
     return {
         "session_id": session_id,
         "response": output
     }
-    
-    
\ No newline at end of file
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus exposition of counters and span_duration_seconds histograms."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/semantic-cache")
+def get_semantic_cache_stats():
+    """Entry count and hit counts per hashed prompt; prompts themselves are not kept."""
+    return {"entries": len(semantic_cache), "top": semantic_cache.top_entries()}
+
+
+@app.get("/metrics/models")
+def get_model_stats():
+    """Rolling latency, error rate and health of every configured model."""
+    return model_router.snapshot()
@@ -0,0 +1,181 @@
+import threading
+
+import pytest
+
+from utils.calendar_reads import CalendarReader, SingleFlight
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def concurrently(n, fn):
+    """Run fn() in n threads; returns their results (exceptions included)."""
+    results = [None] * n
+
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class BlockingCall:
+    """A call that blocks until released, counting how often it ran."""
+
+    def __init__(self, result="ok", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight(ttl=30)
+    call = BlockingCall()
+    waiters = []
+
+    def do():
+        return flight.do("k", call)
+
+    leader = threading.Thread(target=lambda: waiters.append(do()))
+    leader.start()
+    assert call.started.wait(5)
+    threading.Timer(0.1, call.release.set).start()
+    results = concurrently(10, do)
+    leader.join()
+
+    assert call.calls == 1
+    assert results == ["ok"] * 10
+    assert waiters == ["ok"]
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight(ttl=30)
+    call = BlockingCall(error=RuntimeError("calendar down"))
+    errors = []
+
+    def do():
+        try:
+            flight.do("k", call)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=do)
+    leader.start()
+    assert call.started.wait(5)
+    threading.Timer(0.1, call.release.set).start()
+    concurrently(5, do)
+    leader.join()
+
+    assert call.calls == 1
+    assert len(errors) == 6
+    assert flight.do("k", lambda: "recovered") == "recovered"
+
+
+def test_results_expire_after_ttl():
+    clock = Clock()
+    flight = SingleFlight(ttl=30, clock=clock)
+    calls = []
+
+    def fetch():
+        calls.append(clock.now)
+        return len(calls)
+
+    assert flight.do("k", fetch) == 1
+    clock.now = 29
+    assert flight.do("k", fetch) == 1
+    clock.now = 30
+    assert flight.do("k", fetch) == 2
+
+
+def test_zero_ttl_only_coalesces():
+    flight = SingleFlight(ttl=0)
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+
+
+def test_invalidate_drops_matching_keys():
+    flight = SingleFlight(ttl=30)
+    flight.do(("a", 1), lambda: "a1")
+    flight.do(("b", 1), lambda: "b1")
+    flight.invalidate(lambda key: key[0] == "a")
+
+    assert flight.do(("a", 1), lambda: "a2") == "a2"
+    assert flight.do(("b", 1), lambda: "b2") == "b1"
+
+
+def test_call_in_flight_during_invalidate_is_not_cached():
+    flight = SingleFlight(ttl=30)
+    call = BlockingCall(result="stale")
+    leader = threading.Thread(target=lambda: flight.do("k", call))
+    leader.start()
+    assert call.started.wait(5)
+    flight.invalidate()
+    call.release.set()
+    leader.join()
+
+    assert flight.do("k", lambda: "fresh") == "fresh"
+
+
+def test_max_entries_bounds_the_cache():
+    flight = SingleFlight(ttl=30, max_entries=3)
+    for i in range(10):
+        flight.do(i, lambda i=i: i)
+    assert len(flight._results) <= 3
+
+
+class FakeEvents:
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def events(self):
+        return self
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+        page = self.pages[kwargs["pageToken"]]
+        return type("Request", (), {"execute": lambda self: page})()
+
+
+@pytest.fixture
+def events():
+    return FakeEvents({
+        None: {"items": [{"id": "1"}], "nextPageToken": "p2"},
+        "p2": {"items": [{"id": "2"}]},
+    })
+
+
+def test_reader_pages_and_caches_windows(events):
+    reader = CalendarReader(lambda: events, ttl=30)
+    window = ("2025-06-01T00:00:00Z", "2025-06-08T00:00:00Z", "UTC")
+
+    assert [e["id"] for e in reader.list_events(*window)] == ["1", "2"]
+    assert [e["id"] for e in reader.list_events(*window)] == ["1", "2"]
+    assert len(events.calls) == 2
+    assert events.calls[0]["singleEvents"] is True
+
+    reader.changed()
+    reader.list_events(*window)
+    assert len(events.calls) == 4
@@ -0,0 +1,162 @@
+import json
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from utils.calendar_writes import MAX_BATCH_SIZE, insert_events
+
+
+def http_error(status, reason="", error_reason=None):
+    error = {"code": status, "message": reason}
+    if error_reason:
+        error["errors"] = [{"reason": error_reason, "message": reason}]
+    return HttpError(httplib2.Response({"status": status, "reason": reason}), json.dumps({"error": error}).encode())
+
+
+class FakeCalendar:
+    """Answers batched inserts from a script of failures per attempt.
+
+    `failures[(summary, attempt)]` is the exception that attempt gets;
+    `applied` lists the ids of every insert the "server" stored, including
+    ones whose reply was an error (a 503 after the write, say).
+    """
+
+    def __init__(self, failures=None, applied_despite_error=(), batch_error=None):
+        self.failures = failures or {}
+        self.applied_despite_error = set(applied_despite_error)
+        self.batch_error = batch_error
+        self.applied = []
+        self.attempts = {}
+        self.batches = []
+
+    def events(self):
+        return self
+
+    def insert(self, calendarId, body):
+        return body
+
+    def new_batch(self, callback):
+        return FakeBatch(self, callback)
+
+
+class FakeBatch:
+    def __init__(self, calendar, callback):
+        self.calendar = calendar
+        self.callback = callback
+        self.requests = []
+
+    def add(self, body, request_id):
+        self.requests.append((request_id, body))
+
+    def execute(self):
+        calendar = self.calendar
+        calendar.batches.append(len(self.requests))
+        if calendar.batch_error is not None:
+            error, calendar.batch_error = calendar.batch_error, None
+            for _, body in self.requests:
+                calendar.applied.append(body["id"])
+            raise error
+        for request_id, body in self.requests:
+            summary = body["summary"]
+            attempt = calendar.attempts[summary] = calendar.attempts.get(summary, 0) + 1
+            if body["id"] in calendar.applied:
+                self.callback(request_id, None, http_error(409, "The requested identifier already exists."))
+                continue
+            error = calendar.failures.get((summary, attempt))
+            if error is None or summary in calendar.applied_despite_error:
+                calendar.applied.append(body["id"])
+            if error is None:
+                self.callback(request_id, {**body, "status": "confirmed"}, None)
+            else:
+                self.callback(request_id, None, error)
+
+
+def bodies(*summaries):
+    return [{"summary": s, "start": {"dateTime": "2025-06-02T10:00:00Z"}} for s in summaries]
+
+
+def run(calendar, items, **kwargs):
+    return insert_events(calendar, calendar.new_batch, items, sleep=lambda s: None, **kwargs)
+
+
+def test_all_created_in_one_batch():
+    calendar = FakeCalendar()
+    results = run(calendar, bodies("a", "b", "c"))
+
+    assert [r["status"] for r in results] == ["created"] * 3
+    assert [r["attempts"] for r in results] == [1, 1, 1]
+    assert calendar.batches == [3]
+    assert len(set(calendar.applied)) == 3
+
+
+def test_only_retryable_failures_are_resent():
+    calendar = FakeCalendar(failures={
+        ("b", 1): http_error(503, "Backend Error"),
+        ("c", 1): http_error(400, "Bad Request"),
+        ("d", 1): http_error(403, "Rate Limit Exceeded", "rateLimitExceeded"),
+        ("e", 1): http_error(403, "Forbidden", "forbidden"),
+    })
+    results = run(calendar, bodies("a", "b", "c", "d", "e"))
+
+    assert [r["status"] for r in results] == ["created", "created", "failed", "created", "failed"]
+    assert [r["attempts"] for r in results] == [1, 2, 1, 2, 1]
+    assert calendar.batches == [5, 2]
+
+
+def test_gives_up_after_max_attempts():
+    calendar = FakeCalendar(failures={("a", n): http_error(503) for n in (1, 2, 3)})
+    results = run(calendar, bodies("a", "b"), max_attempts=3)
+
+    assert results[0]["status"] == "failed"
+    assert results[0]["attempts"] == 3
+    assert results[1]["status"] == "created"
+
+
+def test_bodies_get_client_ids_and_are_not_modified():
+    items = bodies("a", "b")
+    items[1]["id"] = "given0123"
+    calendar = FakeCalendar()
+    results = run(calendar, items)
+
+    assert "id" not in items[0]
+    assert results[1]["event"]["id"] == "given0123"
+    assert results[0]["event"]["id"] != results[1]["event"]["id"]
+
+
+def test_retry_after_applied_failure_does_not_duplicate():
+    # The server stored "a" but answered 503; the retry gets 409 for the same id.
+    calendar = FakeCalendar(failures={("a", 1): http_error(503)}, applied_despite_error={"a"})
+    results = run(calendar, bodies("a"))
+
+    assert results[0]["status"] == "created"
+    assert results[0]["attempts"] == 2
+    assert results[0]["event"]["summary"] == "a"
+    assert len(calendar.applied) == 1
+
+
+def test_failed_batch_request_is_retried_without_duplicates():
+    # The batch call itself failed after the server applied its inserts.
+    calendar = FakeCalendar(batch_error=http_error(502, "Bad Gateway"))
+    results = run(calendar, bodies("a", "b"))
+
+    assert [r["status"] for r in results] == ["created", "created"]
+    assert [r["attempts"] for r in results] == [2, 2]
+    assert len(calendar.applied) == 2
+
+
+def test_first_attempt_conflict_is_not_treated_as_created():
+    calendar = FakeCalendar()
+    calendar.applied.append("taken")
+    items = bodies("a")
+    items[0]["id"] = "taken"
+    results = run(calendar, items)
+
+    assert results[0]["status"] == "failed"
+
+
+def test_large_requests_are_split_into_batches():
+    calendar = FakeCalendar()
+    results = run(calendar, bodies(*(f"e{i}" for i in range(MAX_BATCH_SIZE * 2 + 5))))
+
+    assert calendar.batches == [MAX_BATCH_SIZE, MAX_BATCH_SIZE, 5]
+    assert all(r["status"] == "created" for r in results)
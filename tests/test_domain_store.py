@@ -0,0 +1,137 @@
+import random
+import sqlite3
+
+import pytest
+
+from utils.domain_store import DomainStore
+
+
+def meal(date, meal_type, calories, title="meal"):
+    return {"date": date, "time": "12:00", "meal_type": meal_type, "title": title, "calories": calories}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DomainStore(str(tmp_path / "assistant.db"))
+
+
+def rollups(store):
+    rows = store._conn().execute("SELECT user_id, date, meal_type, meals, calories FROM meal_rollups")
+    return {(r["user_id"], r["date"], r["meal_type"]): (r["meals"], r["calories"]) for r in rows}
+
+
+def recomputed(store):
+    rows = store._conn().execute(
+        "SELECT user_id, date, meal_type, COUNT(*) AS meals, COALESCE(SUM(calories), 0) AS calories "
+        "FROM meals GROUP BY user_id, date, meal_type"
+    )
+    return {(r["user_id"], r["date"], r["meal_type"]): (r["meals"], r["calories"]) for r in rows}
+
+
+def assert_rollups_match(store):
+    actual, expected = rollups(store), recomputed(store)
+    assert actual.keys() == expected.keys()
+    for key, (meals, calories) in expected.items():
+        assert actual[key][0] == meals
+        assert actual[key][1] == pytest.approx(calories)
+
+
+def test_inserts_update_rollups(store):
+    store.add_meals("u1", [meal("2026-01-16", "breakfast", 350), meal("2026-01-16", "lunch", 500)])
+    store.add_meal("u1", meal("2026-01-16", "lunch", 250))
+    store.add_meal("u1", meal("2026-01-17", "dinner", None))
+    store.add_meal("u2", meal("2026-01-16", "lunch", 900))
+
+    assert rollups(store)[("u1", "2026-01-16", "lunch")] == (2, 750)
+    assert rollups(store)[("u1", "2026-01-17", "dinner")] == (1, 0)
+    assert_rollups_match(store)
+
+
+def test_update_moves_a_meal_between_days_and_types(store):
+    first, second = store.add_meals("u1", [meal("2026-01-16", "lunch", 500), meal("2026-01-16", "lunch", 300)])
+
+    store.update_meal("u1", first["id"], date="2026-01-18", meal_type="dinner", calories=650)
+
+    assert rollups(store)[("u1", "2026-01-16", "lunch")] == (1, 300)
+    assert rollups(store)[("u1", "2026-01-18", "dinner")] == (1, 650)
+    assert_rollups_match(store)
+
+    # Moving the last meal out of a day drops that day's row.
+    store.update_meal("u1", second["id"], date="2026-01-18")
+    assert ("u1", "2026-01-16", "lunch") not in rollups(store)
+    assert_rollups_match(store)
+
+
+def test_update_without_changes_or_of_another_user_leaves_rollups(store):
+    saved = store.add_meal("u1", meal("2026-01-16", "lunch", 500))
+    before = rollups(store)
+
+    assert store.update_meal("u1", saved["id"], calories=None)["calories"] == 500
+    assert store.update_meal("u2", saved["id"], calories=1) is None
+    assert rollups(store) == before
+
+
+def test_delete_removes_from_rollups(store):
+    kept, dropped = store.add_meals("u1", [meal("2026-01-16", "lunch", 500), meal("2026-01-16", "lunch", 300)])
+
+    assert store.delete_meal("u1", dropped["id"])
+    assert rollups(store)[("u1", "2026-01-16", "lunch")] == (1, 500)
+    assert not store.delete_meal("u1", dropped["id"])
+    assert store.delete_meal("u1", kept["id"])
+    assert rollups(store) == {}
+
+
+def test_random_writes_keep_rollups_equal_to_the_meals_table(store):
+    rng = random.Random(3)
+    dates = ["2026-01-15", "2026-01-16", "2026-01-17"]
+    types = ["breakfast", "lunch", "dinner"]
+    ids = {"u1": [], "u2": []}
+    for _ in range(300):
+        user_id = rng.choice(["u1", "u2"])
+        op = rng.random()
+        if op < 0.5 or not ids[user_id]:
+            calories = rng.choice([None, rng.randint(50, 900), rng.randint(50, 900) + 0.5])
+            ids[user_id].append(store.add_meal(user_id, meal(rng.choice(dates), rng.choice(types), calories))["id"])
+        elif op < 0.8:
+            store.update_meal(
+                user_id, rng.choice(ids[user_id]),
+                date=rng.choice([None, *dates]),
+                meal_type=rng.choice([None, *types]),
+                calories=rng.choice([None, rng.randint(50, 900)]),
+            )
+        else:
+            meal_id = rng.choice(ids[user_id])
+            ids[user_id].remove(meal_id)
+            store.delete_meal(user_id, meal_id)
+
+    assert_rollups_match(store)
+
+
+def test_meal_summary_reads_the_rollups(store):
+    store.add_meals("u1", [
+        meal("2026-01-16", "breakfast", 350),
+        meal("2026-01-16", "lunch", 500),
+        meal("2026-01-17", "lunch", 400),
+        meal("2026-01-19", "lunch", 999),
+    ])
+
+    summary = store.meal_summary("u1", "2026-01-16", "2026-01-18")
+
+    assert (summary["meals"], summary["calories"]) == (3, 1250)
+    assert [day["date"] for day in summary["days"]] == ["2026-01-16", "2026-01-17"]
+    assert summary["days"][0]["by_meal_type"]["lunch"] == {"meals": 1, "calories": 500}
+    assert store.meal_summary("u1", "2026-01-17")["calories"] == 400
+
+
+def test_backfill_builds_rollups_for_an_existing_database(tmp_path):
+    path = str(tmp_path / "assistant.db")
+    store = DomainStore(path)
+    store.add_meals("u1", [meal("2026-01-16", "lunch", 500), meal("2026-01-16", "lunch", 250)])
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DELETE FROM meal_rollups")
+    conn.close()
+
+    reopened = DomainStore(path)
+
+    assert rollups(reopened) == {("u1", "2026-01-16", "lunch"): (2, 750)}
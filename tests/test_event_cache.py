@@ -0,0 +1,185 @@
+import json
+import threading
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from utils.event_cache import EventCache, parse_event_time
+
+
+def event(event_id, start, end, status="confirmed"):
+    return {
+        "id": event_id,
+        "status": status,
+        "start": {"dateTime": f"2026-01-16T{start}:00+00:00"},
+        "end": {"dateTime": f"2026-01-16T{end}:00+00:00"},
+    }
+
+
+def at(hhmm):
+    return parse_event_time(f"2026-01-16T{hhmm}:00+00:00")
+
+
+def ids(events):
+    return [e["id"] for e in events]
+
+
+class _Call:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeEvents:
+    """events.list over a script of pages per sync token.
+
+    `pages[token]` is the list of item lists returned for that sync token
+    (None for a full sync); the last page carries `next_tokens[token]`.
+    A token listed in `expired` answers 410 Gone.
+    """
+
+    def __init__(self, pages, next_tokens, expired=(), on_list=None):
+        self.pages = pages
+        self.next_tokens = next_tokens
+        self.expired = set(expired)
+        self.on_list = on_list
+        self.calls = []
+
+    def list(self, calendarId="primary", syncToken=None, pageToken=None, **kwargs):
+        def run():
+            self.calls.append((syncToken, pageToken))
+            if self.on_list:
+                self.on_list(syncToken, pageToken)
+            if syncToken in self.expired:
+                raise HttpError(httplib2.Response({"status": 410, "reason": "Gone"}),
+                                json.dumps({"error": {"code": 410, "message": "Sync token is no longer valid"}}).encode())
+            pages = self.pages[syncToken]
+            index = int(pageToken or 0)
+            result = {"items": pages[index]}
+            if index + 1 < len(pages):
+                result["nextPageToken"] = str(index + 1)
+            else:
+                result["nextSyncToken"] = self.next_tokens[syncToken]
+            return result
+        return _Call(run)
+
+
+class FakeService:
+    def __init__(self, events):
+        self._events = events
+
+    def events(self):
+        return self._events
+
+
+def test_overlapping_returns_events_in_start_order():
+    cache = EventCache()
+    cache.load([event("c", "15:00", "16:00"), event("a", "09:00", "10:00"), event("b", "11:00", "12:00")])
+
+    assert ids(cache.overlapping(at("00:00"), at("23:59"))) == ["a", "b", "c"]
+    assert ids(cache.overlapping(at("09:30"), at("11:30"))) == ["a", "b"]
+    # Touching intervals do not overlap.
+    assert cache.overlapping(at("10:00"), at("11:00")) == []
+
+
+def test_long_event_found_from_a_window_after_its_start():
+    cache = EventCache()
+    cache.load([event("long", "08:00", "18:00"), event("short", "12:00", "12:30")])
+
+    assert ids(cache.overlapping(at("17:00"), at("17:30"))) == ["long"]
+
+
+def test_upsert_moves_an_event():
+    cache = EventCache()
+    cache.upsert(event("a", "09:00", "10:00"))
+    cache.upsert(event("a", "14:00", "15:00"))
+
+    assert len(cache) == 1
+    assert cache.overlapping(at("09:00"), at("10:00")) == []
+    assert ids(cache.overlapping(at("14:00"), at("15:00"))) == ["a"]
+
+
+def test_incremental_sync_uses_the_sync_token_and_removes_cancelled_events():
+    events = FakeEvents(
+        pages={
+            None: [[event("a", "09:00", "10:00")], [event("b", "11:00", "12:00")]],
+            "t1": [[event("a", "09:00", "10:00", status="cancelled"), event("c", "13:00", "14:00")]],
+        },
+        next_tokens={None: "t1", "t1": "t2"},
+    )
+    cache = EventCache()
+
+    assert cache.sync(FakeService(events)) == 2
+    assert cache.sync_token == "t1"
+    assert cache.sync(FakeService(events)) == 2
+
+    assert events.calls == [(None, None), (None, "1"), ("t1", None)]
+    assert cache.sync_token == "t2"
+    assert ids(cache.overlapping(at("00:00"), at("23:59"))) == ["b", "c"]
+
+
+def test_expired_sync_token_falls_back_to_a_full_sync():
+    events = FakeEvents(
+        pages={None: [[event("b", "11:00", "12:00")]]},
+        next_tokens={None: "t9"},
+        expired={"stale"},
+    )
+    cache = EventCache()
+    cache.load([event("gone", "09:00", "10:00")])
+    cache.sync_token = "stale"
+
+    assert cache.sync(FakeService(events)) == 1
+
+    assert events.calls == [("stale", None), (None, None)]
+    assert cache.sync_token == "t9"
+    assert ids(cache.overlapping(at("00:00"), at("23:59"))) == ["b"]
+
+
+def test_full_sync_keeps_the_old_index_visible_until_it_is_done():
+    cache = EventCache()
+    cache.load([event("old", "09:00", "10:00")])
+    seen = []
+
+    def on_list(sync_token, page_token):
+        # A conflict check running between pages of the full sync.
+        seen.append(ids(cache.overlapping(at("00:00"), at("23:59"))))
+
+    events = FakeEvents(
+        pages={None: [[event("a", "11:00", "12:00")], [event("b", "13:00", "14:00")]]},
+        next_tokens={None: "t1"},
+        on_list=on_list,
+    )
+    cache.sync(FakeService(events))
+
+    assert seen == [["old"], ["old"]]
+    assert ids(cache.overlapping(at("00:00"), at("23:59"))) == ["a", "b"]
+
+
+def test_writes_during_a_full_sync_survive_the_swap():
+    cache = EventCache()
+    cache.load([event("old", "09:00", "10:00")])
+
+    def on_list(sync_token, page_token):
+        if page_token is None:
+            # schedule_event and delete_event landing mid-sync.
+            thread = threading.Thread(target=lambda: (
+                cache.upsert(event("new", "16:00", "17:00")),
+                cache.remove("b"),
+            ))
+            thread.start()
+            thread.join()
+
+    events = FakeEvents(
+        pages={None: [[event("a", "11:00", "12:00")], [event("b", "13:00", "14:00")]]},
+        next_tokens={None: "t1"},
+        on_list=on_list,
+    )
+    cache.sync(FakeService(events))
+
+    assert ids(cache.overlapping(at("00:00"), at("23:59"))) == ["a", "new"]
+    # Later writes go straight to the index again.
+    cache.upsert(event("later", "18:00", "19:00"))
+    assert cache._pending is None
+    assert "later" in ids(cache.overlapping(at("00:00"), at("23:59")))
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+
+from utils.intent_router import IntentRouter, extract_meal
+
+NOW = datetime(2026, 1, 16, 10, 0)
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("add oatmeal for breakfast 350 calories at 8:30",
+     {"meal_type": "breakfast", "time": "08:30", "calories": 350.0, "title": "oatmeal", "date": "2026-01-16"}),
+    ("log beef stew for dinner 650 kcal at 8 pm", {"meal_type": "dinner", "time": "20:00", "title": "beef stew"}),
+    ("add fried rice for lunch at noon 600 calories", {"time": "12:00", "title": "fried rice"}),
+    ("lunch at 13:00 was 600 calories of pizza", {"time": "13:00", "title": "pizza"}),
+    ("yesterday i had noodles for dinner at 10 pm 550 calories", {"date": "2026-01-15", "time": "22:00"}),
+])
+def test_complete_meals_are_routed(router, message, expected):
+    route = router.route(message, NOW)
+    assert route is not None and route.tool_name == "add_meal"
+    assert {key: route.args[key] for key in expected} == expected
+
+
+@pytest.mark.parametrize("message", [
+    # Two meals in one message.
+    "add oatmeal for breakfast 350 calories at 8:30 and lunch rice 500 calories at 1pm",
+    "add oatmeal for breakfast and lunch 350 calories at 8:30",
+    # Two times or two calorie counts.
+    "i had pizza for dinner at 7pm and 9pm 900 calories",
+    "i had pizza for dinner 900 calories at 9pm, maybe 1000 calories",
+    # A bare hour could be am or pm.
+    "had soup for dinner 300 calories at 7",
+    "i had rice for lunch at 1 500 calories",
+    "i ate a bowl of cereal for breakfast 180 calories at 8",
+    # Planned, not eaten.
+    "tomorrow i will have oatmeal for breakfast 350 calories at 8:30",
+    "i plan to eat salad for lunch 400 calories at 1pm",
+    "i am going to have pasta for dinner 700 calories at 8pm",
+    # Someone else's meal.
+    "my son had pizza for dinner 800 calories at 7pm",
+    "she ate a salad for lunch 300 calories at 12:30",
+    # Incomplete.
+    "i had pizza for dinner 900 calories",
+])
+def test_ambiguous_meals_fall_through(router, message):
+    assert extract_meal(message, NOW) is None
+    assert router.route(message, NOW) is None
+
+
+@pytest.mark.parametrize("message", [
+    "don't add the pizza for dinner 900 calories at 9pm",
+    "change my breakfast to oatmeal 300 calories at 8:00",
+    "is 350 calories at 8:30 too much for breakfast?",
+])
+def test_negations_edits_and_questions_fall_through(router, message):
+    assert router.route(message, NOW) is None
+
+
+def test_complete_reminder_is_routed(router):
+    route = router.route("remind me to call mom this week", NOW)
+    assert route.tool_name == "add_reminders"
+    assert route.args == {"title": "call mom", "time": "this week", "timezone": None}
+
+
+@pytest.mark.parametrize("message", [
+    "remind me to call mom",
+    "remind me to call mom at 5pm today",
+    "remind me tomorrow at 5 to call mom",
+    "delete my reminder to buy milk today",
+])
+def test_incomplete_or_timed_reminders_fall_through(router, message):
+    assert router.route(message, NOW) is None
@@ -0,0 +1,225 @@
+import asyncio
+import random
+import threading
+
+import httpx
+import pytest
+
+from utils.llm_client import (
+    AsyncRetryTransport, Backoff, ConcurrencyLimit, RETRY_STATUSES, RetryTransport, retry_after,
+)
+
+
+class Script:
+    """MockTransport handler answering with one scripted status or exception per attempt."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.attempts = 0
+
+    def __call__(self, request):
+        reply = self.replies[min(self.attempts, len(self.replies) - 1)]
+        self.attempts += 1
+        if isinstance(reply, Exception):
+            raise reply
+        status, headers = reply if isinstance(reply, tuple) else (reply, {})
+        return httpx.Response(status, headers=headers, json={"attempt": self.attempts})
+
+
+def client(script, backoff=None, limit=None):
+    sleeps = []
+    transport = RetryTransport(httpx.MockTransport(script), backoff=backoff, sleep=sleeps.append, limit=limit)
+    return httpx.Client(transport=transport, base_url="https://api.test"), sleeps
+
+
+@pytest.mark.parametrize("status", sorted(RETRY_STATUSES))
+def test_retryable_statuses_are_retried(status):
+    script = Script(status, 200)
+    http, sleeps = client(script)
+
+    response = http.post("/v1/responses")
+
+    assert response.status_code == 200
+    assert script.attempts == 2
+    assert len(sleeps) == 1
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 422])
+def test_other_statuses_are_returned_at_once(status):
+    script = Script(status, 200)
+    http, sleeps = client(script)
+
+    assert http.post("/v1/responses").status_code == status
+    assert script.attempts == 1
+    assert sleeps == []
+
+
+def test_connect_errors_are_retried():
+    script = Script(httpx.ConnectError("refused"), 200)
+    http, sleeps = client(script)
+
+    assert http.post("/v1/responses").status_code == 200
+    assert script.attempts == 2
+
+
+def test_attempts_are_capped_and_the_last_response_returned():
+    script = Script(503)
+    http, sleeps = client(script, backoff=Backoff(max_retries=3))
+
+    response = http.post("/v1/responses")
+
+    assert response.status_code == 503
+    assert response.json() == {"attempt": 4}
+    assert script.attempts == 4
+    assert len(sleeps) == 3
+
+
+def test_connect_error_is_raised_after_the_last_attempt():
+    script = Script(httpx.ConnectError("refused"))
+    http, _ = client(script, backoff=Backoff(max_retries=2))
+
+    with pytest.raises(httpx.ConnectError):
+        http.post("/v1/responses")
+    assert script.attempts == 3
+
+
+def test_retry_after_is_honoured():
+    script = Script((429, {"Retry-After": "3"}), (503, {"retry-after-ms": "250"}), 200)
+    http, sleeps = client(script)
+
+    assert http.post("/v1/responses").status_code == 200
+    assert sleeps == [3.0, 0.25]
+
+
+def test_retry_after_beyond_the_cap_gives_up():
+    script = Script((429, {"Retry-After": "120"}), 200)
+    http, sleeps = client(script, backoff=Backoff(max_retry_after=60))
+
+    assert http.post("/v1/responses").status_code == 429
+    assert sleeps == []
+
+
+def test_retry_after_parsing():
+    assert retry_after(httpx.Response(429, headers={"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "2"})) == 2.0
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "soon"})) is None
+    assert retry_after(httpx.Response(429)) is None
+
+
+def test_jitter_stays_within_the_exponential_bound():
+    random.seed(11)
+    backoff = Backoff(max_retries=6, base=0.5, max_delay=4.0)
+
+    for attempt in range(6):
+        bound = min(4.0, 0.5 * 2 ** attempt)
+        delays = [backoff.delay(attempt) for _ in range(500)]
+        assert all(0 <= d <= bound for d in delays)
+        # Full jitter spreads over the whole range rather than clustering at the bound.
+        assert min(delays) < bound * 0.1 and max(delays) > bound * 0.9
+    assert backoff.delay(6) is None
+
+
+def test_async_transport_retries_and_honours_retry_after():
+    script = Script((429, {"Retry-After": "1"}), 502, 200)
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    async def run():
+        transport = AsyncRetryTransport(httpx.MockTransport(script), sleep=sleep)
+        async with httpx.AsyncClient(transport=transport, base_url="https://api.test") as http:
+            return await http.post("/v1/responses")
+
+    assert asyncio.run(run()).status_code == 200
+    assert script.attempts == 3
+    assert sleeps[0] == 1.0 and 0 <= sleeps[1] <= 1.0
+
+
+def test_slot_is_held_until_the_body_is_closed():
+    limit = ConcurrencyLimit(1)
+    http, _ = client(Script(200), limit=limit)
+
+    with http.stream("POST", "/v1/responses") as response:
+        assert limit._in_use == 1
+        response.read()
+    assert limit._in_use == 0
+
+    http.post("/v1/responses")
+    assert limit._in_use == 0
+
+
+def test_sync_and_async_transports_share_one_limit():
+    limit = ConcurrencyLimit(1)
+    http, _ = client(Script(200), limit=limit)
+    order = []
+
+    async def run():
+        transport = AsyncRetryTransport(httpx.MockTransport(Script(200)), limit=limit)
+        async with httpx.AsyncClient(transport=transport, base_url="https://api.test") as async_http:
+            with http.stream("POST", "/v1/responses"):
+                request = asyncio.create_task(async_http.post("/v1/responses"))
+                await asyncio.sleep(0.05)
+                order.append("async ran" if request.done() else "async waiting")
+            # Closing the sync stream hands its slot to the queued async request.
+            order.append("sync closed")
+            response = await request
+            order.append(response.status_code)
+
+    asyncio.run(run())
+
+    assert order == ["async waiting", "sync closed", 200]
+    assert limit._in_use == 0
+
+
+def test_limit_hands_slots_to_threads_in_order():
+    limit = ConcurrencyLimit(1)
+    limit.acquire()
+    woke = []
+
+    def wait(i):
+        limit.acquire()
+        woke.append(i)
+        limit.release()
+
+    threads = []
+    for i in range(3):
+        thread = threading.Thread(target=wait, args=(i,))
+        thread.start()
+        threads.append(thread)
+        while len(limit._waiters) < i + 1:
+            pass
+    limit.release()
+    for thread in threads:
+        thread.join()
+
+    assert woke == [0, 1, 2]
+    assert limit._in_use == 0
+
+
+def test_cancelled_async_waiter_gives_its_slot_back():
+    limit = ConcurrencyLimit(1)
+
+    async def run():
+        limit.acquire()
+        waiter = asyncio.create_task(limit.acquire_async())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not limit._waiters
+        limit.release()
+        assert limit._in_use == 0
+
+        # Cancelled after the slot was already handed over.
+        await limit.acquire_async()
+        waiter = asyncio.create_task(limit.acquire_async())
+        await asyncio.sleep(0)
+        limit.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limit._in_use == 0
+
+    asyncio.run(run())
@@ -0,0 +1,126 @@
+import json
+import random
+
+import httpx
+import openai
+import pytest
+
+from utils.model_router import ModelRouter
+
+ENTRIES = [
+    {"model": "big", "tags": ["chat", "tools"]},
+    {"model": "big-notools", "tags": ["chat"]},
+    {"model": "small", "tags": ["confirmation", "summary"]},
+    {"model": "small-2", "tags": ["confirmation"]},
+]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FixedRandom:
+    """random() always returns `value`; choice() takes the first option."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+    def choice(self, options):
+        return options[0]
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+
+
+def router(**kwargs):
+    kwargs.setdefault("probe_rate", 0.0)
+    return ModelRouter(ENTRIES, clock=kwargs.pop("clock", Clock()), **kwargs)
+
+
+def test_tag_selects_the_pool_and_tools_narrows_it():
+    r = router()
+
+    assert r.pool("chat") == ["big", "big-notools"]
+    assert r.pool("chat", tools=True) == ["big"]
+    assert r.candidates("chat", tools=True) == ["big"]
+    assert r.candidates("confirmation") == ["small", "small-2"]
+    assert r.call("summary", lambda model: model) == "small"
+    with pytest.raises(ValueError):
+        r.call("missing", lambda model: model)
+
+
+def test_from_config_list_requires_each_tag(tmp_path):
+    path = tmp_path / "OAI_CONFIG_LIST"
+    path.write_text(json.dumps(ENTRIES + [{"model": "gemini", "api_type": "google", "tags": ["vision"]}]))
+
+    assert ModelRouter.from_config_list(str(path), required=("chat", "confirmation")).pool("confirmation") == ["small", "small-2"]
+    with pytest.raises(ValueError, match="vision"):
+        ModelRouter.from_config_list(str(path), required=("chat", "vision"))
+
+
+def test_slower_preferred_model_loses_first_place():
+    r = router(latency_slack=0.5)
+    r.record("small", latency=1.0)
+    r.record("small-2", latency=0.8)
+    assert r.candidates("confirmation")[0] == "small"
+
+    r.record("small", latency=3.0)
+    assert r.candidates("confirmation") == ["small-2", "small"]
+
+
+def test_probe_rate_sends_a_share_of_calls_to_another_model_first():
+    r = router(probe_rate=0.05, rng=random.Random(7))
+    r.record("small", latency=0.5)
+    r.record("small-2", latency=2.0)
+
+    firsts = [r.candidates("confirmation")[0] for _ in range(4000)]
+
+    assert 0.03 < firsts.count("small-2") / len(firsts) < 0.07
+    assert all(sorted(r.candidates("confirmation")) == ["small", "small-2"] for _ in range(50))
+
+
+def test_probe_keeps_the_preferred_model_second_and_needs_an_alternative():
+    r = router(probe_rate=0.05, rng=FixedRandom(0.0))
+
+    assert r.candidates("confirmation") == ["small-2", "small"]
+    assert r.candidates("summary") == ["small"]
+    assert router(probe_rate=0.05, rng=FixedRandom(0.05)).candidates("confirmation") == ["small", "small-2"]
+
+
+def test_failover_benches_a_failing_model_for_the_cooldown():
+    clock = Clock()
+    r = router(clock=clock, max_error_rate=0.5, cooldown=30.0, alpha=0.5)
+    calls = []
+
+    def fn(model):
+        calls.append(model)
+        if model == "small":
+            raise connection_error()
+        return model
+
+    assert r.call("confirmation", fn) == "small-2"
+    # One failure at alpha=0.5 reaches max_error_rate: small sits out.
+    assert r.call("confirmation", fn) == "small-2"
+    assert calls == ["small", "small-2", "small-2"]
+    assert r.candidates("confirmation") == ["small-2", "small"]
+
+    clock.now = 31.0
+    assert r.candidates("confirmation")[0] == "small"
+
+
+def test_last_candidate_failure_is_raised():
+    r = router()
+
+    def fn(model):
+        raise connection_error()
+
+    with pytest.raises(openai.APIConnectionError):
+        r.call("summary", fn)
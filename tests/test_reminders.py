@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.domain_store import DomainStore
+from utils.reminders import MemorySink, ReminderScheduler, resolve_due
+
+
+def at(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DomainStore(str(tmp_path / "assistant.db"))
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+# 2025-06-02 is a Monday.
+@pytest.mark.parametrize("label, now, expected", [
+    ("today", at(2025, 6, 2, 10), at(2025, 6, 2, 18)),
+    ("today", at(2025, 6, 2, 19), at(2025, 6, 2, 20)),
+    ("this week", at(2025, 6, 2, 10), at(2025, 6, 6, 9)),
+    ("this week", at(2025, 6, 6, 8), at(2025, 6, 6, 9)),
+    ("this week", at(2025, 6, 6, 10), at(2025, 6, 7, 9)),
+    ("this week", at(2025, 6, 7, 8), at(2025, 6, 7, 9)),
+    ("this week", at(2025, 6, 8, 12), at(2025, 6, 9, 9)),
+    ("next week", at(2025, 6, 8, 12), at(2025, 6, 9, 9)),
+    ("this month", at(2025, 6, 2, 10), at(2025, 6, 30, 9)),
+    ("this month", at(2025, 6, 30, 10), at(2025, 7, 1, 9)),
+])
+def test_resolve_due(label, now, expected):
+    assert resolve_due(label, "UTC", now) == expected
+
+
+def test_resolve_due_never_fires_immediately():
+    for hour in range(24):
+        for day in range(2, 9):
+            now = at(2025, 6, day, hour, 30)
+            for label in ("today", "this week", "next week", "this month"):
+                assert resolve_due(label, "UTC", now) > now
+
+
+def test_resolve_due_uses_local_time():
+    assert resolve_due("today", "Asia/Dhaka", at(2025, 6, 2, 3)) == at(2025, 6, 2, 12)
+
+
+def test_resolve_due_rejects_unknown_label():
+    with pytest.raises(ValueError):
+        resolve_due("someday", "UTC", at(2025, 6, 2, 10))
+
+
+def test_fire_due_delivers_only_due_reminders(store):
+    clock = Clock(at(2025, 6, 2, 10))
+    sink = MemorySink()
+    scheduler = ReminderScheduler(store, sink=sink, clock=clock)
+    early = store.add_reminder("u1", {"title": "early", "time": "today"}, at(2025, 6, 2, 11))
+    late = store.add_reminder("u1", {"title": "late", "time": "today"}, at(2025, 6, 2, 18))
+    scheduler.schedule("u1", late, at(2025, 6, 2, 18))
+    scheduler.schedule("u1", early, at(2025, 6, 2, 11))
+
+    assert scheduler.fire_due() == 0
+    assert scheduler.next_delay() == 3600
+
+    clock.now = at(2025, 6, 2, 11)
+    assert scheduler.fire_due() == 1
+    assert [r["title"] for _, r in sink.delivered] == ["early"]
+    assert len(scheduler) == 1
+
+
+def test_recover_reloads_unfired_reminders(store):
+    fired = store.add_reminder("u1", {"title": "fired", "time": "today"}, at(2025, 6, 2, 9))
+    store.add_reminder("u1", {"title": "pending", "time": "today"}, at(2025, 6, 2, 18))
+    store.add_reminder("u2", {"title": "undated", "time": "today"}, None)
+    store.claim_reminder("u1", fired["id"], at(2025, 6, 2, 9))
+
+    sink = MemorySink()
+    scheduler = ReminderScheduler(store, sink=sink, clock=Clock(at(2025, 6, 2, 18)))
+    assert scheduler.recover() == 1
+    # Recovering twice does not queue the same reminder again.
+    assert scheduler.recover() == 1
+    assert scheduler.fire_due() == 1
+    assert [r["title"] for _, r in sink.delivered] == ["pending"]
+    assert store.pending_reminders() == []
+
+
+def test_claim_delivers_once_across_schedulers(store):
+    store.add_reminder("u1", {"title": "once", "time": "today"}, at(2025, 6, 2, 18))
+    sink = MemorySink()
+    clock = Clock(at(2025, 6, 2, 18))
+    workers = [ReminderScheduler(store, sink=sink, clock=clock) for _ in range(2)]
+    for worker in workers:
+        worker.recover()
+
+    assert sum(worker.fire_due() for worker in workers) == 1
+    assert len(sink.delivered) == 1
+
+
+def test_failed_delivery_is_released_and_retried(store):
+    reminder = store.add_reminder("u1", {"title": "retry", "time": "today"}, at(2025, 6, 2, 18))
+    attempts = []
+
+    def flaky_sink(user_id, reminder):
+        attempts.append(reminder["id"])
+        if len(attempts) == 1:
+            raise RuntimeError("push service down")
+
+    clock = Clock(at(2025, 6, 2, 18))
+    scheduler = ReminderScheduler(store, sink=flaky_sink, clock=clock, retry_delay=60)
+    scheduler.recover()
+
+    assert scheduler.fire_due() == 0
+    # Released, so another worker recovering now would pick it up too.
+    assert [r["id"] for _, r in store.pending_reminders()] == [reminder["id"]]
+    assert scheduler.next_delay() == 60
+
+    clock.now += 60
+    assert scheduler.fire_due() == 1
+    assert attempts == [reminder["id"], reminder["id"]]
+    assert store.pending_reminders() == []
@@ -0,0 +1,115 @@
+import pytest
+
+from utils import metrics
+from utils.response_cache import ResponseCache, is_cacheable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def cached(cache, user_id, message):
+    return cache.lookup(user_id, message)[1]
+
+
+def remember(cache, user_id, message, reply, ran_tools=False):
+    key, _ = cache.lookup(user_id, message)
+    cache.record(user_id, key, reply, 1.5, ran_tools=ran_tools)
+
+
+def test_hit_after_store_with_normalized_message(clock):
+    cache = ResponseCache(ttl=60, clock=clock)
+    remember(cache, "u1", "How are you?", "Fine, thanks.")
+    saved = metrics.get("response_cache_saved_seconds_total")
+
+    assert cached(cache, "u1", "how are you") == "Fine, thanks."
+    assert cached(cache, "u2", "how are you") is None
+    assert metrics.get("response_cache_saved_seconds_total") == saved + 1.5
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(ttl=60, clock=clock)
+    remember(cache, "u1", "hello", "Hi!")
+
+    clock.now = 59.9
+    assert cached(cache, "u1", "hello") == "Hi!"
+    clock.now = 60.0
+    assert cached(cache, "u1", "hello") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(ttl=60, max_entries=2, clock=clock)
+    remember(cache, "u1", "one", "1")
+    remember(cache, "u1", "two", "2")
+    assert cached(cache, "u1", "one") == "1"
+
+    remember(cache, "u1", "three", "3")
+
+    assert len(cache) == 2
+    assert cached(cache, "u1", "two") is None
+    assert cached(cache, "u1", "one") == "1"
+    assert cached(cache, "u1", "three") == "3"
+
+
+def test_reply_of_a_turn_with_tool_calls_is_never_stored(clock):
+    cache = ResponseCache(ttl=60, clock=clock)
+    remember(cache, "u1", "what did i eat today", "Oatmeal.")
+
+    remember(cache, "u1", "what is on my calendar", "Team sync at 3pm.", ran_tools=True)
+
+    assert len(cache) == 1
+    assert cached(cache, "u1", "what is on my calendar") is None
+    # The tool turn may have changed the answers, so earlier replies are gone too.
+    assert cached(cache, "u1", "what did i eat today") is None
+
+
+def test_mark_changed_only_affects_that_user(clock):
+    cache = ResponseCache(ttl=60, clock=clock)
+    remember(cache, "u1", "hello", "Hi u1")
+    remember(cache, "u2", "hello", "Hi u2")
+
+    cache.mark_changed("u1")
+
+    assert cached(cache, "u1", "hello") is None
+    assert cached(cache, "u2", "hello") == "Hi u2"
+
+
+def test_uncacheable_turns_get_no_key(clock):
+    cache = ResponseCache(ttl=60, clock=clock)
+
+    assert cache.lookup("u1", "add oatmeal for breakfast") == (None, None)
+    assert cache.lookup("u1", "yes", previous_reply="Should I book it?") == (None, None)
+    cache.record("u1", None, "Booked.", 1.0)
+    cache.store("key", "", 1.0)
+    assert len(cache) == 0
+
+
+def test_zero_ttl_disables_the_cache(clock):
+    cache = ResponseCache(ttl=0, clock=clock)
+    remember(cache, "u1", "hello", "Hi!")
+
+    assert not cache.enabled
+    assert len(cache) == 0
+    assert cached(cache, "u1", "hello") is None
+
+
+@pytest.mark.parametrize("message, previous_reply, expected", [
+    ("how are you", None, True),
+    ("How are you?", "Hello!", True),
+    ("remind me to call mom", None, False),
+    ("I had pizza", None, False),
+    ("3pm", "What time works for you?", False),
+    ("?!", None, False),
+])
+def test_is_cacheable(message, previous_reply, expected):
+    assert is_cacheable(message, previous_reply) is expected
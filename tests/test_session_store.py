@@ -0,0 +1,83 @@
+import pytest
+
+from utils.session_store import SessionMap, SessionStore
+
+
+def turn(i):
+    return {"user_message": f"u{i}", "ai_message": f"a{i}"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions"))
+
+
+def test_flush_creates_new_session(store):
+    sessions = SessionMap(store)
+    sessions["s1"] = []
+    sessions["s1"].append(turn(0))
+    sessions.flush()
+
+    assert store.read("s1") == [turn(0)]
+    assert store.version("s1") == 0
+
+
+def test_flush_appends_only_new_turns(store):
+    store.append("s1", turn(0), turn(1))
+    sessions = SessionMap(store)
+    sessions["s1"].append(turn(2))
+    sessions.flush()
+    sessions["s1"].append(turn(3))
+    sessions.flush()
+    # Nothing new: flushing again must not write the turns twice.
+    sessions.flush()
+
+    assert store.read("s1") == [turn(i) for i in range(4)]
+    assert store.version("s1") == 0
+
+
+def test_flush_rewrites_edited_session(store):
+    store.append("s1", turn(0), turn(1))
+    store.write_meta("s1", {"summary": "old"})
+    sessions = SessionMap(store)
+    sessions["s1"][0] = turn(9)
+    sessions.flush()
+
+    assert store.read("s1") == [turn(9), turn(1)]
+    assert store.version("s1") == 1
+    # The summary was built from the old turns.
+    assert store.read_meta("s1") == {}
+
+
+def test_flush_rewrites_replaced_unread_session(store):
+    store.append("s1", turn(0), turn(1))
+    sessions = SessionMap(store)
+    sessions["s1"] = [turn(5)]
+    sessions.flush()
+
+    assert store.read("s1") == [turn(5)]
+
+
+def test_untouched_sessions_are_not_read(store):
+    store.append("s1", turn(0))
+    store.append("s2", turn(1))
+    sessions = SessionMap(store)
+
+    assert sorted(sessions) == ["s1", "s2"]
+    assert sessions["s2"] == [turn(1)]
+    sessions.flush()
+    assert list(sessions._loaded) == ["s2"]
+    assert store.read("s1") == [turn(0)]
+
+
+def test_delete_removes_log_and_meta(store):
+    store.append("s1", turn(0))
+    store.write_meta("s1", {"summary": "x"})
+    sessions = SessionMap(store)
+    del sessions["s1"]
+
+    assert "s1" not in sessions
+    assert store.read("s1") == []
+    assert store.read_meta("s1") == {}
+    with pytest.raises(KeyError):
+        sessions["s1"]
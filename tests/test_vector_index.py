@@ -0,0 +1,198 @@
+import numpy as np
+
+from utils.matching import TwoStageMatcher
+from utils.vector_index import EntityIndex, UserEntityIndexes, VectorIndex
+
+
+def unit(*components):
+    return np.asarray(components, dtype=np.float32)
+
+
+class FakeEmbeddings:
+    """Fixed vectors per text; background jobs run inline."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = []
+
+    def embed_many(self, texts):
+        self.calls.append(list(texts))
+        return [unit(*self.vectors[text]) for text in texts]
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+    def background(self, fn):
+        return fn()
+
+
+def keys(hits):
+    return [key for key, _ in hits]
+
+
+def test_search_ranks_by_cosine_similarity():
+    index = VectorIndex()
+    index.add("east", unit(1, 0))
+    index.add("north", unit(0, 5))
+    index.add("northeast", unit(1, 1))
+
+    hits = index.search(unit(1, 0.1), k=3)
+
+    assert keys(hits) == ["east", "northeast", "north"]
+    assert abs(hits[0][1] - 1 / np.sqrt(1.01)) < 1e-6
+
+
+def test_add_replaces_and_remove_keeps_the_other_rows():
+    index = VectorIndex(capacity=2)
+    for i in range(5):
+        index.add(f"k{i}", unit(1, i))
+    index.add("k0", unit(0, 1))
+    index.remove("k1")
+    index.remove("missing")
+
+    assert len(index) == 4
+    assert "k1" not in index
+    assert keys(index.search(unit(1, 0), k=10, threshold=0.99)) == []
+    assert keys(index.search(unit(1, 4), k=1)) == ["k4"]
+    # The last row moved into the freed slot still answers for its own key.
+    index.remove("k4")
+    assert keys(index.search(unit(1, 3), k=1)) == ["k3"]
+    assert set(keys(index.search(unit(1, 1), k=10))) == {"k0", "k2", "k3"}
+
+
+def test_date_and_meal_type_masks():
+    index = VectorIndex()
+    index.add("toast", unit(1, 0), date="2026-01-16", meal_type="breakfast")
+    index.add("toast-lunch", unit(1, 0.1), date="2026-01-16", meal_type="lunch")
+    index.add("toast-later", unit(1, 0.2), date="2026-01-17", meal_type="breakfast")
+    index.add("undated", unit(1, 0.3))
+
+    assert keys(index.search(unit(1, 0), k=5, date="2026-01-16")) == ["toast", "toast-lunch"]
+    assert keys(index.search(unit(1, 0), k=5, meal_type="breakfast")) == ["toast", "toast-later"]
+    assert keys(index.search(unit(1, 0), k=5, date="2026-01-17", meal_type="breakfast")) == ["toast-later"]
+    assert index.search(unit(1, 0), k=5, date="2026-01-18") == []
+
+
+def test_threshold_drops_weak_matches():
+    index = VectorIndex()
+    index.add("close", unit(1, 0.1))
+    index.add("far", unit(0, 1))
+
+    assert keys(index.search(unit(1, 0), k=5, threshold=0.6)) == ["close"]
+    assert VectorIndex().search(unit(1, 0)) == []
+
+
+MEALS = [
+    {"id": "m1", "title": "Oatmeal with banana", "date": "2026-01-16", "meal_type": "breakfast"},
+    {"id": "m2", "title": "Chicken curry", "date": "2026-01-16", "meal_type": "lunch"},
+    {"id": "m3", "title": "Porridge", "date": "2026-01-17", "meal_type": "breakfast"},
+]
+VECTORS = {
+    "Oatmeal with banana": (1, 0, 0),
+    "Chicken curry": (0, 1, 0),
+    "Porridge": (0.9, 0, 0.3),
+    "oats": (1, 0, 0.1),
+    "spaghetti": (0, 0, 1),
+    "": (0, 0, 0),
+}
+
+
+def meal_index(embeddings):
+    return EntityIndex(
+        embeddings,
+        text_of=lambda m: m["title"],
+        date_of=lambda m: m["date"],
+        meal_type_of=lambda m: m["meal_type"],
+    )
+
+
+def test_entity_index_add_remove_and_filters():
+    embeddings = FakeEmbeddings(VECTORS)
+    index = meal_index(embeddings)
+    index.add_many(MEALS + [{"id": "untitled", "title": "", "date": None, "meal_type": None}])
+
+    assert len(index) == 3
+    assert embeddings.calls == [[m["title"] for m in MEALS]]
+    assert index.best_match("oats")[0]["id"] == "m1"
+    assert index.best_match("oats", date="2026-01-17")[0]["id"] == "m3"
+    assert index.best_match("oats", meal_type="lunch") == (None, 0.0)
+
+    index.remove(MEALS[0])
+    assert index.best_match("oats")[0]["id"] == "m3"
+
+
+def test_user_indexes_build_on_first_use_and_skip_earlier_writes():
+    stored = {"u1": list(MEALS[:2])}
+    embeddings = FakeEmbeddings(VECTORS)
+    indexes = UserEntityIndexes(
+        lambda user_id: stored.get(user_id, []),
+        embeddings=embeddings,
+        text_of=lambda m: m["title"],
+    )
+
+    assert indexes.add_later("u1", MEALS[2]) is None
+    assert embeddings.calls == []
+
+    stored["u1"].append(MEALS[2])
+    index = indexes.get("u1")
+    assert len(index) == 3
+    assert indexes.get("u1") is index
+
+    indexes.remove("u1", MEALS[2])
+    assert len(index) == 2
+    assert len(indexes.get("u2")) == 0
+
+
+def test_matcher_resolves_exact_lexical_semantic_and_none():
+    embeddings = FakeEmbeddings(VECTORS)
+    index = meal_index(embeddings)
+    index.add_many(MEALS)
+    matcher = TwoStageMatcher("meal", text_of=lambda m: m["title"])
+    built = []
+
+    def index_factory():
+        built.append(True)
+        return index
+
+    assert matcher.match("chicken curry!", MEALS, index_factory) == (MEALS[1], 1.0)
+    match, score = matcher.match("chiken curry", MEALS, index_factory)
+    assert match is MEALS[1] and score >= matcher.accept
+    assert built == []
+
+    # No title is lexically close: falls back to the vector index.
+    match, score = matcher.match("oats", MEALS, index_factory)
+    assert match is MEALS[0] and score >= matcher.threshold
+    # Below the semantic threshold nothing matches.
+    assert matcher.match("spaghetti", MEALS, index_factory) == (None, 0.0)
+    assert matcher.match("oats", [], index_factory) == (None, 0.0)
+    assert len(built) == 2
+
+
+def test_matcher_margin_sends_close_lexical_calls_to_the_index():
+    embeddings = FakeEmbeddings({**VECTORS, "Chicken curry rice": (0.1, 1, 0), "chicken curry ric": (0, 1, 0)})
+    candidates = [MEALS[1], {"id": "m4", "title": "Chicken curry rice", "date": "2026-01-16", "meal_type": "lunch"}]
+    index = meal_index(embeddings)
+    index.add_many(candidates)
+    matcher = TwoStageMatcher("meal", text_of=lambda m: m["title"])
+    built = []
+
+    def index_factory():
+        built.append(True)
+        return index
+
+    match, _ = matcher.match("chicken curry ric", candidates, index_factory)
+
+    assert built == [True]
+    assert match is MEALS[1]
+
+
+def test_matcher_only_returns_candidates():
+    embeddings = FakeEmbeddings(VECTORS)
+    index = meal_index(embeddings)
+    index.add_many(MEALS)
+    matcher = TwoStageMatcher("meal", text_of=lambda m: m["title"])
+
+    # m1 is the nearest vector but not a candidate for this day.
+    match, _ = matcher.match("oats", [MEALS[1], MEALS[2]], lambda: index, date="2026-01-17")
+
+    assert match is MEALS[2]
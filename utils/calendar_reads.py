@@ -0,0 +1,115 @@
+from concurrent.futures import Future
+import threading
+import time
+
+from utils import metrics
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls and keep their result for `ttl` seconds.
+
+    The first caller for a key runs the call; callers arriving while it is
+    in flight wait for the same result (or exception) instead of starting
+    their own. Results are reused until they expire or `invalidate()` is
+    called; a call already in flight when `invalidate()` runs still answers
+    its waiters but is not cached, since it may predate the change.
+    """
+
+    def __init__(self, ttl=30.0, max_entries=1024, clock=time.monotonic, name="single_flight"):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.name = name
+        self._lock = threading.Lock()
+        self._results = {}  # key -> (expires_at, result)
+        self._in_flight = {}  # key -> Future
+        self._generation = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > self.clock():
+                metrics.inc(f"{self.name}_total", result="hit")
+                return cached[1]
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                generation = self._generation
+        if not leader:
+            metrics.inc(f"{self.name}_total", result="coalesced")
+            return future.result()
+
+        metrics.inc(f"{self.name}_total", result="miss")
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if self.ttl > 0 and generation == self._generation:
+                self._evict_locked()
+                self._results[key] = (self.clock() + self.ttl, result)
+        future.set_result(result)
+        return result
+
+    def _evict_locked(self):
+        if len(self._results) < self.max_entries:
+            return
+        now = self.clock()
+        self._results = {k: v for k, v in self._results.items() if v[0] > now}
+        while len(self._results) >= self.max_entries:
+            del self._results[next(iter(self._results))]
+
+    def invalidate(self, match=None):
+        """Drop cached results whose key satisfies `match` (all when None)."""
+        with self._lock:
+            self._generation += 1
+            if match is None:
+                self._results.clear()
+            else:
+                self._results = {k: v for k, v in self._results.items() if not match(k)}
+
+
+class CalendarReader:
+    """Windowed `events.list` reads behind a SingleFlight.
+
+    Reads are keyed on (calendar, timeMin, timeMax, timezone), so sessions
+    asking about the same window at once share one Calendar call and, for
+    `ttl` seconds, its result. Call `changed(calendar_id)` after writing to
+    a calendar so the next read sees the write. `service` returns the
+    Calendar v3 service to use.
+    """
+
+    def __init__(self, service, ttl=30.0):
+        self.service = service
+        self.flight = SingleFlight(ttl=ttl, name="calendar_reads")
+
+    def list_events(self, time_min, time_max, timezone, calendar_id="primary"):
+        """All single events overlapping [time_min, time_max), ordered by start."""
+        key = (calendar_id, time_min, time_max, timezone)
+        return self.flight.do(key, lambda: self._fetch(*key))
+
+    def _fetch(self, calendar_id, time_min, time_max, timezone):
+        events = []
+        page_token = None
+        while True:
+            result = self.service().events().list(
+                calendarId=calendar_id,
+                timeMin=time_min,
+                timeMax=time_max,
+                timeZone=timezone,
+                singleEvents=True,
+                orderBy="startTime",
+                pageToken=page_token,
+            ).execute()
+            events.extend(result.get("items", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return events
+
+    def changed(self, calendar_id="primary"):
+        self.flight.invalidate(lambda key: key[0] == calendar_id)
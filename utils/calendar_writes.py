@@ -0,0 +1,99 @@
+import random
+import time
+import uuid
+
+from googleapiclient.errors import HttpError
+
+from utils import metrics
+
+# Google caps a batch at 1000 calls but recommends staying around 50.
+MAX_BATCH_SIZE = 50
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Calendar reports rate limiting as 403 with one of these reasons.
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+
+
+def is_retryable(error):
+    """Whether sending the same insert again may succeed."""
+    if not isinstance(error, HttpError):
+        # Connection resets, timeouts and the like.
+        return True
+    status = error.resp.status
+    if status in RETRY_STATUSES:
+        return True
+    if status == 403:
+        details = error.error_details if isinstance(error.error_details, list) else []
+        return any(isinstance(d, dict) and d.get("reason") in RATE_LIMIT_REASONS for d in details)
+    return False
+
+
+def is_duplicate(error):
+    """Whether an insert failed because an event with its id already exists."""
+    return isinstance(error, HttpError) and error.resp.status == 409
+
+
+def insert_events(service, new_batch, bodies, calendar_id="primary", max_attempts=3, base_delay=0.5, sleep=time.sleep):
+    """Insert every body with Calendar batch requests.
+
+    `new_batch(callback)` returns a BatchHttpRequest for `service` (see
+    CalendarClientManager.new_batch). Bodies go out in batches of
+    MAX_BATCH_SIZE. Items that fail with a retryable error (429, 5xx,
+    rate-limit 403, network errors) are resent, and only those, up to
+    `max_attempts` times with jittered exponential backoff in between.
+
+    A failed or unanswered insert may still have been applied, so every
+    body gets a client-generated `id` (uuid4 hex is valid base32hex) before
+    the first attempt; a retry answered with 409 means the earlier attempt
+    created the event, and counts as created.
+
+    Returns one dict per body, in order: {"status": "created", "event",
+    "attempts"} or {"status": "failed", "error", "attempts"}.
+    """
+    bodies = [{**body, "id": body.get("id") or uuid.uuid4().hex} for body in bodies]
+    results = [None] * len(bodies)
+    attempts = [0] * len(bodies)
+    pending = list(range(len(bodies)))
+    for attempt in range(max_attempts):
+        retry = []
+
+        def callback(request_id, response, exception):
+            i = int(request_id)
+            if exception is None:
+                results[i] = {"status": "created", "event": response}
+            elif attempts[i] > 1 and is_duplicate(exception):
+                results[i] = {"status": "created", "event": bodies[i]}
+            else:
+                results[i] = {"status": "failed", "error": str(exception)}
+                if is_retryable(exception):
+                    retry.append(i)
+
+        for offset in range(0, len(pending), MAX_BATCH_SIZE):
+            chunk = pending[offset:offset + MAX_BATCH_SIZE]
+            batch = new_batch(callback)
+            for i in chunk:
+                attempts[i] += 1
+                batch.add(service.events().insert(calendarId=calendar_id, body=bodies[i]), request_id=str(i))
+            try:
+                batch.execute()
+            except Exception as e:
+                # The batch request itself failed; none of its items were answered.
+                for i in chunk:
+                    if results[i] is None or results[i]["status"] != "created":
+                        results[i] = {"status": "failed", "error": str(e)}
+                if is_retryable(e):
+                    retry.extend(i for i in chunk if results[i]["status"] != "created")
+
+        metrics.inc("calendar_batch_items_total", len(pending), attempt=str(attempt + 1))
+        pending = sorted(set(retry))
+        if not pending:
+            break
+        if attempt + 1 < max_attempts:
+            print(f"Retrying {len(pending)} failed calendar inserts")
+            sleep(random.uniform(0, base_delay * 2 ** attempt))
+
+    for i, result in enumerate(results):
+        if result is None:
+            result = results[i] = {"status": "failed", "error": "no response in batch reply"}
+        result["attempts"] = attempts[i]
+    metrics.inc("calendar_batch_failed_total", sum(1 for r in results if r["status"] != "created"))
+    return results
@@ -0,0 +1,201 @@
+import threading
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from utils.helpers import load_sessions, save_sessions, get_or_create_session
+from utils.metrics import record_usage
+from utils.tracing import span
+
+ConversationContext = namedtuple("ConversationContext", ["summary", "turns", "messages"])
+
+SUMMARY_PROMPT = """You keep a running summary of a conversation between a user and an AI assistant.
+Merge the new turns into the existing summary. Keep names, dates, times, preferences,
+decisions and open questions; drop small talk. Reply with the updated summary only."""
+
+_encoder = None
+_encoder_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, else estimate ~4 chars/token."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoder = None
+        _encoder_loaded = True
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def render_turn(turn):
+    return f"User: {turn['user_message']}\nAI: {turn['ai_message']}\n"
+
+
+def turn_messages(turn):
+    """One stored turn as Responses API input messages."""
+    return (
+        {"role": "user", "content": turn["user_message"]},
+        {"role": "assistant", "content": turn["ai_message"]},
+    )
+
+
+def make_llm_summarizer(client, model_router, tag="summary"):
+    """Return a `summarize(summary, turns)` callable backed by the Responses API.
+
+    The model comes from `model_router`'s pool for `tag`.
+    """
+    def summarize(summary, turns):
+        transcript = "".join(render_turn(t) for t in turns)
+        summary_input = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+        ]
+        response = model_router.call(
+            tag, lambda model: client.responses.create(model=model, input=summary_input)
+        )
+        record_usage(response, call="summary")
+        return response.output_text.strip()
+    return summarize
+
+
+class _RenderedSession:
+    __slots__ = ("version", "rendered", "cumulative")
+
+    def __init__(self, version):
+        self.version = version
+        # rendered[i] = input messages for turn i
+        self.rendered = []
+        # cumulative[i] = tokens in the first i rendered turns
+        self.cumulative = [0]
+
+
+class PromptCache:
+    """Per-session cache of turns rendered as messages, with running token counts.
+
+    An entry remembers how many turns it covers and the store version it was
+    built from. A request only renders and tokenizes the turns appended since
+    the last one; the entry is rebuilt only when the session was edited.
+    """
+
+    def __init__(self, max_sessions=1024):
+        self.max_sessions = max_sessions
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, turns, version=0):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry.version != version or len(entry.rendered) > len(turns):
+                entry = _RenderedSession(version)
+                self._entries[session_id] = entry
+            for turn in turns[len(entry.rendered):]:
+                messages = turn_messages(turn)
+                entry.rendered.append(messages)
+                entry.cumulative.append(
+                    entry.cumulative[-1] + sum(count_tokens(m["content"]) for m in messages)
+                )
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+            return entry
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
+class ContextBuilder:
+    """Rolling conversation window with an incrementally updated summary.
+
+    The newest turns are kept verbatim while they fit in `max_turns` and
+    `token_budget`. Older turns are folded into a summary stored in the
+    session's metadata, together with how many turns it covers, so each turn
+    is summarized once. When the window overflows it is folded down to
+    `low_watermark` of the limits, so summarization runs every few turns
+    instead of on every request. If summarizing fails, the request goes on
+    with the previous summary and the truncated window.
+    """
+
+    def __init__(self, summarize, max_turns=20, token_budget=4000, low_watermark=0.5, cache=None):
+        self.summarize = summarize
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.low_watermark = low_watermark
+        self.cache = cache or PromptCache()
+
+    @staticmethod
+    def window_start(cumulative, n, max_turns, token_budget):
+        """Index of the oldest of the first `n` turns that still fits in the limits."""
+        return max(bisect_left(cumulative, cumulative[n] - token_budget, 0, n + 1), n - max_turns, 0)
+
+    def build(self, store, session_id, turns):
+        meta = store.read_meta(session_id)
+        summary = meta.get("summary", "")
+        summarized = min(meta.get("summarized_turns", 0), len(turns))
+        cached = self.cache.get(session_id, turns, store.version(session_id))
+        n = len(turns)
+
+        start = self.window_start(cached.cumulative, n, self.max_turns, self.token_budget)
+        if start > summarized:
+            fold_to = max(start, self.window_start(
+                cached.cumulative,
+                n,
+                max(1, int(self.max_turns * self.low_watermark)),
+                int(self.token_budget * self.low_watermark),
+            ))
+            try:
+                new_summary = self.summarize(summary, turns[summarized:fold_to])
+            except Exception as e:
+                # Answer from the old summary and the truncated window; the
+                # fold is retried on the next request.
+                print(f"Summarizing session {session_id} failed: {e}")
+            else:
+                summary, summarized = new_summary, fold_to
+                store.write_meta(session_id, {**meta, "summary": summary, "summarized_turns": summarized})
+
+        start = max(start, summarized)
+        messages = [m for pair in cached.rendered[start:n] for m in pair]
+        return ConversationContext(summary, turns[start:], messages)
+
+
+def open_session(context_builder, sessions_file, session_id=None):
+    """Load one session from `sessions_file` and build its token-budgeted context window."""
+    with span("session.load"):
+        sessions = load_sessions(sessions_file)
+        session_id = get_or_create_session(sessions, session_id)
+        context = context_builder.build(sessions.store, session_id, sessions[session_id])
+    return sessions, session_id, context
+
+
+def save_turn(sessions, sessions_file, session_id, user_message, ai_message):
+    conversation_entry = {
+        "user_message": user_message,
+        "ai_message": ai_message,
+    }
+
+    with span("session.save"):
+        sessions[session_id].append(conversation_entry)
+        save_sessions(sessions, sessions_file)
+
+
+def build_chat_input(system_prompt, context, message):
+    """Role-based input whose prefix stays byte-identical between turns.
+
+    The system prompt, summary and past turns come first so the provider can
+    reuse its prompt cache; the current time and the new message go last.
+    """
+    with span("prompt.build"):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        chat_input = [{"role": "system", "content": system_prompt}]
+        if context.summary:
+            chat_input.append({"role": "system", "content": f"Summary of the earlier conversation:\n{context.summary}"})
+        chat_input.extend(context.messages)
+        chat_input.append({"role": "system", "content": f"Current server date & time: {now}"})
+        chat_input.append({"role": "user", "content": message})
+    return chat_input
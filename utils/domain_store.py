@@ -0,0 +1,378 @@
+import json
+import sqlite3
+import threading
+
+from utils.event_cache import parse_event_time
+
+DEFAULT_USER_ID = "default"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meals (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT,
+    meal_type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT,
+    calories REAL
+);
+CREATE INDEX IF NOT EXISTS meals_user_date_type ON meals (user_id, date, meal_type);
+
+CREATE TABLE IF NOT EXISTS meal_rollups (
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    meal_type TEXT NOT NULL,
+    meals INTEGER NOT NULL,
+    calories REAL NOT NULL,
+    PRIMARY KEY (user_id, date, meal_type)
+);
+
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    recipe_name TEXT NOT NULL,
+    meal_type TEXT,
+    cooking_time REAL,
+    description TEXT,
+    ratings REAL
+);
+CREATE INDEX IF NOT EXISTS recipes_user_type ON recipes (user_id, meal_type);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    time TEXT,
+    due_at REAL,
+    fired_at REAL
+);
+CREATE INDEX IF NOT EXISTS reminders_user_due ON reminders (user_id, due_at);
+
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    items TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_user ON notes (user_id);
+
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    summary TEXT,
+    date TEXT,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS events_user_start_end ON events (user_id, start, end);
+CREATE INDEX IF NOT EXISTS events_user_date ON events (user_id, date);
+"""
+
+MEAL_COLUMNS = ("date", "time", "meal_type", "title", "description", "calories")
+RECIPE_COLUMNS = ("recipe_name", "meal_type", "cooking_time", "description", "ratings")
+
+
+class DomainStore:
+    """SQLite storage for meals, recipes, reminders, notes and events.
+
+    Every row carries a user_id, and each table is indexed on user_id plus
+    its lookup keys: (date, meal_type) for meals, (start, end) for events,
+    and due time for reminders. The database runs in WAL mode, so several
+    uvicorn workers can share one file. Rows come back as the same dicts the
+    tools have always returned, now with an `id`.
+    """
+
+    def __init__(self, path="assistant.db"):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            self._backfill_rollups(conn)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, table, user_id, values):
+        with self._conn() as conn:
+            return self._insert_many(conn, table, user_id, [values])[0]
+
+    @staticmethod
+    def _insert_many(conn, table, user_id, rows):
+        """Insert `rows` (dicts with the same keys); returns their ids. The caller commits."""
+        if not rows:
+            return []
+        columns = ", ".join(["user_id", *rows[0]])
+        placeholders = ", ".join("?" * (len(rows[0]) + 1))
+        ids = []
+        for values in rows:
+            cursor = conn.execute(
+                f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                [user_id, *values.values()],
+            )
+            ids.append(cursor.lastrowid)
+        return ids
+
+    @staticmethod
+    def _migrate(conn):
+        """Bring tables created by older versions up to the current SCHEMA."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(reminders)")}
+        if "fired_at" not in columns:
+            conn.execute("ALTER TABLE reminders ADD COLUMN fired_at REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS reminders_pending ON reminders (fired_at, due_at)")
+
+    def is_empty(self):
+        conn = self._conn()
+        return not any(
+            conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+            for table in ("meals", "recipes", "reminders", "notes", "events")
+        )
+
+    # ---------- Meals ----------
+    @staticmethod
+    def _meal(row):
+        return {**{column: row[column] for column in MEAL_COLUMNS}, "id": row["id"]}
+
+    def add_meal(self, user_id, meal):
+        return self.add_meals(user_id, [meal])[0]
+
+    def add_meals(self, user_id, meals):
+        with self._conn() as conn:
+            ids = self._insert_many(conn, "meals", user_id, [{c: m.get(c) for c in MEAL_COLUMNS} for m in meals])
+            for meal in meals:
+                self._bump_rollup(conn, user_id, meal, 1)
+        return [{**meal, "id": meal_id} for meal, meal_id in zip(meals, ids)]
+
+    def meals(self, user_id, date=None, meal_type=None, start_date=None, end_date=None):
+        query = "SELECT * FROM meals WHERE user_id = ?"
+        params = [user_id]
+        if date is not None:
+            query += " AND date = ?"
+            params.append(date)
+        if start_date is not None:
+            query += " AND date >= ?"
+            params.append(start_date)
+        if end_date is not None:
+            query += " AND date <= ?"
+            params.append(end_date)
+        if meal_type is not None:
+            query += " AND meal_type = ?"
+            params.append(meal_type)
+        query += " ORDER BY date, time"
+        return [self._meal(row) for row in self._conn().execute(query, params)]
+
+    def _get_meal(self, conn, user_id, meal_id):
+        row = conn.execute(
+            "SELECT * FROM meals WHERE user_id = ? AND id = ?", (user_id, meal_id)
+        ).fetchone()
+        return self._meal(row) if row else None
+
+    def update_meal(self, user_id, meal_id, **changes):
+        changes = {c: v for c, v in changes.items() if c in MEAL_COLUMNS and v is not None}
+        with self._conn() as conn:
+            old = self._get_meal(conn, user_id, meal_id)
+            if old is None or not changes:
+                return old
+            assignments = ", ".join(f"{c} = ?" for c in changes)
+            conn.execute(
+                f"UPDATE meals SET {assignments} WHERE user_id = ? AND id = ?",
+                [*changes.values(), user_id, meal_id],
+            )
+            new = {**old, **changes}
+            self._bump_rollup(conn, user_id, old, -1)
+            self._bump_rollup(conn, user_id, new, 1)
+        return new
+
+    def delete_meal(self, user_id, meal_id):
+        with self._conn() as conn:
+            old = self._get_meal(conn, user_id, meal_id)
+            if old is None:
+                return False
+            conn.execute("DELETE FROM meals WHERE user_id = ? AND id = ?", (user_id, meal_id))
+            self._bump_rollup(conn, user_id, old, -1)
+        return True
+
+    # ---------- Nutrition rollups ----------
+    @staticmethod
+    def _bump_rollup(conn, user_id, meal, sign):
+        """Add (sign=1) or remove (sign=-1) one meal from its day's totals."""
+        conn.execute(
+            "INSERT INTO meal_rollups (user_id, date, meal_type, meals, calories) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (user_id, date, meal_type) DO UPDATE SET "
+            "meals = meals + excluded.meals, calories = calories + excluded.calories",
+            (user_id, meal["date"], meal["meal_type"], sign, sign * (meal.get("calories") or 0)),
+        )
+        if sign < 0:
+            conn.execute(
+                "DELETE FROM meal_rollups WHERE user_id = ? AND date = ? AND meal_type = ? AND meals <= 0",
+                (user_id, meal["date"], meal["meal_type"]),
+            )
+
+    @staticmethod
+    def _backfill_rollups(conn):
+        # Databases created before the rollups existed have meals but no totals.
+        if conn.execute("SELECT 1 FROM meal_rollups LIMIT 1").fetchone():
+            return
+        conn.execute(
+            "INSERT INTO meal_rollups (user_id, date, meal_type, meals, calories) "
+            "SELECT user_id, date, meal_type, COUNT(*), COALESCE(SUM(calories), 0) "
+            "FROM meals GROUP BY user_id, date, meal_type"
+        )
+
+    def meal_summary(self, user_id, start_date, end_date=None):
+        """Calories and meal counts per day and meal_type for [start_date, end_date].
+
+        Reads only the rollup rows of the range, never the meals themselves.
+        """
+        end_date = end_date or start_date
+        days = {}
+        for row in self._conn().execute(
+            "SELECT date, meal_type, meals, calories FROM meal_rollups "
+            "WHERE user_id = ? AND date >= ? AND date <= ? ORDER BY date",
+            (user_id, start_date, end_date),
+        ):
+            day = days.setdefault(row["date"], {"date": row["date"], "meals": 0, "calories": 0, "by_meal_type": {}})
+            day["meals"] += row["meals"]
+            day["calories"] += row["calories"]
+            day["by_meal_type"][row["meal_type"]] = {"meals": row["meals"], "calories": row["calories"]}
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "meals": sum(day["meals"] for day in days.values()),
+            "calories": sum(day["calories"] for day in days.values()),
+            "days": list(days.values()),
+        }
+
+    # ---------- Recipes ----------
+    def add_recipe(self, user_id, recipe):
+        recipe_id = self._insert("recipes", user_id, {c: recipe.get(c) for c in RECIPE_COLUMNS})
+        return {**recipe, "id": recipe_id}
+
+    def recipes(self, user_id, meal_type=None):
+        query = "SELECT * FROM recipes WHERE user_id = ?"
+        params = [user_id]
+        if meal_type is not None:
+            query += " AND meal_type = ?"
+            params.append(meal_type)
+        return [
+            {**{c: row[c] for c in RECIPE_COLUMNS}, "id": row["id"]}
+            for row in self._conn().execute(query, params)
+        ]
+
+    # ---------- Reminders ----------
+    def add_reminder(self, user_id, reminder, due_at=None):
+        return self.add_reminders(user_id, [reminder], [due_at])[0]
+
+    def add_reminders(self, user_id, reminders, due_ats):
+        """`due_ats` holds one epoch-seconds due time (or None) per reminder."""
+        with self._conn() as conn:
+            ids = self._insert_many(
+                conn, "reminders", user_id,
+                [{"title": r["title"], "time": r["time"], "due_at": due_at} for r, due_at in zip(reminders, due_ats)],
+            )
+        return [{**reminder, "id": reminder_id} for reminder, reminder_id in zip(reminders, ids)]
+
+    def reminders(self, user_id, due_before=None):
+        query = "SELECT * FROM reminders WHERE user_id = ?"
+        params = [user_id]
+        if due_before is not None:
+            query += " AND due_at <= ?"
+            params.append(due_before)
+        query += " ORDER BY due_at"
+        return [self._reminder(row) for row in self._conn().execute(query, params)]
+
+    @staticmethod
+    def _reminder(row):
+        return {"title": row["title"], "time": row["time"], "id": row["id"], "due_at": row["due_at"]}
+
+    def pending_reminders(self):
+        """(user_id, reminder) for every reminder with a due time that has not fired."""
+        return [
+            (row["user_id"], self._reminder(row))
+            for row in self._conn().execute(
+                "SELECT * FROM reminders WHERE fired_at IS NULL AND due_at IS NOT NULL ORDER BY due_at"
+            )
+        ]
+
+    def claim_reminder(self, user_id, reminder_id, fired_at):
+        """Mark a reminder fired; False if it already was (e.g. by another worker)."""
+        with self._conn() as conn:
+            return conn.execute(
+                "UPDATE reminders SET fired_at = ? WHERE user_id = ? AND id = ? AND fired_at IS NULL",
+                (fired_at, user_id, reminder_id),
+            ).rowcount == 1
+
+    def release_reminder(self, user_id, reminder_id):
+        """Undo claim_reminder after a failed delivery."""
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE reminders SET fired_at = NULL WHERE user_id = ? AND id = ?", (user_id, reminder_id)
+            )
+
+    # ---------- Notes ----------
+    def add_note(self, user_id, note):
+        note_id = self._insert(
+            "notes", user_id, {"title": note["title"], "items": json.dumps(note["items"])}
+        )
+        return {**note, "id": note_id}
+
+    def notes(self, user_id):
+        return [
+            {"title": row["title"], "items": json.loads(row["items"]), "id": row["id"]}
+            for row in self._conn().execute("SELECT * FROM notes WHERE user_id = ?", (user_id,))
+        ]
+
+    # ---------- Events ----------
+    def upsert_event(self, user_id, event):
+        return self.upsert_events(user_id, [event])[0]
+
+    def upsert_events(self, user_id, events):
+        rows = [
+            (
+                event["id"], user_id, event.get("summary"), event.get("date"),
+                parse_event_time(event["start"]), parse_event_time(event["end"]), json.dumps(event),
+            )
+            for event in events
+        ]
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO events (id, user_id, summary, date, start, end, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return events
+
+    def delete_event(self, user_id, event_id):
+        with self._conn() as conn:
+            return conn.execute(
+                "DELETE FROM events WHERE user_id = ? AND id = ?", (user_id, event_id)
+            ).rowcount > 0
+
+    def events(self, user_id, date=None):
+        query = "SELECT body FROM events WHERE user_id = ?"
+        params = [user_id]
+        if date is not None:
+            query += " AND date = ?"
+            params.append(date)
+        query += " ORDER BY start"
+        return [json.loads(row["body"]) for row in self._conn().execute(query, params)]
+
+    def events_between(self, user_id, start, end):
+        """Events overlapping [start, end), given as epoch seconds."""
+        return [
+            json.loads(row["body"])
+            for row in self._conn().execute(
+                "SELECT body FROM events WHERE user_id = ? AND start < ? AND end > ? ORDER BY start",
+                (user_id, end, start),
+            )
+        ]
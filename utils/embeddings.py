@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+
+
+class EmbeddingService:
+    """Batched embeddings with a two-tier cache.
+
+    Vectors are keyed by a hash of (model, text). The hot tier is an in-memory
+    LRU of `max_cached` vectors; every vector is also written to a SQLite file
+    so evicted or previously computed vectors survive restarts without another
+    API call. All cache misses of one `embed_many` call go out as a single
+    embeddings request (chunked by `batch_size`). The SQLite file is opened
+    and the worker thread started on first use, so an unused service costs
+    nothing at import time.
+    """
+
+    def __init__(self, client, model="text-embedding-3-small", max_cached=10000, spill_path=None, batch_size=256):
+        self.client = client
+        self.model = model
+        self.max_cached = max_cached
+        self.batch_size = batch_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.spill_path = spill_path
+        self._db = None
+        # ThreadPoolExecutor starts its thread on the first submit.
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self.api_calls = 0
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _spill_db(self):
+        """The SQLite spill connection, opened on first use; call with _lock held."""
+        if self._db is None and self.spill_path:
+            self._db = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_cached:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+            missing = [key for key in keys if key not in found]
+            db = self._spill_db() if missing else None
+            if db is not None:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows = db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        found[key] = vector
+        return found
+
+    def _store(self, pairs):
+        with self._lock:
+            for key, vector in pairs:
+                self._remember(key, vector)
+            db = self._spill_db()
+            if db is not None:
+                db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in pairs],
+                )
+                db.commit()
+
+    def embed_many(self, texts):
+        """Return one float32 vector per text, calling the API only for misses."""
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                pending[key] = text
+        pending_items = list(pending.items())
+        for start in range(0, len(pending_items), self.batch_size):
+            batch = pending_items[start:start + self.batch_size]
+            response = self.client.embeddings.create(model=self.model, input=[text for _, text in batch])
+            self.api_calls += 1
+            pairs = [
+                (key, np.asarray(item.embedding, dtype=np.float32))
+                for (key, _), item in zip(batch, sorted(response.data, key=lambda d: d.index))
+            ]
+            self._store(pairs)
+            found.update(pairs)
+        return [found[key] for key in keys]
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+    def background(self, fn):
+        """Run `fn` on the embedding worker thread; failures are logged, not raised."""
+        def run():
+            try:
+                return fn()
+            except Exception as e:
+                print(f"Background embedding failed: {e}")
+
+        return self._worker.submit(run)
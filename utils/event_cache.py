@@ -0,0 +1,158 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import threading
+
+from googleapiclient.errors import HttpError
+
+
+def parse_event_time(value, timezone=None):
+    """Epoch seconds for a Calendar `start`/`end` dict or an ISO 8601 string.
+
+    Naive datetimes are read in `timezone`; all-day events (`date`) start at
+    midnight of that day.
+    """
+    if isinstance(value, dict):
+        timezone = value.get("timeZone") or timezone
+        value = value.get("dateTime") or value.get("date")
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=ZoneInfo(timezone or "UTC"))
+    return dt.timestamp()
+
+
+class EventCache:
+    """Local time index over calendar events for overlap queries.
+
+    Events are kept in a list sorted by start time. Since no event lasts
+    longer than the longest one seen, every event overlapping [start, end)
+    starts in [start - max_duration, end), so a query is two bisections plus
+    a scan of that slice: O(log n + k) without a Calendar API call. The index
+    is kept current with incremental `events.list` sync tokens.
+    """
+
+    def __init__(self, calendar_id="primary"):
+        self.calendar_id = calendar_id
+        self.sync_token = None
+        self._lock = threading.Lock()
+        self._starts = []  # sorted (start, event_id)
+        self._events = {}  # event_id -> (start, end, event)
+        self._max_duration = 0.0
+        # Local writes made while a full sync rebuilds the index; replayed
+        # on top of the rebuilt index so they are not lost in the swap.
+        self._pending = None
+
+    def __len__(self):
+        return len(self._events)
+
+    def _remove_locked(self, event_id):
+        entry = self._events.pop(event_id, None)
+        if entry is not None:
+            i = bisect_left(self._starts, (entry[0], event_id))
+            if i < len(self._starts) and self._starts[i] == (entry[0], event_id):
+                del self._starts[i]
+
+    def _upsert_locked(self, event, start, end):
+        self._remove_locked(event["id"])
+        self._events[event["id"]] = (start, end, event)
+        insort(self._starts, (start, event["id"]))
+        self._max_duration = max(self._max_duration, end - start)
+
+    def upsert(self, event):
+        try:
+            start = parse_event_time(event["start"])
+            end = parse_event_time(event["end"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            self._upsert_locked(event, start, end)
+            if self._pending is not None:
+                self._pending.append((event, start, end))
+
+    def remove(self, event_id):
+        with self._lock:
+            self._remove_locked(event_id)
+            if self._pending is not None:
+                self._pending.append((event_id, None, None))
+
+    def load(self, events):
+        for event in events:
+            self.upsert(event)
+
+    def clear(self):
+        with self._lock:
+            self._starts = []
+            self._events = {}
+            self._max_duration = 0.0
+
+    def _swap_in(self, rebuilt):
+        """Replace the index with `rebuilt`, then replay writes made meanwhile."""
+        with self._lock:
+            self._starts = rebuilt._starts
+            self._events = rebuilt._events
+            self._max_duration = rebuilt._max_duration
+            for change, start, end in self._pending:
+                if start is None:
+                    self._remove_locked(change)
+                else:
+                    self._upsert_locked(change, start, end)
+            self._pending = None
+
+    def overlapping(self, start, end):
+        """Events overlapping [start, end), both given as epoch seconds."""
+        with self._lock:
+            lo = bisect_left(self._starts, (start - self._max_duration,))
+            hi = bisect_left(self._starts, (end,))
+            found = []
+            for _, event_id in self._starts[lo:hi]:
+                ev_start, ev_end, event = self._events[event_id]
+                if ev_end > start and ev_start < end:
+                    found.append(event)
+            return found
+
+    def find_conflicts(self, start_datetime, end_datetime, timezone):
+        return self.overlapping(
+            parse_event_time(start_datetime, timezone),
+            parse_event_time(end_datetime, timezone),
+        )
+
+    def sync(self, service):
+        """Pull changes since the last sync; falls back to a full sync when needed.
+
+        A full sync fills a separate index and swaps it in at the end, so
+        conflict checks running meanwhile still see the previous events
+        rather than an empty or half-filled index.
+        """
+        params = {"calendarId": self.calendar_id, "singleEvents": True, "showDeleted": True}
+        if self.sync_token:
+            params["syncToken"] = self.sync_token
+            target = self
+        else:
+            target = EventCache(self.calendar_id)
+            with self._lock:
+                self._pending = []
+        page_token = None
+        try:
+            while True:
+                result = service.events().list(pageToken=page_token, **params).execute()
+                for item in result.get("items", []):
+                    if item.get("status") == "cancelled":
+                        target.remove(item["id"])
+                    else:
+                        target.upsert(item)
+                page_token = result.get("nextPageToken")
+                if not page_token:
+                    break
+        except HttpError as error:
+            if target is not self:
+                with self._lock:
+                    self._pending = None
+            # 410 Gone: the sync token expired, start over with a full sync.
+            if error.resp.status == 410 and self.sync_token:
+                self.sync_token = None
+                return self.sync(service)
+            raise
+        if target is not self:
+            self._swap_in(target)
+        self.sync_token = result.get("nextSyncToken")
+        return len(self)
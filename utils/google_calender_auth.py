@@ -1,7 +1,14 @@
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest, HttpRequest
+from datetime import datetime, timedelta, timezone
+import httplib2
 import os
+import threading
+from urllib.parse import urljoin
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
@@ -38,3 +45,99 @@ def get_credentials():
     
     # print("Google Calendar credentials obtained.")
     return creds
+
+
+class CalendarClientManager:
+    """Process-wide Google Calendar client.
+
+    Credentials are loaded from token.json once and kept in memory. They are
+    refreshed under a lock shortly before they expire, so request threads
+    never race to refresh the same token. One service object, built from the
+    bundled static discovery document, is shared by every request, while each
+    thread reuses its own authorized HTTP connection (httplib2 connections are
+    not thread-safe).
+
+    `credentials` replaces token.json and `api_endpoint` the Google endpoint,
+    e.g. to point the client at a local fake.
+    """
+
+    def __init__(self, refresh_margin=timedelta(minutes=5), http_timeout=30, credentials=None, api_endpoint=None):
+        self.refresh_margin = refresh_margin
+        self.http_timeout = http_timeout
+        self.api_endpoint = api_endpoint
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._creds = credentials
+        self._service = None
+
+    def _needs_refresh(self, creds):
+        if not creds.valid:
+            return True
+        if creds.expiry is None:
+            return False
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now < self.refresh_margin
+
+    def credentials(self):
+        creds = self._creds
+        if creds is not None and not self._needs_refresh(creds):
+            return creds
+        with self._lock:
+            creds = self._creds
+            if creds is None:
+                creds = get_credentials()
+            if self._needs_refresh(creds) and creds.refresh_token:
+                creds.refresh(Request())
+                with open(TOKEN_PATH, "w") as token:
+                    token.write(creds.to_json())
+            self._creds = creds
+        return creds
+
+    def _thread_http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self.credentials(), http=httplib2.Http(timeout=self.http_timeout))
+            self._local.http = http
+        return http
+
+    def _build_request(self, http, *args, **kwargs):
+        return HttpRequest(self._thread_http(), *args, **kwargs)
+
+    def service(self):
+        """Return the shared Calendar v3 service, refreshing credentials if due."""
+        creds = self.credentials()
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = build(
+                        "calendar",
+                        "v3",
+                        credentials=creds,
+                        static_discovery=True,
+                        cache_discovery=False,
+                        requestBuilder=self._build_request,
+                        client_options={"api_endpoint": self.api_endpoint} if self.api_endpoint else None,
+                    )
+        return self._service
+
+    def new_batch(self, callback=None):
+        """A BatchHttpRequest for requests built by service().
+
+        The service's own new_batch_http_request() posts to the discovery
+        document's root URL, which ignores api_endpoint.
+        """
+        service = self.service()
+        if self.api_endpoint:
+            return BatchHttpRequest(callback=callback, batch_uri=urljoin(self.api_endpoint, "/batch/calendar/v3"))
+        return service.new_batch_http_request(callback=callback)
+
+
+calendar_client = CalendarClientManager()
+
+
+def get_calendar_service():
+    return calendar_client.service()
+
+
+def new_calendar_batch(callback=None):
+    return calendar_client.new_batch(callback)
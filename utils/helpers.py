@@ -2,13 +2,17 @@ from googleapiclient.errors import HttpError
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import os
-import json
 import uuid
 import re
+import threading
 from typing import Optional
+from utils.session_store import SessionStore, SessionMap
 
 SESSIONS_FILE = "chat_sessions.json"
 
+_stores = {}
+_stores_lock = threading.Lock()
+
 def to_rfc3339(dt_str: str, timezone: str):
     """
     Converts 'YYYY-MM-DDTHH:MM:SS' → RFC3339 with timezone
@@ -17,8 +21,7 @@ def to_rfc3339(dt_str: str, timezone: str):
     dt = dt.replace(tzinfo=ZoneInfo(timezone))
     return dt.isoformat()
 
-def create_event(
-    service,
+def build_event_body(
     summary,
     description,
     start_datetime,
@@ -28,9 +31,7 @@ def create_event(
     reminder="15 minutes",              # dict from UI
     method="popup"
 ):
-    # print("Creating event on Google Calendar...")
-    # print(summary, description, start_datetime, end_datetime, timezone, repeat, reminder, method)
-    
+    """The Calendar `events.insert` body for one event."""
     reminder = reminder.lower().strip()
     unit_map = {
         "min": "minutes",
@@ -57,57 +58,73 @@ def create_event(
         if unit:
             reminder = f"{value} {unit}"
 
-        
-    try:
-        event = {
-            "summary": summary,
-            "description": description,
-            "start": {
-                "dateTime": start_datetime,
-                "timeZone": timezone,
-            },
-            "end": {
-                "dateTime": end_datetime,
-                "timeZone": timezone,
-            }
+    event = {
+        "summary": summary,
+        "description": description,
+        "start": {
+            "dateTime": start_datetime,
+            "timeZone": timezone,
+        },
+        "end": {
+            "dateTime": end_datetime,
+            "timeZone": timezone,
         }
+    }
+
+    # ---------- Reminder handling ----------
+    if reminder:
+        reminder_parts = reminder.split()
+        reminder = {
+            "value": int(reminder_parts[0]),
+            "unit": reminder_parts[1],  # minutes, hours, days, weeks
+        }
+        UNIT_TO_MINUTES = {
+            "minutes": 1,
+            "hours": 60,
+            "days": 1440,
+            "weeks": 10080
+        }
+
+        minutes = reminder["value"] * UNIT_TO_MINUTES[reminder["unit"]]
+
+        # method = "popup" if reminder["type"] == "notification" else "email"
+
+        event["reminders"] = {
+            "useDefault": False,
+            "overrides": [
+                {
+                    "method": method,
+                    "minutes": minutes
+                }
+            ]
+        }
+
+    # ---------- Repeat / stamp ----------
+    if repeat == "everyday":
+        event["recurrence"] = ["RRULE:FREQ=DAILY"]
+    elif repeat == "every_week":
+        event["recurrence"] = ["RRULE:FREQ=WEEKLY"]
+    elif repeat == "every_month":
+        event["recurrence"] = ["RRULE:FREQ=MONTHLY"]
 
-        # ---------- Reminder handling ----------
-        if reminder:
-            reminder_parts = reminder.split()
-            reminder = {
-                "value": int(reminder_parts[0]),
-                "unit": reminder_parts[1],  # minutes, hours, days, weeks
-            }
-            UNIT_TO_MINUTES = {
-                "minutes": 1,
-                "hours": 60,
-                "days": 1440,
-                "weeks": 10080
-            }
-
-            minutes = reminder["value"] * UNIT_TO_MINUTES[reminder["unit"]]
-
-            # method = "popup" if reminder["type"] == "notification" else "email"
-
-            event["reminders"] = {
-                "useDefault": False,
-                "overrides": [
-                    {
-                        "method": method,
-                        "minutes": minutes
-                    }
-                ]
-            }
-
-        # ---------- Repeat / stamp ----------
-        if repeat == "everyday":
-            event["recurrence"] = ["RRULE:FREQ=DAILY"]
-        elif repeat == "every_week":
-            event["recurrence"] = ["RRULE:FREQ=WEEKLY"]
-        elif repeat == "every_month":
-            event["recurrence"] = ["RRULE:FREQ=MONTHLY"]
+    return event
 
+
+def create_event(
+    service,
+    summary,
+    description,
+    start_datetime,
+    end_datetime,
+    timezone,
+    repeat="never",
+    reminder="15 minutes",
+    method="popup"
+):
+    # print("Creating event on Google Calendar...")
+    # print(summary, description, start_datetime, end_datetime, timezone, repeat, reminder, method)
+    event = build_event_body(summary, description, start_datetime, end_datetime, timezone, repeat, reminder, method)
+    try:
         created_event = service.events().insert(
             calendarId="primary",
             body=event
@@ -231,20 +248,32 @@ def create_event(
 #     except HttpError as error:
 #         print(f"An error occurred: {error}")
         
-def load_sessions():
-    """Load all chat sessions from file."""
-    if os.path.exists(SESSIONS_FILE):
-        with open(SESSIONS_FILE, "r") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-    return {}
-
-def save_sessions(sessions):
-    """Save all chat sessions to file."""
-    with open(SESSIONS_FILE, "w") as f:
-        json.dump(sessions, f, indent=2)
+def get_session_store(sessions_file=SESSIONS_FILE):
+    """Return the process-wide append-only store that replaces `sessions_file`.
+
+    Logs live in a directory named after the file (chat_sessions.json ->
+    chat_sessions/); the legacy JSON file is imported once on first use.
+    """
+    directory = os.path.splitext(sessions_file)[0]
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = SessionStore(directory, legacy_file=sessions_file)
+            _stores[directory] = store
+    return store
+
+def load_sessions(sessions_file=SESSIONS_FILE):
+    """Load chat sessions lazily; a session is only read when accessed."""
+    return SessionMap(get_session_store(sessions_file))
+
+def save_sessions(sessions, sessions_file=SESSIONS_FILE):
+    """Append new turns to the session logs."""
+    if isinstance(sessions, SessionMap):
+        sessions.flush()
+        return
+    store = get_session_store(sessions_file)
+    for session_id, turns in sessions.items():
+        store.rewrite(session_id, turns)
 
 def get_or_create_session(sessions, session_id=None):
     """Return existing session if found, otherwise create a new one."""
@@ -252,4 +281,4 @@ def get_or_create_session(sessions, session_id=None):
         return session_id
     new_id = session_id or str(uuid.uuid4())
     sessions[new_id] = []
-    return new_id
\ No newline at end of file
+    return new_id
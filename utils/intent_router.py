@@ -0,0 +1,253 @@
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+import math
+import re
+
+from utils import metrics
+from utils.matching import normalize
+
+Route = namedtuple("Route", ["tool_name", "args", "confidence"])
+
+# Labelled examples for the classifier. They only have to separate the two
+# directly dispatchable tools from everything else; the slot rules decide
+# whether a message is complete enough to dispatch.
+TRAINING_EXAMPLES = [
+    ("add_meal", "add oatmeal for breakfast 350 calories at 8:30"),
+    ("add_meal", "i had chicken salad for lunch at 1pm 450 calories"),
+    ("add_meal", "log eggs and toast for breakfast 300 kcal at 7:15"),
+    ("add_meal", "i ate pasta for dinner at 8 pm around 700 calories"),
+    ("add_meal", "track my lunch rice and beans 550 calories at 12:30"),
+    ("add_meal", "add a banana smoothie to breakfast 250 cal at 9am"),
+    ("add_meal", "for dinner i had grilled fish at 7:45 pm 500 calories"),
+    ("add_meal", "breakfast was pancakes at 8 400 calories"),
+    ("add_meal", "log a burger for lunch 800 kcal at 1:30 pm"),
+    ("add_meal", "had soup for dinner 300 calories at 7"),
+    ("add_meal", "add meal yogurt with berries breakfast 200 calories 7:30"),
+    ("add_meal", "i just ate a sandwich for lunch at noon 450 calories"),
+    ("add_reminders", "remind me to call mom this week"),
+    ("add_reminders", "remind me to pay the electricity bill today"),
+    ("add_reminders", "set a reminder to renew my passport this month"),
+    ("add_reminders", "remind me next week to book the dentist"),
+    ("add_reminders", "please remind me to water the plants today"),
+    ("add_reminders", "add a reminder to send the report next week"),
+    ("add_reminders", "remind me to buy a birthday gift this week"),
+    ("add_reminders", "can you remind me to submit taxes this month"),
+    ("add_reminders", "reminder to pick up the laundry today"),
+    ("add_reminders", "remind me to email the landlord next week"),
+    ("other", "how are you"),
+    ("other", "hello there"),
+    ("other", "i want to know my all meeting today"),
+    ("other", "do i have any meeting tomorrow"),
+    ("other", "schedule a meeting tomorrow at 11 pm to 12 pm"),
+    ("other", "i want to set a meeting today at 3:30pm about the budget"),
+    ("other", "can you delete the today breakfast title oatmeal"),
+    ("other", "i want to update today breakfast calories should be 200"),
+    ("other", "how many calories did i eat today"),
+    ("other", "what did i have for lunch yesterday"),
+    ("other", "save a list of groceries milk eggs bread"),
+    ("other", "note down my items clothes rice vegetables"),
+    ("other", "add a recipe called bugbug for breakfast 15 minutes rated 4.5"),
+    ("other", "i feel tired today"),
+    ("other", "yeah that is correct"),
+    ("other", "cancel"),
+    ("other", "i want email"),
+    ("other", "what should i eat for dinner"),
+    ("other", "suggest a healthy breakfast under 400 calories"),
+    ("other", "did i remind you about the meeting"),
+    ("other", "delete my reminder to call mom"),
+]
+
+
+def features(text):
+    tokens = re.findall(r"[a-z]+|\d+", normalize(text))
+    # Numbers matter as "there is a number here", not as values.
+    tokens = ["<num>" if t.isdigit() else t for t in tokens]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class NaiveBayesClassifier:
+    """Multinomial naive Bayes over word unigrams and bigrams, add-one smoothed."""
+
+    def __init__(self, examples):
+        self.counts = {}
+        self.totals = Counter()
+        self.priors = Counter()
+        vocabulary = set()
+        for label, text in examples:
+            tokens = features(text)
+            self.counts.setdefault(label, Counter()).update(tokens)
+            self.totals[label] += len(tokens)
+            self.priors[label] += 1
+            vocabulary.update(tokens)
+        self.vocabulary_size = len(vocabulary)
+        self.examples = sum(self.priors.values())
+
+    def predict(self, text):
+        """Return (label, probability)."""
+        tokens = features(text)
+        scores = {}
+        for label, counts in self.counts.items():
+            denominator = self.totals[label] + self.vocabulary_size
+            scores[label] = math.log(self.priors[label] / self.examples) + sum(
+                math.log((counts[t] + 1) / denominator) for t in tokens
+            )
+        best = max(scores, key=scores.get)
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / total
+
+
+# ---------- Slot extraction ----------
+# Negations, edits and requests for advice look like adds but are not.
+_NOT_AN_ADD = re.compile(
+    r"\b(don'?t|do not|didn'?t|not|never|cancel|delete|remove|update|change|instead|"
+    r"suggest|recommend|should|what|which|how)\b"
+)
+_CALORIES = re.compile(r"\b(?:about |around |approx(?:imately)? )?(\d+(?:\.\d+)?)\s*(?:k?cals?|kcal|calories)\b")
+_TIME = re.compile(
+    r"\b(?:at\s+)?(\d{1,2}):(\d{2})\s*(am|pm)?\b"
+    r"|\b(?:at\s+)?(\d{1,2})\s*(am|pm)\b"
+    r"|\bat\s+(\d{1,2})\b(?!\s*(?:k?cals?|kcal|calories))"
+    r"|\bat\s+(noon)\b"
+)
+_MEAL_TYPE = re.compile(r"\b(?:for |to |to my |my )?(breakfast|lunch|dinner)\b(?:\s*(?:was|:))?")
+_DATE = re.compile(r"\b(today|yesterday|tomorrow|\d{4}-\d{2}-\d{2})\b")
+_MEAL_FILLER = re.compile(
+    r"\b(please|can you|could you|i just|i|just|add|log|track|record|had|ate|have eaten|eaten|"
+    r"a meal|meal|my|of|was|with about|around|about)\b"
+)
+# Meals that have not been eaten yet, or were eaten by someone else, are not
+# the user's log entries; the model can ask what was meant.
+_NOT_EATEN_YET = re.compile(
+    r"\b(will|won'?t|going to|gonna|plan(?:ning)? to|want to|would|might|tomorrow|tonight|later)\b"
+)
+_SOMEONE_ELSE = re.compile(
+    r"\b(he|she|they|we|his|her|their|our|son|daughter|wife|husband|partner|friend|kids?|children|"
+    r"mom|mum|dad|brother|sister|boyfriend|girlfriend)\b"
+)
+_REMINDER = re.compile(
+    r"\b(?:remind me|set a reminder|add a reminder|reminder)\b\s*(?:(?P<before>today|this week|next week|this month)\s+)?"
+    r"(?:to\s+)?(?P<title>.+?)(?:\s+(?P<after>today|this week|next week|this month))?$"
+)
+
+
+def _clock(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _date(word, now):
+    if word in (None, "today"):
+        return now.date().isoformat()
+    if word == "yesterday":
+        return (now - timedelta(days=1)).date().isoformat()
+    if word == "tomorrow":
+        return (now + timedelta(days=1)).date().isoformat()
+    return word
+
+
+def _tidy(text):
+    return " ".join(re.sub(r"[,.:;!]+", " ", text).split()).strip()
+
+
+def extract_meal(message, now):
+    """add_meal arguments from a complete request, or None if anything is missing.
+
+    Anything ambiguous is None too: several meals, calorie counts or times
+    in one message, a bare hour ("at 7") that could be am or pm, a meal
+    that is planned rather than eaten, or someone else's meal.
+    """
+    text = " ".join(message.lower().split())
+    if _NOT_EATEN_YET.search(text) or _SOMEONE_ELSE.search(text):
+        return None
+    calories = list(_CALORIES.finditer(text))
+    if len(calories) != 1:
+        return None
+    calories = calories[0]
+    text = text[:calories.start()] + " " + text[calories.end():]
+    times = list(_TIME.finditer(text))
+    meal_types = list(_MEAL_TYPE.finditer(text))
+    if len(times) != 1 or len(meal_types) != 1:
+        return None
+    time_match, meal_type = times[0], meal_types[0]
+    if time_match.group(7):
+        time = "12:00"
+    elif time_match.group(1):
+        time = _clock(time_match.group(1), time_match.group(2), time_match.group(3))
+    elif time_match.group(4):
+        time = _clock(time_match.group(4), 0, time_match.group(5))
+    else:
+        # "at 7" with no am/pm or minutes.
+        return None
+    if time is None:
+        return None
+    date = _DATE.search(text)
+    for match in sorted(filter(None, [time_match, meal_type, date]), key=lambda m: m.start(), reverse=True):
+        text = text[:match.start()] + " " + text[match.end():]
+    title = _tidy(_MEAL_FILLER.sub(" ", text))
+    title = re.sub(r"^(?:and|for|to|a|an|some)\s+|\s+(?:and|for|to|at)$", "", title)
+    if not title:
+        return None
+    return {
+        "date": _date(date.group(1) if date else None, now),
+        "time": time,
+        "meal_type": meal_type.group(1),
+        "title": title,
+        "description": title,
+        "calories": float(calories.group(1)),
+    }
+
+
+def extract_reminder(message):
+    """add_reminders arguments from a complete request, or None.
+
+    The tool only takes a day-level label, so a request naming a clock
+    time ("... at 5pm today") is left to the model.
+    """
+    text = _tidy(message.lower().replace("can you ", "").replace("please ", ""))
+    if _TIME.search(message.lower()):
+        return None
+    match = _REMINDER.search(text)
+    if not match:
+        return None
+    when = match.group("before") or match.group("after")
+    title = re.sub(r"^(?:me\s+)?(?:to\s+)?", "", match.group("title")).strip()
+    if not when or not title:
+        return None
+    return {"title": title, "time": when, "timezone": None}
+
+
+class IntentRouter:
+    """Dispatch complete add_meal / add_reminders requests without the LLM.
+
+    A message is routed only when the classifier picks the tool with at
+    least `min_confidence`, the slot rules fill every required argument,
+    and the message contains no negation, edit or advice words. Everything else
+    returns None and goes to the model as before.
+    """
+
+    extractors = {
+        "add_meal": lambda message, now: extract_meal(message, now),
+        "add_reminders": lambda message, now: extract_reminder(message),
+    }
+
+    def __init__(self, min_confidence=0.9, examples=TRAINING_EXAMPLES):
+        self.min_confidence = min_confidence
+        self.classifier = NaiveBayesClassifier(examples)
+
+    def route(self, message, now=None):
+        """Return a Route or None."""
+        label, confidence = self.classifier.predict(message)
+        route = None
+        if label in self.extractors and confidence >= self.min_confidence and "?" not in message:
+            if not _NOT_AN_ADD.search(message.lower()):
+                args = self.extractors[label](message, now or datetime.now())
+                if args is not None:
+                    route = Route(label, args, confidence)
+        metrics.inc("intent_router_total", intent=label, result="dispatched" if route else "fallthrough")
+        return route
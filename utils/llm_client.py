@@ -0,0 +1,347 @@
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from functools import lru_cache
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+from utils import metrics
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Failures where the request never reached the model, so resending is safe.
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def retry_after(response):
+    """Seconds the server asked us to wait, from retry-after-ms or Retry-After, or None."""
+    value = response.headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class Backoff:
+    """Full-jitter exponential backoff: a random delay in [0, min(max_delay, base * 2**attempt)].
+
+    A Retry-After from the server wins over the computed delay, up to
+    `max_retry_after` seconds; a longer wait is not worth holding a request.
+    """
+
+    def __init__(self, max_retries=4, base=0.5, max_delay=8.0, max_retry_after=60.0):
+        self.max_retries = max_retries
+        self.base = base
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retry `attempt` (0-based), or None to give up."""
+        if attempt >= self.max_retries:
+            return None
+        requested = retry_after(response) if response is not None else None
+        if requested is not None:
+            return requested if requested <= self.max_retry_after else None
+        return random.uniform(0, min(self.max_delay, self.base * 2 ** attempt))
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyLimit:
+    """A counting semaphore shared by threads and coroutines.
+
+    `acquire` blocks the calling thread; `acquire_async` waits without
+    blocking the event loop. A released slot passes straight to the oldest
+    waiter, whichever kind it is, so the sync and async clients together
+    never have more than `limit` requests in flight.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters = deque()
+
+    def _try_acquire(self, make_waiter):
+        """Take a free slot (returns None) or queue and return a new waiter; call with _lock held."""
+        if self._in_use < self.limit and not self._waiters:
+            self._in_use += 1
+            return None
+        waiter = make_waiter()
+        self._waiters.append(waiter)
+        return waiter
+
+    def acquire(self):
+        ready = threading.Event()
+        with self._lock:
+            waiter = self._try_acquire(lambda: _Waiter(ready.set))
+        if waiter is not None:
+            ready.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            waiter = self._try_acquire(lambda: _Waiter(lambda: loop.call_soon_threadsafe(_resolve, future)))
+        if waiter is None:
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._in_use -= 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        try:
+            waiter.wake()
+        except RuntimeError:
+            # The waiter's event loop is closed; pass the slot on.
+            self.release()
+
+
+def _note_retry(reason, delay):
+    metrics.inc("llm_retries_total", reason=reason)
+    print(f"LLM request failed ({reason}), retrying in {delay:.2f}s")
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.release()
+
+
+def _once(fn):
+    done = []
+
+    def call():
+        if not done:
+            done.append(True)
+            fn()
+
+    return call
+
+
+class RetryTransport(httpx.BaseTransport):
+    """Wraps a transport with a concurrency limit and retries on 429/5xx.
+
+    At most `max_concurrency` requests are in flight; the rest queue. Pass
+    a ConcurrencyLimit as `limit` to share one cap with other transports. A
+    slot is held until the response body is closed, so streamed replies
+    count for as long as they stream, and through any backoff, so a
+    rate-limited burst slows down instead of piling on.
+    """
+
+    def __init__(self, transport, max_concurrency=64, backoff=None, sleep=time.sleep, limit=None):
+        self.transport = transport
+        self.backoff = backoff or Backoff()
+        self.sleep = sleep
+        self._slots = limit or ConcurrencyLimit(max_concurrency)
+
+    def handle_request(self, request):
+        started = time.perf_counter()
+        self._slots.acquire()
+        metrics.observe("llm_queue_wait_seconds", time.perf_counter() - started)
+        release = _once(self._slots.release)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = self.transport.handle_request(request)
+                except RETRY_ERRORS as e:
+                    delay = self.backoff.delay(attempt)
+                    if delay is None:
+                        raise
+                    _note_retry(type(e).__name__, delay)
+                else:
+                    delay = self.backoff.delay(attempt, response) if response.status_code in RETRY_STATUSES else None
+                    if delay is None:
+                        return httpx.Response(
+                            response.status_code,
+                            headers=response.headers,
+                            stream=_ReleasingStream(response.stream, release),
+                            extensions=response.extensions,
+                        )
+                    response.close()
+                    _note_retry(str(response.status_code), delay)
+                self.sleep(delay)
+                attempt += 1
+        except BaseException:
+            release()
+            raise
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """RetryTransport for httpx.AsyncClient."""
+
+    def __init__(self, transport, max_concurrency=64, backoff=None, sleep=asyncio.sleep, limit=None):
+        self.transport = transport
+        self.backoff = backoff or Backoff()
+        self.sleep = sleep
+        self._slots = limit or ConcurrencyLimit(max_concurrency)
+
+    async def handle_async_request(self, request):
+        started = time.perf_counter()
+        await self._slots.acquire_async()
+        metrics.observe("llm_queue_wait_seconds", time.perf_counter() - started)
+        release = _once(self._slots.release)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = await self.transport.handle_async_request(request)
+                except RETRY_ERRORS as e:
+                    delay = self.backoff.delay(attempt)
+                    if delay is None:
+                        raise
+                    _note_retry(type(e).__name__, delay)
+                else:
+                    delay = self.backoff.delay(attempt, response) if response.status_code in RETRY_STATUSES else None
+                    if delay is None:
+                        return httpx.Response(
+                            response.status_code,
+                            headers=response.headers,
+                            stream=_AsyncReleasingStream(response.stream, release),
+                            extensions=response.extensions,
+                        )
+                    await response.aclose()
+                    _note_retry(str(response.status_code), delay)
+                await self.sleep(delay)
+                attempt += 1
+        except BaseException:
+            release()
+            raise
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def _limits(max_connections):
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=60,
+    )
+
+
+def _timeout(timeout):
+    # Connecting should be quick; a long reply can take a while to generate.
+    return httpx.Timeout(timeout, connect=5.0)
+
+
+@lru_cache(maxsize=None)
+def shared_clients(api_key=None, max_connections=100, max_concurrency=64, max_retries=4, timeout=60.0):
+    """(OpenAI, AsyncOpenAI) pair shared by every module in the process.
+
+    Both clients keep a keep-alive pool of `max_connections`, speak HTTP/2
+    when the h2 package is installed, retry through RetryTransport (the
+    SDK's own retries are off so attempts don't multiply) and queue beyond
+    `max_concurrency` in-flight requests between them.
+    """
+    http2 = http2_available()
+    backoff = Backoff(max_retries=max_retries)
+    limit = ConcurrencyLimit(max_concurrency)
+    http_client = httpx.Client(
+        transport=RetryTransport(
+            httpx.HTTPTransport(http2=http2, limits=_limits(max_connections)),
+            backoff=backoff,
+            limit=limit,
+        ),
+        timeout=_timeout(timeout),
+    )
+    async_http_client = httpx.AsyncClient(
+        transport=AsyncRetryTransport(
+            httpx.AsyncHTTPTransport(http2=http2, limits=_limits(max_connections)),
+            backoff=backoff,
+            limit=limit,
+        ),
+        timeout=_timeout(timeout),
+    )
+    return (
+        OpenAI(api_key=api_key, http_client=http_client, max_retries=0, timeout=_timeout(timeout)),
+        AsyncOpenAI(api_key=api_key, http_client=async_http_client, max_retries=0, timeout=_timeout(timeout)),
+    )
+
+
+def clients_from_env(env_vars):
+    """shared_clients configured from OPENAI_API_KEY and the LLM_* settings."""
+    return shared_clients(
+        env_vars.get("OPENAI_API_KEY"),
+        max_connections=int(env_vars.get("LLM_MAX_CONNECTIONS", 100)),
+        max_concurrency=int(env_vars.get("LLM_MAX_CONCURRENCY", 64)),
+        max_retries=int(env_vars.get("LLM_MAX_RETRIES", 4)),
+        timeout=float(env_vars.get("LLM_TIMEOUT", 60)),
+    )
@@ -0,0 +1,88 @@
+import re
+
+from utils import metrics
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize(text):
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+def trigrams(text):
+    padded = f"  {normalize(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def lexical_score(a, b):
+    """Similarity in [0, 1]: the better of token-set Jaccard and trigram Dice.
+
+    Tokens catch reordered words ("meeting testing"); trigrams catch typos and
+    plurals ("meetng", "meetings").
+    """
+    tokens_a, tokens_b = set(normalize(a).split()), set(normalize(b).split())
+    if not tokens_a or not tokens_b:
+        return 0.0
+    token_score = len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    trigram_score = 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+    return max(token_score, trigram_score)
+
+
+class TwoStageMatcher:
+    """Resolve a fuzzy title against candidates, cheapest stage first.
+
+    1. exact: a single candidate whose normalized title equals the query.
+    2. lexical: the best lexical score is at least `accept` and beats the
+       runner-up by `margin`.
+    3. semantic: otherwise, nearest neighbour in the entity's vector index,
+       which costs one query embedding.
+
+    `match_resolved_total{entity, stage}` counts which stage settled each
+    lookup (`none` when nothing matched).
+    """
+
+    def __init__(self, name, text_of, accept=0.75, margin=0.15, threshold=0.6):
+        self.name = name
+        self.text_of = text_of
+        self.accept = accept
+        self.margin = margin
+        self.threshold = threshold
+
+    def _resolved(self, stage, match, score):
+        metrics.inc("match_resolved_total", entity=self.name, stage=stage)
+        return match, score
+
+    def match(self, query, candidates, entity_index, date=None, meal_type=None):
+        """Return (best candidate or None, score).
+
+        `entity_index` is only consulted (and, for a per-user index, only
+        built) when the lexical stages cannot decide; pass a callable that
+        returns the index.
+        """
+        if not candidates:
+            return self._resolved("none", None, 0.0)
+
+        wanted = normalize(query)
+        exact = [c for c in candidates if normalize(self.text_of(c)) == wanted]
+        if len(exact) == 1:
+            return self._resolved("exact", exact[0], 1.0)
+
+        scored = sorted(
+            ((lexical_score(query, self.text_of(c)), i) for i, c in enumerate(candidates)),
+            reverse=True,
+        )
+        best_score, best_i = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        if best_score >= self.accept and best_score - runner_up >= self.margin:
+            return self._resolved("lexical", candidates[best_i], best_score)
+
+        index = entity_index()
+        allowed = {index.key_of(c): c for c in candidates}
+        for match, score in index.search(
+            query, k=len(candidates), date=date, meal_type=meal_type, threshold=self.threshold
+        ):
+            key = index.key_of(match)
+            if key in allowed:
+                return self._resolved("semantic", allowed[key], score)
+        return self._resolved("none", None, 0.0)
@@ -0,0 +1,104 @@
+from bisect import bisect_left
+from logging import getLogger
+import threading
+
+logger = getLogger("uvicorn.error")
+
+_lock = threading.Lock()
+# (name, sorted label items) -> value
+_counters = {}
+# (name, sorted label items) -> [bucket counts..., +Inf count], sum
+_histograms = {}
+
+# Upper bounds in seconds, from a cache hit to a slow LLM call.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def inc(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def get(name, **labels):
+    with _lock:
+        return _counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def observe(name, value, **labels):
+    """Add one observation to a histogram with DEFAULT_BUCKETS."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0]
+        histogram[0][bisect_left(DEFAULT_BUCKETS, value)] += 1
+        histogram[1] += value
+
+
+def snapshot():
+    """All counters as a list of {"name", "labels", "value"} dicts."""
+    with _lock:
+        return [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, **extra):
+    items = [*labels, *extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def render_prometheus():
+    """All counters and histograms in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (list(counts), total)) for key, (counts, total) in _histograms.items())
+    typed = set()
+    for (name, labels), value in counters:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), (counts, total) in histograms:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip([*DEFAULT_BUCKETS, "+Inf"], counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def record_usage(response, **labels):
+    """Count the token usage reported on a Responses API result.
+
+    Cached input tokens are what tell us whether the provider reused our
+    prompt prefix, so they are logged alongside the totals.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "input_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    model = getattr(response, "model", None)
+    if isinstance(model, str):
+        labels = {**labels, "model": model}
+    inc("llm_input_tokens_total", usage.input_tokens, **labels)
+    inc("llm_cached_input_tokens_total", cached, **labels)
+    inc("llm_output_tokens_total", usage.output_tokens, **labels)
+    logger.info(
+        "LLM usage %s: input=%s cached=%s output=%s",
+        labels, usage.input_tokens, cached, usage.output_tokens,
+    )
@@ -0,0 +1,189 @@
+import json
+import os
+import random
+import threading
+import time
+
+import openai
+
+from utils import metrics
+from utils.tracing import span
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_LIST_PATH = os.path.join(PROJECT_ROOT, "OAI_CONFIG_LIST")
+
+# Errors that say nothing about the request itself, so another model may succeed.
+FAILOVER_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def load_config_list(path=CONFIG_LIST_PATH):
+    """OpenAI entries of an autogen OAI_CONFIG_LIST; other api_types (e.g. google) are skipped."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    return [e for e in entries if e.get("api_type", "openai") == "openai"]
+
+
+class ModelStats:
+    """Exponentially weighted latency and error rate of one model."""
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.unhealthy_until = 0.0
+
+    def to_dict(self, now):
+        return {
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "errors": self.errors,
+            "healthy": self.unhealthy_until <= now,
+        }
+
+
+class ModelRouter:
+    """Pick a model per call from the tagged entries of OAI_CONFIG_LIST.
+
+    A call names a tag ("chat", "confirmation", ...) and whether it needs
+    tool calling (entries tagged "tools"). The first healthy entry in config
+    order is used unless it runs more than `latency_slack` slower than the
+    fastest healthy one, in which case the fastest goes first. Models
+    without samples yet count as fast, so every model gets measured.
+
+    A model that loses first place would otherwise only be called again on
+    failover, so its latency would never be remeasured and one slow call
+    could demote it for good. A `probe_rate` fraction of calls therefore
+    goes first to a random other healthy model, keeping every model's
+    numbers current.
+
+    Timeouts, connection errors, 429s and 5xx responses fail over to the
+    next candidate. A model whose error rate passes `max_error_rate` sits
+    out for `cooldown` seconds; unhealthy models are still tried last
+    rather than failing the request outright.
+    """
+
+    def __init__(
+        self, entries, alpha=0.2, latency_slack=0.5, max_error_rate=0.5, cooldown=30.0, probe_rate=0.05,
+        clock=time.monotonic, rng=None,
+    ):
+        self.entries = entries
+        self.alpha = alpha
+        self.latency_slack = latency_slack
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.probe_rate = probe_rate
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.stats = {e["model"]: ModelStats() for e in entries}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config_list(cls, path=CONFIG_LIST_PATH, required=(), **kwargs):
+        """Router over `path`; raises ValueError when a `required` tag has no model."""
+        router = cls(load_config_list(path), **kwargs)
+        for tag in required:
+            if not router.pool(tag):
+                raise ValueError(f"No model tagged {tag!r} in {path}")
+        return router
+
+    def pool(self, tag, tools=False):
+        return [
+            e["model"] for e in self.entries
+            if tag in e.get("tags", []) and (not tools or "tools" in e.get("tags", []))
+        ]
+
+    def candidates(self, tag, tools=False):
+        """Models to try for one call, best first."""
+        now = self.clock()
+        with self._lock:
+            models = self.pool(tag, tools)
+            healthy = [m for m in models if self.stats[m].unhealthy_until <= now]
+            unhealthy = sorted(
+                (m for m in models if m not in healthy), key=lambda m: self.stats[m].unhealthy_until
+            )
+            latency = {m: self.stats[m].latency or 0.0 for m in healthy}
+        if not healthy:
+            return unhealthy
+        fastest = min(latency.values())
+        first = next(m for m in healthy if latency[m] <= fastest * (1 + self.latency_slack))
+        rest = sorted((m for m in healthy if m != first), key=latency.get)
+        if rest and self.rng.random() < self.probe_rate:
+            probe = self.rng.choice(rest)
+            metrics.inc("model_probes_total", model=probe)
+            rest = [first, *(m for m in rest if m != probe)]
+            first = probe
+        return [first, *rest, *unhealthy]
+
+    def record(self, model, latency=None, error=False):
+        with self._lock:
+            stats = self.stats[model]
+            stats.calls += 1
+            stats.errors += error
+            stats.error_rate += self.alpha * (error - stats.error_rate)
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else stats.latency + self.alpha * (latency - stats.latency)
+            if error and stats.error_rate >= self.max_error_rate:
+                stats.unhealthy_until = self.clock() + self.cooldown
+
+    def _failed(self, model, error, elapsed, remaining):
+        # A timeout is a (lower bound) latency sample; other failures say nothing about speed.
+        self.record(model, elapsed if isinstance(error, openai.APITimeoutError) else None, error=True)
+        reason = type(error).__name__
+        metrics.inc("model_failovers_total", model=model, reason=reason)
+        if remaining:
+            print(f"Model {model} failed ({reason}), trying {remaining[0]}")
+
+    def call(self, tag, fn, tools=False):
+        """Return fn(model) for the first candidate that succeeds."""
+        candidates = self.candidates(tag, tools)
+        if not candidates:
+            raise ValueError(f"No model tagged {tag!r}")
+        for i, model in enumerate(candidates):
+            started = time.perf_counter()
+            try:
+                with span("llm.attempt", model=model):
+                    result = fn(model)
+            except FAILOVER_ERRORS as e:
+                self._failed(model, e, time.perf_counter() - started, candidates[i + 1:])
+                if i == len(candidates) - 1:
+                    raise
+                continue
+            self.record(model, time.perf_counter() - started)
+            return result
+
+    async def acall(self, tag, fn, tools=False):
+        """Async call(): `fn(model)` returns an awaitable.
+
+        For a streamed response the measured latency is the time until the
+        stream opens, and failover happens only up to that point.
+        """
+        candidates = self.candidates(tag, tools)
+        if not candidates:
+            raise ValueError(f"No model tagged {tag!r}")
+        for i, model in enumerate(candidates):
+            started = time.perf_counter()
+            try:
+                with span("llm.attempt", model=model):
+                    result = await fn(model)
+            except FAILOVER_ERRORS as e:
+                self._failed(model, e, time.perf_counter() - started, candidates[i + 1:])
+                if i == len(candidates) - 1:
+                    raise
+                continue
+            self.record(model, time.perf_counter() - started)
+            return result
+
+    def snapshot(self):
+        now = self.clock()
+        with self._lock:
+            return {
+                e["model"]: {"tags": e.get("tags", []), **self.stats[e["model"]].to_dict(now)}
+                for e in self.entries
+            }
@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+import threading
+import time
+from calendar import monthrange
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from utils import metrics
+
+# Local clock time a reminder fires at for each label the add_reminders tool accepts.
+REMINDER_HOUR = {"today": 18, "this week": 9, "next week": 9, "this month": 9}
+# A "today" reminder asked for after REMINDER_HOUR["today"] fires this long after.
+LATE_TODAY_DELAY = timedelta(hours=1)
+
+
+def resolve_due(label, timezone="UTC", now=None):
+    """Epoch seconds at which a "today" / "this week" / ... reminder fires.
+
+    today      - 18:00 today
+    this week  - Friday 09:00 of the current week
+    next week  - Monday 09:00 of next week
+    this month - 09:00 on the last day of the month
+
+    A slot that has already passed rolls forward instead of firing at once:
+    "today" after 18:00 to LATE_TODAY_DELAY from now, "this week" from
+    Friday 09:00 on and "this month" on its last day after 09:00 to 09:00
+    the next day.
+    """
+    zone = ZoneInfo(timezone or "UTC")
+    now = datetime.fromtimestamp(now if now is not None else time.time(), zone)
+    today = now.date()
+    if label == "today":
+        day = today
+    elif label == "this week":
+        day = today + timedelta(days=4 - today.weekday())
+    elif label == "next week":
+        day = today + timedelta(days=7 - today.weekday())
+    elif label == "this month":
+        day = today.replace(day=monthrange(today.year, today.month)[1])
+    else:
+        raise ValueError(f"Unknown reminder time: {label}")
+    due = datetime(day.year, day.month, day.day, REMINDER_HOUR[label], tzinfo=zone)
+    if due <= now:
+        if label == "today":
+            return (now + LATE_TODAY_DELAY).timestamp()
+        day = today + timedelta(days=1) if now.hour >= REMINDER_HOUR[label] else today
+        due = datetime(day.year, day.month, day.day, REMINDER_HOUR[label], tzinfo=zone)
+    return due.timestamp()
+
+
+def print_sink(user_id, reminder):
+    print(f"Reminder for {user_id}: {reminder['title']}")
+
+
+class MemorySink:
+    """Collects delivered reminders in `delivered`, e.g. for tests."""
+
+    def __init__(self):
+        self.delivered = []
+
+    def __call__(self, user_id, reminder):
+        self.delivered.append((user_id, reminder))
+
+
+class ReminderScheduler:
+    """Fires persisted reminders at their due time from one asyncio task.
+
+    Pending reminders sit in a min-heap keyed by due time, so scheduling is
+    O(log n) and the task only ever sleeps until the earliest one. Reminders
+    live in the DomainStore: `run()` reloads the unfired ones on startup,
+    and each is claimed in the store before delivery so that several workers
+    sharing the database deliver it once. `sink(user_id, reminder)` does the
+    delivery; a sink that raises gets the reminder retried after
+    `retry_delay` seconds.
+    """
+
+    def __init__(self, store, sink=print_sink, clock=time.time, retry_delay=60):
+        self.store = store
+        self.sink = sink
+        self.clock = clock
+        self.retry_delay = retry_delay
+        self._heap = []  # (due_at, user_id, reminder_id, reminder)
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wake = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, user_id, reminder, due_at):
+        """Queue a stored reminder; safe to call from tool threads."""
+        key = (user_id, reminder["id"])
+        with self._lock:
+            if key in self._queued:
+                return
+            self._queued.add(key)
+            heapq.heappush(self._heap, (due_at, user_id, reminder["id"], reminder))
+            is_next = self._heap[0][2] == reminder["id"] and self._heap[0][1] == user_id
+        if is_next and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def recover(self):
+        for user_id, reminder in self.store.pending_reminders():
+            self.schedule(user_id, reminder, reminder["due_at"])
+        return len(self)
+
+    def _pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, user_id, reminder_id, reminder = heapq.heappop(self._heap)
+                self._queued.discard((user_id, reminder_id))
+                due.append((user_id, reminder))
+        return due
+
+    def fire_due(self):
+        """Deliver every reminder that is due now; returns how many were delivered."""
+        now = self.clock()
+        delivered = 0
+        for user_id, reminder in self._pop_due(now):
+            if not self.store.claim_reminder(user_id, reminder["id"], now):
+                continue
+            try:
+                self.sink(user_id, reminder)
+            except Exception as e:
+                print(f"Reminder delivery failed: {e}")
+                self.store.release_reminder(user_id, reminder["id"])
+                self.schedule(user_id, reminder, now + self.retry_delay)
+                metrics.inc("reminders_failed_total")
+                continue
+            delivered += 1
+            metrics.inc("reminders_fired_total")
+        return delivered
+
+    def next_delay(self):
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - self.clock())
+
+    async def run(self):
+        # schedule() in another thread checks _loop and then sets _wake, so
+        # _wake has to exist by the time _loop is published.
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self.recover)
+        while True:
+            self._wake.clear()
+            await asyncio.to_thread(self.fire_due)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.next_delay())
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from datetime import date
+import hashlib
+import threading
+import time
+
+from utils import metrics
+from utils.matching import normalize
+
+# Words that suggest the user wants something done rather than answered.
+# Such turns may trigger tools, so they always go to the model.
+ACTION_WORDS = {
+    "add", "book", "cancel", "change", "create", "delete", "edit", "forget", "log", "move",
+    "note", "plan", "remember", "remind", "remove", "reschedule", "save", "schedule", "set",
+    "track", "update", "ate", "eaten", "had", "drank", "cooked", "recipe",
+}
+
+
+def is_cacheable(message, previous_reply=None):
+    """Whether a reply to `message` may be served from, or stored in, the cache.
+
+    Action requests are never cacheable, and neither is an answer to a
+    question the assistant just asked ("yes", "3pm"): its meaning depends
+    on the conversation, not on the message.
+    """
+    words = set(normalize(message).split())
+    if not words or words & ACTION_WORDS:
+        return False
+    return not (previous_reply or "").rstrip().endswith("?")
+
+
+class ResponseCache:
+    """TTL + LRU cache of final chat replies.
+
+    Keys combine the user, today's date, the user's tool-state version and
+    the normalized message, so "how are you" and "How are you?" share an
+    entry while anything a tool has changed since invalidates it. Call
+    `mark_changed(user_id)` whenever a turn ran tools. A `ttl` of 0
+    disables the cache.
+
+    Exports `response_cache_requests_total{result=hit|miss|bypass}` and
+    `response_cache_saved_seconds_total`, the model latency the hits
+    avoided.
+    """
+
+    def __init__(self, ttl=300, max_entries=1000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, reply, latency)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def mark_changed(self, user_id):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def _key(self, user_id, message):
+        version = self._versions.get(user_id, 0)
+        raw = f"{user_id}\0{date.today().isoformat()}\0{version}\0{normalize(message)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, user_id, message, previous_reply=None):
+        """Return (key, cached reply or None); key is None when the turn must not be cached."""
+        if not self.enabled:
+            return None, None
+        if not is_cacheable(message, previous_reply):
+            metrics.inc("response_cache_requests_total", result="bypass")
+            return None, None
+        with self._lock:
+            key = self._key(user_id, message)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            metrics.inc("response_cache_requests_total", result="miss")
+            return key, None
+        metrics.inc("response_cache_requests_total", result="hit")
+        metrics.inc("response_cache_saved_seconds_total", entry[2])
+        return key, entry[1]
+
+    def store(self, key, reply, latency):
+        """Remember `reply`, which took `latency` seconds to produce."""
+        if key is None or not reply:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, reply, latency)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, user_id, key, reply, latency, ran_tools=False):
+        """Store a finished turn's reply, unless it ran tools.
+
+        A turn that ran tools may have changed what other replies would say,
+        so it bumps the user's version instead and its own reply is dropped.
+        """
+        if ran_tools:
+            self.mark_changed(user_id)
+        else:
+            self.store(key, reply, latency)
@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from itertools import count
+import hashlib
+import threading
+
+from utils import metrics
+from utils.vector_index import VectorIndex
+
+
+def prompt_key(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+class SemanticCache:
+    """Replies keyed by prompt meaning rather than exact text.
+
+    Prompt embeddings live in a VectorIndex, so a lookup is one query
+    embedding plus one matrix-vector product. A prompt whose nearest cached
+    prompt scores at least `threshold` gets that entry's reply. At most
+    `max_entries` are kept; the least recently hit goes first. Every entry
+    counts its hits. A `max_entries` of 0 disables the cache.
+
+    Prompts are not kept, only a short hash of each, so the cache can be
+    inspected without exposing what users wrote.
+    """
+
+    def __init__(self, embeddings, threshold=0.95, max_entries=0, name="semantic"):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.name = name
+        self.index = VectorIndex()
+        self._entries = OrderedDict()  # entry id -> {"key", "reply", "hits"}
+        self._ids = count()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, prompt):
+        """Cached reply for a near-duplicate of `prompt`, or None."""
+        if not self.enabled:
+            return None
+        hits = self.index.search(self.embeddings.embed(prompt), k=1, threshold=self.threshold)
+        with self._lock:
+            entry = self._entries.get(hits[0][0]) if hits else None
+            if entry is not None:
+                entry["hits"] += 1
+                self._entries.move_to_end(hits[0][0])
+        metrics.inc("semantic_cache_requests_total", cache=self.name, result="hit" if entry else "miss")
+        return entry["reply"] if entry else None
+
+    def store(self, prompt, reply):
+        if not self.enabled or not reply:
+            return
+        vector = self.embeddings.embed(prompt)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {"key": prompt_key(prompt), "reply": reply, "hits": 0}
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+        self.index.add(entry_id, vector)
+        for old_id in evicted:
+            self.index.remove(old_id)
+
+    def top_entries(self, n=20):
+        """Hashed keys and hit counts of the `n` most hit entries."""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e["hits"], reverse=True)
+        return [{"key": e["key"], "hits": e["hits"]} for e in entries[:n]]
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+from collections.abc import MutableMapping
+from urllib.parse import quote, unquote
+
+LOG_SUFFIX = ".jsonl"
+META_SUFFIX = ".meta.json"
+MIGRATION_MARKER = ".migrated"
+
+
+class SessionStore:
+    """Append-only chat session store.
+
+    Every session is kept in its own JSONL file (one line per turn) inside
+    `directory`. Appending a turn is a single O_APPEND write and reading a
+    session only parses that session's file, so per-request cost no longer
+    grows with the history of every other user.
+    """
+
+    def __init__(self, directory, legacy_file=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        # session_id -> log path, built from a directory listing (no parsing)
+        self._index = {}
+        # session_id -> edit counter, bumped whenever a log is rewritten
+        self._versions = {}
+        os.makedirs(directory, exist_ok=True)
+        if legacy_file:
+            self.migrate_from_json(legacy_file)
+        self._build_index()
+
+    def _build_index(self):
+        with self._lock:
+            self._index = {
+                unquote(name[: -len(LOG_SUFFIX)]): os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith(LOG_SUFFIX)
+            }
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, quote(session_id, safe="") + LOG_SUFFIX)
+
+    def _meta_path(self, session_id):
+        return os.path.join(self.directory, quote(session_id, safe="") + META_SUFFIX)
+
+    def version(self, session_id):
+        """Edit counter for a session; appends do not change it."""
+        return self._versions.get(session_id, 0)
+
+    def session_ids(self):
+        with self._lock:
+            return list(self._index)
+
+    def exists(self, session_id):
+        if session_id in self._index:
+            return True
+        # Another worker may have created the session after our index was built.
+        path = self._path(session_id)
+        if os.path.exists(path):
+            with self._lock:
+                self._index[session_id] = path
+            return True
+        return False
+
+    def create(self, session_id):
+        """Create an empty log for `session_id` if it does not exist yet."""
+        path = self._path(session_id)
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644))
+        with self._lock:
+            self._index[session_id] = path
+
+    def read(self, session_id):
+        """Return every turn of one session, in order."""
+        turns = []
+        try:
+            with open(self._path(session_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        turns.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn trailing line from a crashed writer; skip it.
+                        continue
+        except FileNotFoundError:
+            return []
+        return turns
+
+    def append(self, session_id, *entries):
+        """Append turns to a session log with a single write."""
+        if not entries:
+            return
+        data = "".join(
+            json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries
+        ).encode("utf-8")
+        path = self._path(session_id)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        with self._lock:
+            self._index[session_id] = path
+
+    def rewrite(self, session_id, entries):
+        """Replace a whole session log. Only needed when turns were edited."""
+        path = self._path(session_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._index[session_id] = path
+            self._versions[session_id] = self._versions.get(session_id, 0) + 1
+        # Metadata derived from the old turns (e.g. a summary) is now stale.
+        self._remove(self._meta_path(session_id))
+
+    def read_meta(self, session_id):
+        """Return the metadata stored alongside a session (e.g. its summary)."""
+        try:
+            with open(self._meta_path(session_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def write_meta(self, session_id, meta):
+        path = self._meta_path(session_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._index.pop(session_id, None)
+            self._versions[session_id] = self._versions.get(session_id, 0) + 1
+        self._remove(self._path(session_id))
+        self._remove(self._meta_path(session_id))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def migrate_from_json(self, legacy_file):
+        """One-shot import of a legacy `{session_id: [turns]}` JSON file.
+
+        A marker file records that the import ran, so later starts skip it.
+        Sessions that already have a log are left untouched.
+        """
+        marker = os.path.join(self.directory, MIGRATION_MARKER)
+        if os.path.exists(marker) or not os.path.exists(legacy_file):
+            return
+        with open(legacy_file, "r", encoding="utf-8") as f:
+            try:
+                sessions = json.load(f)
+            except json.JSONDecodeError:
+                sessions = {}
+        for session_id, turns in sessions.items():
+            if not os.path.exists(self._path(session_id)):
+                self.rewrite(session_id, turns)
+        with open(marker, "w") as f:
+            f.write(os.path.abspath(legacy_file) + "\n")
+
+
+class SessionMap(MutableMapping):
+    """Lazy `{session_id: [turns]}` view over a SessionStore.
+
+    Sessions are only read from disk when accessed. `flush()` appends the
+    turns added since they were read, and falls back to rewriting a session
+    only when earlier turns were replaced or removed.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._loaded = {}
+        self._persisted = {}
+
+    def __getitem__(self, session_id):
+        if session_id not in self._loaded:
+            if not self.store.exists(session_id):
+                raise KeyError(session_id)
+            turns = self.store.read(session_id)
+            self._loaded[session_id] = turns
+            self._persisted[session_id] = list(turns)
+        return self._loaded[session_id]
+
+    def __setitem__(self, session_id, turns):
+        if session_id not in self._persisted:
+            # Replacing a session that exists on disk but was never read must
+            # rewrite it; a brand new session starts from an empty log.
+            self._persisted[session_id] = (
+                [object()] if self.store.exists(session_id) else None
+            )
+        self._loaded[session_id] = turns
+
+    def __delitem__(self, session_id):
+        if session_id not in self:
+            raise KeyError(session_id)
+        self._loaded.pop(session_id, None)
+        self._persisted.pop(session_id, None)
+        self.store.delete(session_id)
+
+    def __contains__(self, session_id):
+        return session_id in self._loaded or self.store.exists(session_id)
+
+    def __iter__(self):
+        seen = set(self._loaded)
+        yield from self._loaded
+        for session_id in self.store.session_ids():
+            if session_id not in seen:
+                yield session_id
+
+    def __len__(self):
+        return len(set(self._loaded) | set(self.store.session_ids()))
+
+    def flush(self):
+        """Persist every change made through this view."""
+        for session_id, turns in self._loaded.items():
+            persisted = self._persisted.get(session_id)
+            if persisted is None:
+                self.store.create(session_id)
+                persisted = []
+            n = len(persisted)
+            if len(turns) >= n and all(turns[i] is persisted[i] for i in range(n)):
+                self.store.append(session_id, *turns[n:])
+            else:
+                self.store.rewrite(session_id, turns)
+            self._persisted[session_id] = list(turns)
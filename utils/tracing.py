@@ -0,0 +1,222 @@
+from contextlib import contextmanager
+import contextvars
+from functools import partial
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+
+from utils import metrics
+
+# Span attributes that also become labels on the span_duration_seconds histogram.
+LABEL_ATTRIBUTES = ("endpoint", "tool")
+
+_current = contextvars.ContextVar("current_span", default=None)
+_exporter = None
+_service_name = "assistant"
+
+
+class Span:
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self):
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def to_otlp(self):
+        """The span in the OTLP/JSON encoding."""
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            # SPAN_KIND_SERVER for request roots, SPAN_KIND_INTERNAL for stages.
+            "kind": 1 if self.parent_id else 2,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a stage as a child of the current span.
+
+    Every finished span is observed in span_duration_seconds{span, ...} and
+    handed to the configured exporter, if any.
+    """
+    s = Span(name, _current.get(), attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current.reset(token)
+        labels = {key: s.attributes[key] for key in LABEL_ATTRIBUTES if s.attributes.get(key) is not None}
+        metrics.observe("span_duration_seconds", s.duration, span=name, **labels)
+        if _exporter is not None:
+            _exporter.add(s)
+
+
+def bind(fn):
+    """`fn` bound to a copy of the current context, so spans it opens in
+    another thread (e.g. an executor) still nest under the current span."""
+    return partial(contextvars.copy_context().run, fn)
+
+
+class BatchExporter:
+    """Collects finished spans and writes them in batches from a daemon thread.
+
+    `write(payload)` receives one OTLP/JSON ExportTraceServiceRequest dict.
+    Spans are dropped rather than blocking requests when the queue is full.
+    """
+
+    def __init__(self, write, max_batch=512, interval=2.0, max_queue=4096):
+        self.write = write
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-export", daemon=True)
+        self._thread.start()
+
+    def add(self, s):
+        try:
+            self._queue.put_nowait(s)
+        except queue.Full:
+            metrics.inc("spans_dropped_total")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.write(otlp_payload(batch))
+            except Exception as e:
+                print(f"Span export failed: {e}")
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout=5.0):
+        """Wait until every queued span has been written, e.g. before shutdown."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+def otlp_payload(spans):
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", _service_name)]},
+            "scopeSpans": [{"scope": {"name": "assistant.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+        }]
+    }
+
+
+def file_writer(path):
+    """Append one ExportTraceServiceRequest per line, the layout the
+    OpenTelemetry Collector's otlpjsonfile receiver reads."""
+    lock = threading.Lock()
+
+    def write(payload):
+        with lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload) + "\n")
+
+    return write
+
+
+def otlp_http_writer(endpoint):
+    """POST OTLP/JSON to a collector, e.g. http://localhost:4318/v1/traces."""
+    def write(payload):
+        request = urllib.request.Request(
+            endpoint,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+    return write
+
+
+def configure(service_name, spec):
+    """Set up export from a TRACE_EXPORT value.
+
+    "" or None             - no export; spans still feed the histograms
+    "file:traces.jsonl"    - OTLP/JSON lines in a local file
+    "http://host:4318/..." - OTLP/HTTP (JSON) to a collector
+    """
+    global _exporter, _service_name
+    _service_name = service_name
+    if not spec:
+        _exporter = None
+    elif spec.startswith("file:"):
+        _exporter = BatchExporter(file_writer(spec[len("file:"):]))
+    elif spec.startswith(("http://", "https://")):
+        _exporter = BatchExporter(otlp_http_writer(spec))
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORT: {spec}")
+    return _exporter
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each HTTP request.
+
+    Being plain ASGI, the span covers the whole response, including the
+    body of a streamed reply. The endpoint label is the matched route
+    template ("/chat", not the raw path), or "unmatched", so stray paths
+    cannot add histogram series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with span("http.request", method=scope["method"]) as s:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    s.set(status=message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # The router records the matched route in the scope it is given.
+                route = scope.get("route")
+                s.set(endpoint=getattr(route, "path", None) or "unmatched")
@@ -0,0 +1,186 @@
+import threading
+
+import numpy as np
+
+
+class VectorIndex:
+    """Top-k cosine search over a contiguous, L2-normalized float32 matrix.
+
+    Rows carry optional `date` and `meal_type` labels that are applied as
+    boolean masks, so a filtered query is one matrix-vector product over the
+    live rows. Removal moves the last row into the freed slot, keeping the
+    matrix dense.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self._matrix = None
+        self._dates = np.empty(capacity, dtype="U10")
+        self._meal_types = np.empty(capacity, dtype="U16")
+        self._keys = []
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def _grow(self, dim):
+        if self._matrix is None:
+            self._matrix = np.zeros((self.capacity, dim), dtype=np.float32)
+            return
+        self.capacity *= 2
+        matrix = np.zeros((self.capacity, self._matrix.shape[1]), dtype=np.float32)
+        matrix[:len(self._keys)] = self._matrix[:len(self._keys)]
+        self._matrix = matrix
+        self._dates = np.resize(self._dates, self.capacity)
+        self._meal_types = np.resize(self._meal_types, self.capacity)
+
+    def add(self, key, vector, date=None, meal_type=None):
+        """Insert or replace the row for `key`."""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                if self._matrix is None or len(self._keys) == self.capacity:
+                    self._grow(vector.shape[0])
+                row = len(self._keys)
+                self._keys.append(key)
+                self._rows[key] = row
+            self._matrix[row] = vector
+            self._dates[row] = date or ""
+            self._meal_types[row] = meal_type or ""
+
+    def remove(self, key):
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return
+            last = len(self._keys) - 1
+            if row != last:
+                moved = self._keys[last]
+                self._matrix[row] = self._matrix[last]
+                self._dates[row] = self._dates[last]
+                self._meal_types[row] = self._meal_types[last]
+                self._keys[row] = moved
+                self._rows[moved] = row
+            self._keys.pop()
+
+    def search(self, query, k=5, date=None, meal_type=None, threshold=None):
+        """Return up to `k` (key, score) pairs, best first."""
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        with self._lock:
+            n = len(self._keys)
+            if n == 0:
+                return []
+            scores = self._matrix[:n] @ query
+            mask = np.ones(n, dtype=bool)
+            if date is not None:
+                mask &= self._dates[:n] == date
+            if meal_type is not None:
+                mask &= self._meal_types[:n] == meal_type
+            if threshold is not None:
+                mask &= scores >= threshold
+            candidates = np.flatnonzero(mask)
+            if candidates.size == 0:
+                return []
+            k = min(k, candidates.size)
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(self._keys[i], float(scores[i])) for i in top]
+
+
+class EntityIndex:
+    """VectorIndex over the dict entities of one list (meals, events, ...).
+
+    Entities are keyed by `key_of` (their stored id). Embeddings come from
+    the shared EmbeddingService.
+    """
+
+    def __init__(self, embeddings, text_of, key_of=lambda entity: entity["id"], date_of=None, meal_type_of=None):
+        self.embeddings = embeddings
+        self.text_of = text_of
+        self.key_of = key_of
+        self.date_of = date_of or (lambda entity: None)
+        self.meal_type_of = meal_type_of or (lambda entity: None)
+        self.index = VectorIndex()
+        self._entities = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def add_many(self, entities):
+        # Untitled entities cannot be matched by title and the API rejects empty input.
+        entities = [e for e in entities if self.text_of(e)]
+        if not entities:
+            return
+        vectors = self.embeddings.embed_many([self.text_of(e) for e in entities])
+        for entity, vector in zip(entities, vectors):
+            key = self.key_of(entity)
+            self._entities[key] = entity
+            self.index.add(key, vector, self.date_of(entity), self.meal_type_of(entity))
+
+    def add(self, entity):
+        self.add_many([entity])
+
+    def add_later(self, *entities):
+        """Embed and index in the background so the tool call returns at once."""
+        return self.embeddings.background(lambda: self.add_many(entities))
+
+    def remove(self, entity):
+        key = self.key_of(entity)
+        self.index.remove(key)
+        self._entities.pop(key, None)
+
+    def search(self, query, k=5, date=None, meal_type=None, threshold=None):
+        """Return up to `k` (entity, score) pairs; costs one query embedding."""
+        hits = self.index.search(self.embeddings.embed(query), k, date, meal_type, threshold)
+        return [(self._entities[key], score) for key, score in hits if key in self._entities]
+
+    def best_match(self, query, threshold=0.6, date=None, meal_type=None):
+        hits = self.search(query, 1, date, meal_type, threshold)
+        return hits[0] if hits else (None, 0.0)
+
+
+class UserEntityIndexes:
+    """One EntityIndex per user, built from storage the first time it is used.
+
+    `load(user_id)` returns the user's stored entities. Writes for users whose
+    index has not been built yet are skipped: the index picks them up from
+    storage when it is built.
+    """
+
+    def __init__(self, load, **index_kwargs):
+        self.load = load
+        self.index_kwargs = index_kwargs
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                return index
+            index = EntityIndex(**self.index_kwargs)
+            self._indexes[user_id] = index
+        index.add_many(self.load(user_id))
+        return index
+
+    def add_later(self, user_id, *entities):
+        index = self._indexes.get(user_id)
+        if index is not None:
+            return index.add_later(*entities)
+        return None
+
+    def remove(self, user_id, entity):
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.remove(entity)